@@ -0,0 +1,93 @@
+"""
+Сравнение JSON, колоночного MessagePack и компактного представления серий
+(compact=true) для ответа /calendar/events/range.
+
+Генерирует плотный календарь (повторяющиеся серии + одиночные события),
+кодирует его так же, как это делает API, и сравнивает размер (в т.ч. после gzip),
+время кодирования на сервере и время декодирования на клиенте.
+
+    python benchmarks/bench_event_encoding.py --events 3000 --series 40
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+for name, value in {"DB_PASSWORD": "bench", "GOOGLE_CLIENT_ID": "bench", "GOOGLE_CLIENT_SECRET": "bench"}.items():
+    os.environ.setdefault(name, value)
+
+from pydantic import TypeAdapter  # noqa: E402
+from typing import List  # noqa: E402
+
+from src.calendar.encoding import (  # noqa: E402
+    decode_events_columnar, encode_compact_series, encode_events_columnar, expand_series,
+)
+from src.calendar.schemas import CalendarEventResponse  # noqa: E402
+
+
+def make_events(count: int, series: int, seed: int = 7):
+    rng = random.Random(seed)
+    rules = [f"RRULE:FREQ=WEEKLY;BYDAY={d};INTERVAL={rng.randint(1, 2)}" for d in ("MO", "TU", "WE", "TH", "FR")]
+    masters = [(f"series{n:03d}{rng.getrandbits(40):x}", f"Series meeting {n}", rng.choice(rules)) for n in range(series)]
+    events = []
+    for i in range(count):
+        day, hour = 1 + i % 28, 8 + i % 10
+        start, end = f"2024-07-{day:02d}T{hour:02d}:00:00+05:00", f"2024-07-{day:02d}T{hour:02d}:30:00+05:00"
+        if rng.random() < 0.7:
+            master_id, summary, rule = rng.choice(masters)
+            events.append({"id": f"{master_id}_202407{day:02d}T{hour:02d}0000Z", "summary": summary,
+                           "startTime": start, "endTime": end, "isAllDay": False,
+                           "description": "Weekly sync, agenda in the doc", "location": "Room 4",
+                           "recurringEventId": master_id, "originalStartTime": start, "recurrenceRule": rule})
+        else:
+            events.append({"id": f"single{i:05d}", "summary": f"One-off {i}", "startTime": start,
+                           "endTime": end, "isAllDay": False})
+    return events
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=3000)
+    parser.add_argument("--series", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    events = make_events(args.events, args.series)
+    adapter = TypeAdapter(List[CalendarEventResponse])
+
+    def encode_json():
+        # Как FastAPI с response_model: валидация + сериализация
+        return adapter.dump_json(adapter.validate_python(events))
+
+    json_body = encode_json()
+    msgpack_body = encode_events_columnar(events)
+    assert decode_events_columnar(msgpack_body) == json.loads(json_body)
+
+    def encode_compact():
+        return encode_compact_series(events)
+
+    compact_body = encode_compact()
+    assert expand_series(json.loads(compact_body)) == json.loads(json_body)
+
+    def per_call_ms(fn):
+        return min(timeit.repeat(fn, number=1, repeat=args.repeat)) * 1000
+
+    rows = [
+        ("JSON", json_body, per_call_ms(encode_json), per_call_ms(lambda: json.loads(json_body))),
+        ("MessagePack (columnar)", msgpack_body, per_call_ms(lambda: encode_events_columnar(events)),
+         per_call_ms(lambda: decode_events_columnar(msgpack_body))),
+        ("JSON (compact series)", compact_body, per_call_ms(encode_compact),
+         per_call_ms(lambda: expand_series(json.loads(compact_body)))),
+    ]
+    print(f"{args.events} events, {args.series} recurring series\n")
+    print(f"{'format':<24}{'bytes':>10}{'gzip bytes':>12}{'encode ms':>11}{'decode ms':>11}")
+    for name, body, encode_ms, decode_ms in rows:
+        print(f"{name:<24}{len(body):>10}{len(gzip.compress(body)):>12}{encode_ms:>11.2f}{decode_ms:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
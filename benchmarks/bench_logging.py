@@ -0,0 +1,112 @@
+"""
+Стоимость логирования на один запрос: прежняя схема (basicConfig, синхронный
+StreamHandler, f-строки на INFO с телами событий) против текущей
+(configure_logging: очередь + JSON в фоновом потоке, ленивое форматирование,
+выборка и лимит частоты для src.calendar.service).
+
+Имитирует логи запроса /calendar/events/range и создания события. Вывод идет
+в /dev/null, поэтому измеряется CPU, а не скорость диска. CPU потока запроса
+(time.thread_time) - то, что добавляется к задержке ответа; CPU процесса
+включает и фоновый поток записи.
+
+    python benchmarks/bench_logging.py --requests 20000
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+for name, value in {"DB_PASSWORD": "bench", "GOOGLE_CLIENT_ID": "bench", "GOOGLE_CLIENT_SECRET": "bench"}.items():
+    os.environ.setdefault(name, value)
+
+from src.calendar.schemas import CreateEventRequest  # noqa: E402
+
+USER = "bench.user@example.com"
+EVENT = CreateEventRequest(summary="Planning", startTime="2024-07-01T10:00:00", endTime="2024-07-01T11:00:00",
+                           isAllDay=False, timeZoneId="Asia/Yekaterinburg",
+                           description="Quarterly planning, agenda in the doc " * 4, location="Room 4",
+                           recurrence=["RRULE:FREQ=WEEKLY;BYDAY=MO"])
+
+
+def old_request(router: logging.Logger, service: logging.Logger, i: int) -> None:
+    router.info(f"Request to get events from 2024-07-01 to 2024-07-07 for user {USER}")
+    service.info(f"Querying Google Calendar API with timeMin=2024-07-01T00:00:00Z, timeMax=2024-07-08T00:00:00Z")
+    service.info(f"Found {40 + i % 5} total event instances.")
+    if i % 10 == 0:
+        router.info(f"Request to create event for user {USER}: {EVENT.model_dump()}")
+        body = EVENT.model_dump(exclude_none=True)
+        service.info(f"Inserting new event: {body}")
+        service.info(f"Event created successfully. Event ID: evt{i}")
+
+
+def new_request(router: logging.Logger, service: logging.Logger, i: int) -> None:
+    router.info("Request to get events from %s to %s for user %s", "2024-07-01", "2024-07-07", USER)
+    service.debug("Querying Google Calendar API with timeMin=%s, timeMax=%s", "2024-07-01T00:00:00Z", "2024-07-08T00:00:00Z")
+    service.debug("Found %s total event instances.", 40 + i % 5)
+    if i % 10 == 0:
+        router.info("Request to create event for user %s", USER)
+        router.debug("Create event payload: %s", EVENT)
+        service.debug("Inserting new event: %s", EVENT)
+        service.info("Event created successfully. Event ID: %s", f"evt{i}")
+
+
+def reset_root(devnull) -> None:
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    for name in ("src.calendar.router", "src.calendar.service"):
+        for log_filter in list(logging.getLogger(name).filters):
+            logging.getLogger(name).removeFilter(log_filter)
+    sys.stderr = devnull
+
+
+def measure(request, requests: int, finish=None):
+    """CPU потока запроса, CPU процесса (с фоновым потоком, до finish()) и wall-время."""
+    router, service = logging.getLogger("src.calendar.router"), logging.getLogger("src.calendar.service")
+    thread_start, process_start, wall_start = time.thread_time(), time.process_time(), time.perf_counter()
+    for i in range(requests):
+        request(router, service, i)
+    thread_cpu, wall = time.thread_time() - thread_start, time.perf_counter() - wall_start
+    if finish is not None:
+        finish()
+    return thread_cpu, time.process_time() - process_start, wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    stderr = sys.stderr
+    devnull = open(os.devnull, "w")
+    results = []
+
+    reset_root(devnull)
+    logging.basicConfig(level=logging.INFO)
+    results.append(("old: basicConfig + f-strings", *measure(old_request, args.requests)))
+
+    from src.core import logging_config
+    from src.core.config import settings
+
+    # Сначала без выборки и лимитов - чтобы было видно вклад очереди и ленивого форматирования отдельно
+    sample_rates, rate_limits = settings.LOG_SAMPLE_RATES, settings.LOG_RATE_LIMITS
+    for label, rates, limits in (("new: queue + lazy", {}, {}),
+                                 ("new: queue + lazy + sampling", sample_rates, rate_limits)):
+        reset_root(devnull)
+        settings.LOG_SAMPLE_RATES, settings.LOG_RATE_LIMITS = rates, limits
+        logging_config.configure_logging()
+        # shutdown_logging дожидается записи очереди, так что CPU фонового потока тоже учтен
+        results.append((label, *measure(new_request, args.requests, finish=logging_config.shutdown_logging)))
+
+    sys.stderr = stderr
+    print(f"{args.requests} simulated requests (range read + create every 10th)")
+    print(f"{'setup':32} {'request thread us/req':>22} {'process us/req':>16} {'wall us/req':>12}")
+    for label, thread_cpu, process_cpu, wall in results:
+        print(f"{label:32} {thread_cpu / args.requests * 1e6:22.1f} "
+              f"{process_cpu / args.requests * 1e6:16.1f} {wall / args.requests * 1e6:12.1f}")
+
+
+if __name__ == "__main__":
+    main()
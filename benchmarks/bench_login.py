@@ -0,0 +1,112 @@
+"""
+Нагрузочный тест обмена auth_code: N параллельных логинов против заглушки Google.
+
+Сравнивает текущий конвейер (асинхронный httpx + LoginGate + пул потоков для БД)
+с прежним поведением (блокирующий fetch_token и upsert прямо в async-обработчике).
+Параллельно меряется задержка event loop - насколько логины мешают остальным запросам.
+
+    python benchmarks/bench_login.py --logins 200 --google-latency 0.1 --db-latency 0.005
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+for name, value in {"DB_PASSWORD": "bench", "GOOGLE_CLIENT_ID": "bench", "GOOGLE_CLIENT_SECRET": "bench"}.items():
+    os.environ.setdefault(name, value)
+
+import httpx  # noqa: E402
+from unittest import mock  # noqa: E402
+
+from src.auth import service as auth_service  # noqa: E402
+from src.auth.google_client import GoogleOAuthClient  # noqa: E402
+from src.auth.schemas import TokenExchangeRequest  # noqa: E402
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def _loop_lag_probe(stop: asyncio.Event, samples: list):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.01)
+        samples.append(time.perf_counter() - started - 0.01)
+
+
+async def run(mode: str, logins: int, google_latency: float, db_latency: float, concurrency: int):
+    async def token_endpoint(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(google_latency)
+        return httpx.Response(200, json={"access_token": "at", "refresh_token": "rt", "expires_in": 3599})
+
+    class _AsyncMockTransport(httpx.AsyncBaseTransport):
+        async def handle_async_request(self, request):
+            return await token_endpoint(request)
+
+    client = GoogleOAuthClient(transport=_AsyncMockTransport())
+    gate = auth_service.LoginGate(max_concurrency=concurrency, queue_timeout=60)
+
+    async def legacy_exchange(self, payload):
+        # Прежнее поведение: синхронный запрос к Google и upsert в event loop
+        time.sleep(google_latency)
+        time.sleep(db_latency)
+        return "user@example.com"
+
+    def blocking_upsert(**kwargs):
+        time.sleep(db_latency)
+
+    patches = [
+        mock.patch.object(auth_service, "google_oauth_client", client),
+        mock.patch.object(auth_service, "login_gate", gate),
+        mock.patch.object(auth_service.users_crud, "upsert_user_token", side_effect=blocking_upsert),
+        mock.patch.object(auth_service.prefetch_pool, "schedule"),
+        mock.patch.object(auth_service.AuthService, "verify_google_id_token",
+                          mock.AsyncMock(return_value={"sub": "g", "email": "user@example.com"})),
+    ]
+    if mode == "legacy":
+        patches.append(mock.patch.object(auth_service.AuthService, "exchange_auth_code", legacy_exchange))
+    for p in patches:
+        p.start()
+    try:
+        payload = TokenExchangeRequest(id_token="id", auth_code="code")
+        latencies, lag = [], []
+        stop = asyncio.Event()
+        probe = asyncio.create_task(_loop_lag_probe(stop, lag))
+
+        async def one_login():
+            started = time.perf_counter()
+            await auth_service.AuthService(mock.MagicMock()).exchange_auth_code(payload)
+            latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one_login() for _ in range(logins)))
+        total = time.perf_counter() - started
+        stop.set()
+        await probe
+        await client.aclose()
+    finally:
+        for p in patches:
+            p.stop()
+
+    print(f"{mode:>8}: {logins} logins in {total:6.2f}s  ({logins / total:7.1f}/s)  "
+          f"p50={statistics.median(latencies) * 1000:7.1f}ms  p99={_percentile(latencies, 0.99) * 1000:7.1f}ms  "
+          f"max loop lag={max(lag or [0]) * 1000:7.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--google-latency", type=float, default=0.1)
+    parser.add_argument("--db-latency", type=float, default=0.005)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+    for mode in ("legacy", "pipeline"):
+        asyncio.run(run(mode, args.logins, args.google_latency, args.db_latency, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
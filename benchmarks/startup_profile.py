@@ -0,0 +1,59 @@
+"""
+Профиль холодного старта: время импорта каждого модуля при `import main`.
+
+Запускает `python -X importtime -c "import main"` в отдельном процессе
+(чтобы кэш модулей текущего процесса не искажал результат) и печатает
+самые дорогие модули и сводку по пакетам верхнего уровня.
+
+    python benchmarks/startup_profile.py --top 25
+"""
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def collect(module: str):
+    env = dict(os.environ)
+    for name, value in {"DB_PASSWORD": "profile", "GOOGLE_CLIENT_ID": "profile", "GOOGLE_CLIENT_SECRET": "profile"}.items():
+        env.setdefault(name, value)
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.rstrip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--top", type=int, default=25)
+    args = parser.parse_args()
+
+    rows = collect(args.module)
+    total = next((cumulative for name, _, cumulative in rows if name.strip() == args.module), 0)
+    print(f"import {args.module}: {total / 1000:.1f} ms total\n")
+
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for name, self_us, cumulative_us in sorted(rows, key=lambda r: r[2], reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:14.1f} {self_us / 1000:9.1f}  {name}")
+
+    packages = defaultdict(int)
+    for name, self_us, _ in rows:
+        packages[name.strip().split(".")[0]] += self_us
+    print(f"\n{'self ms':>9}  top-level package")
+    for package, self_us in sorted(packages.items(), key=lambda kv: kv[1], reverse=True)[:args.top]:
+        print(f"{self_us / 1000:9.1f}  {package}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 # main.py
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
+import anyio
 import logging
 import sys
 import os
@@ -9,18 +11,59 @@ if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
     
 # Импортируем наши новые роутеры
+from src.admin.router import router as admin_router
 from src.auth.router import router as auth_router
 from src.calendar.router import router as calendar_router
+from src.calendar.channels import channel_manager
+from src.calendar.imports import ics_importer
+from src.calendar.mutations import mutation_queue
+from src.calendar.prefetch import prefetch_pool
+from src.calendar.service import google_hedger
+from src.auth.tokens import token_manager
+from src.auth.google_client import google_oauth_client
+from src.core.config import settings
+from src.core.deadline import deadline_scope
+from src.core.logging_config import configure_logging
+from src.core.scheduler import scheduler
+from src.core.metrics import metrics
+from src.core.profiler import profiler
+from src.core.warmup import readiness
 
-logging.basicConfig(level=logging.INFO)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Пул потоков для синхронных обработчиков; допуск к нему регулирует src/core/admission.py
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_SIZE
+    # Прогрев до приема трафика: discovery-документ и клиент Google, сертификаты
+    # для проверки ID token, пул соединений БД. Результат - в GET /ready.
+    await readiness.run()
+    # Фоновые задачи: обновление токенов активных пользователей,
+    # регистрация и продление каналов push-уведомлений Google
+    scheduler.add_job(token_manager.refresh_due, settings.TOKEN_REFRESH_INTERVAL_SECONDS, name="token-refresh")
+    if channel_manager.enabled:
+        scheduler.add_job(channel_manager.sync_channels, settings.WATCH_RENEW_INTERVAL_SECONDS, name="watch-channels")
+    scheduler.start()
+    # Отправка в Google изменений, принятых с ?async=true
+    mutation_queue.start()
+    yield
+    mutation_queue.shutdown()
+    ics_importer.shutdown()
+    prefetch_pool.shutdown()
+    google_hedger.shutdown()
+    scheduler.shutdown()
+    await google_oauth_client.aclose()
+    if channel_manager.enabled:
+        channel_manager.stop_all()
+
 
 app = FastAPI(
     title="Caliinda Backend",
     description="Handles user requests via Google Calendar.",
-    version="2.0.0" # Можно и версию поднять после такого рефакторинга :)
+    version="2.0.0", # Можно и версию поднять после такого рефакторинга :)
+    lifespan=lifespan
 )
 
 # CORS
@@ -32,15 +75,41 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Бюджет времени на все обращения к Google в рамках одного запроса
+@app.middleware("http")
+async def request_deadline(request: Request, call_next):
+    with deadline_scope(settings.REQUEST_DEADLINE_SECONDS):
+        return await call_next(request)
+
+# Профилирование по запросу (POST /admin/profile): отмечает подходящие запросы, без сессии ничего не делает
+@app.middleware("http")
+async def profile_requests(request: Request, call_next):
+    with profiler.track(request.url.path):
+        return await call_next(request)
+
 # Подключаем роутеры
 logger.info("Including routers...")
 app.include_router(auth_router)
 app.include_router(calendar_router)
+app.include_router(admin_router)
 
 @app.get("/", tags=["Status"])
 def root():
     return {"message": "Caliinda Backend is running!"}
 
+@app.get("/ready", tags=["Status"])
+async def ready(response: Response):
+    # Если обязательная проверка при старте не прошла (например, БД была недоступна), повторяем ее
+    if not readiness.ready:
+        await readiness.run(only_failed=True)
+    if not readiness.ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return readiness.snapshot()
+
+@app.get("/metrics", tags=["Status"])
+def get_metrics():
+    return metrics.snapshot()
+
 # Код для запуска через uvicorn, если нужно
 # if __name__ == "__main__":
 #     import uvicorn
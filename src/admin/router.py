@@ -0,0 +1,55 @@
+# src/admin/router.py
+
+import asyncio
+import logging
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+
+from src.core.config import settings
+from src.core.dependencies import require_admin
+from src.core.profiler import ProfilerBusyError, profiler
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["Admin"],
+    dependencies=[Depends(require_admin)],
+)
+logger = logging.getLogger(__name__)
+
+# Как часто обработчик проверяет, закончилась ли сессия профилирования
+PROFILE_POLL_SECONDS = 0.05
+
+
+@router.post("/profile", summary="Capture a sampling profile of live requests")
+async def capture_profile(
+    seconds: float = Query(10.0, gt=0, description="Profile for at most this many seconds"),
+    requests: Optional[int] = Query(None, ge=1, description="Stop after this many matching requests"),
+    route: Optional[str] = Query(None, description="Only requests to this path, e.g. /calendar/events/range"),
+    user: Optional[str] = Query(None, description="Only requests of this user (email or Google ID)"),
+    interval_ms: float = Query(10.0, ge=1, le=1000, description="Sampling interval"),
+    memory: bool = Query(False, description="Also diff tracemalloc snapshots; slows every request down while active"),
+):
+    """
+    Samples the stacks of request-serving threads while matching requests are running and
+    returns them as flamegraph-compatible collapsed stacks (`collapsed`, one `stack count` per line,
+    for flamegraph.pl or speedscope). With `memory=true` also returns the allocations made by our code,
+    FastAPI and pydantic during the session (tracemalloc snapshot diff).
+
+    The call blocks until `seconds` pass or `requests` matching requests complete.
+    Only one session can run at a time (409 otherwise).
+    """
+    if seconds > settings.PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=422, detail=f"seconds must not exceed {settings.PROFILE_MAX_SECONDS}")
+    try:
+        session = profiler.start(seconds, max_requests=requests, route=route, user=user,
+                                 interval=interval_ms / 1000, memory=memory)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    logger.warning("Profiling started: %ss, requests=%s, route=%s, user=%s, memory=%s",
+                   seconds, requests, route, user, memory)
+    while not session.finished.is_set():
+        await asyncio.sleep(PROFILE_POLL_SECONDS)
+    result = session.result()
+    logger.info("Profiling finished: %s requests, %s samples", result["requests"], result["samples"])
+    return result
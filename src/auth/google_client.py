@@ -0,0 +1,159 @@
+# src/auth/google_client.py
+import asyncio
+import datetime
+import functools
+import logging
+import re
+import time
+from typing import Any, Dict, Mapping, Optional
+
+import httpx
+from google.auth import jwt
+from google.auth.exceptions import GoogleAuthError
+from google.oauth2.credentials import Credentials
+
+from src.core.config import settings
+from .tokens import GOOGLE_TOKEN_URI
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_AUTH_URI = "https://accounts.google.com/o/oauth2/auth"
+GOOGLE_CERTS_URL = "https://www.googleapis.com/oauth2/v1/certs"
+# 'postmessage' - стандартный redirect_uri для auth_code, полученного JS-библиотекой Google
+OAUTH_REDIRECT_URI = "postmessage"
+
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+
+class TokenExchangeError(GoogleAuthError):
+    """Token endpoint Google отклонил обмен auth_code (текст содержит код ошибки, например invalid_grant)."""
+
+
+@functools.lru_cache(maxsize=1)
+def get_oauth_client_config() -> Dict[str, Any]:
+    """Конфигурация OAuth-клиента; собирается один раз на процесс."""
+    return {
+        "web": {
+            "client_id": settings.GOOGLE_CLIENT_ID,
+            "client_secret": settings.GOOGLE_CLIENT_SECRET,
+            "auth_uri": GOOGLE_AUTH_URI,
+            "token_uri": GOOGLE_TOKEN_URI,
+            "redirect_uris": [OAUTH_REDIRECT_URI],
+        }
+    }
+
+
+class GoogleOAuthClient:
+    """
+    Асинхронный клиент OAuth-эндпоинтов Google поверх общего пула соединений httpx.
+
+    - exchange_code: обмен auth_code на токены без блокировки event loop.
+    - verify_id_token: проверка ID token по закэшированным сертификатам Google
+      (сертификаты обновляются по Cache-Control и при появлении нового kid).
+    """
+
+    def __init__(self, timeout: float = 10.0, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.timeout = timeout
+        self._transport = transport
+        self._http: Optional[httpx.AsyncClient] = None
+        self._certs: Optional[Mapping[str, str]] = None
+        self._certs_expire_at = 0.0
+        self._certs_lock: Optional[asyncio.Lock] = None
+
+    def _client(self) -> httpx.AsyncClient:
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                timeout=self.timeout,
+                transport=self._transport,
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            )
+        return self._http
+
+    async def aclose(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    # --- Обмен кода ---
+
+    async def exchange_code(self, auth_code: str) -> Credentials:
+        """
+        Обменивает auth_code на access/refresh токены.
+
+        Raises:
+            TokenExchangeError: Если Google отклонил код.
+        """
+        config = get_oauth_client_config()["web"]
+        response = await self._client().post(
+            config["token_uri"],
+            data={
+                "code": auth_code,
+                "client_id": config["client_id"],
+                "client_secret": config["client_secret"],
+                "redirect_uri": OAUTH_REDIRECT_URI,
+                "grant_type": "authorization_code",
+            },
+        )
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = {}
+        if response.status_code != 200:
+            error = payload.get("error", f"http_{response.status_code}")
+            raise TokenExchangeError(f"{error}: {payload.get('error_description', response.text)}")
+
+        expires_in = payload.get("expires_in")
+        expiry = None
+        if expires_in:
+            # google-auth хранит expiry как naive UTC
+            expiry = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None) + datetime.timedelta(seconds=int(expires_in))
+        scopes = payload.get("scope")
+        return Credentials(
+            token=payload.get("access_token"),
+            refresh_token=payload.get("refresh_token"),
+            id_token=payload.get("id_token"),
+            token_uri=config["token_uri"],
+            client_id=config["client_id"],
+            client_secret=config["client_secret"],
+            scopes=scopes.split() if scopes else settings.SCOPES,
+            expiry=expiry,
+        )
+
+    # --- Проверка ID token ---
+
+    async def get_certs(self, force_refresh: bool = False) -> Mapping[str, str]:
+        if self._certs_lock is None:
+            self._certs_lock = asyncio.Lock()
+        if not force_refresh and self._certs is not None and time.monotonic() < self._certs_expire_at:
+            return self._certs
+        async with self._certs_lock:
+            # Пока ждали блокировку, сертификаты мог загрузить другой запрос
+            if not force_refresh and self._certs is not None and time.monotonic() < self._certs_expire_at:
+                return self._certs
+            response = await self._client().get(GOOGLE_CERTS_URL)
+            response.raise_for_status()
+            self._certs = response.json()
+            match = _MAX_AGE_RE.search(response.headers.get("cache-control", ""))
+            self._certs_expire_at = time.monotonic() + (int(match.group(1)) if match else 3600)
+            logger.info("Fetched Google signing certificates (%d keys).", len(self._certs))
+            return self._certs
+
+    async def verify_id_token(self, token: str, audience: str) -> Mapping[str, Any]:
+        """
+        Проверяет подпись, срок и audience ID token.
+
+        Raises:
+            ValueError: Если токен невалиден.
+        """
+        certs = await self.get_certs()
+        try:
+            return jwt.decode(token, certs=certs, audience=audience)
+        except ValueError as e:
+            # Google ротирует ключи: незнакомый kid - повод перечитать сертификаты
+            if "Certificate for key id" not in str(e):
+                raise
+        certs = await self.get_certs(force_refresh=True)
+        return jwt.decode(token, certs=certs, audience=audience)
+
+
+google_oauth_client = GoogleOAuthClient()
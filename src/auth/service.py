@@ -1,22 +1,75 @@
+import asyncio
 import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Optional
+
+import anyio
+import httpx
 from fastapi import HTTPException, status
 from sqlalchemy.orm import Session
 
 # --- Импорты для работы с Google Auth ---
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
-from google_auth_oauthlib.flow import Flow
 from google.auth.exceptions import GoogleAuthError
 
 # --- Импорты из нашего приложения ---
 from src.core.config import settings
+from src.core.metrics import metrics
 from src.users import crud as users_crud
+from src.calendar.prefetch import prefetch_pool
 from .schemas import TokenExchangeRequest
+from .tokens import token_manager
+from .google_client import google_oauth_client
 
 # --- Настройка логгера ---
 logger = logging.getLogger(__name__)
 
 
+class LoginGate:
+    """
+    Отдельный лимит параллельных обменов кода с очередью ожидания.
+
+    Во время "шторма" логинов лишние запросы ждут в очереди не дольше
+    queue_timeout и получают 503, а работа с БД идет в собственном пуле
+    потоков - так логины не вытесняют запросы к календарю.
+    """
+
+    def __init__(self, max_concurrency: int, queue_timeout: float):
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._db_limiter: Optional[anyio.CapacityLimiter] = None
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            metrics.inc("login_rejected_total")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many concurrent sign-ins. Please retry shortly.",
+                headers={"Retry-After": str(max(1, int(self.queue_timeout)))}
+            )
+        metrics.observe("login_queue_seconds", time.perf_counter() - started)
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+    async def run_sync(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Выполняет блокирующую функцию (работу с БД) в пуле потоков логина."""
+        if self._db_limiter is None:
+            self._db_limiter = anyio.CapacityLimiter(self.max_concurrency)
+        return await anyio.to_thread.run_sync(func, *args, limiter=self._db_limiter)
+
+
+login_gate = LoginGate(max_concurrency=settings.LOGIN_MAX_CONCURRENCY, queue_timeout=settings.LOGIN_QUEUE_TIMEOUT_SECONDS)
+
+
 class AuthService:
     """
     Сервисный слой, отвечающий за всю логику, связанную с аутентификацией
@@ -47,28 +100,26 @@ class AuthService:
             Словарь с данными пользователя из токена.
         """
         try:
-            # Используем CLIENT_ID из нашего централизованного конфига
-            id_info = id_token.verify_oauth2_token(
-                token, google_requests.Request(), settings.GOOGLE_CLIENT_ID
-            )
+            # Сертификаты Google кэшируются, поэтому проверка не делает сетевой запрос на каждый вызов
+            id_info = await google_oauth_client.verify_id_token(token, settings.GOOGLE_CLIENT_ID)
 
             # Дополнительная проверка издателя (issuer)
             if id_info['iss'] not in ['accounts.google.com', 'https://accounts.google.com']:
                 raise ValueError('Wrong issuer.')
 
-            logger.info(f"ID Token успешно верифицирован для пользователя: {id_info.get('email')}")
+            logger.info("ID Token успешно верифицирован для пользователя: %s", id_info.get('email'))
             return id_info
             
         except ValueError as e:
             # Эта ошибка возникает, если токен не прошел проверку подписи, истек и т.д.
-            logger.error(f"Верификация ID Token не удалась: {e}")
+            logger.error("Верификация ID Token не удалась: %s", e)
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail=f"Invalid Google ID Token: {e}"
             )
         except Exception as e:
             # Любая другая непредвиденная ошибка
-            logger.error(f"Неожиданная ошибка при верификации токена: {e}", exc_info=True)
+            logger.error("Неожиданная ошибка при верификации токена: %s", e, exc_info=True)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Internal error during token verification"
@@ -97,77 +148,75 @@ class AuthService:
             
         user_email = id_info.get('email')
         user_full_name = id_info.get('name')
-        logger.info(f"Аутентификация для обмена токенов пройдена для пользователя: {user_email} (ID: {user_google_id})")
+        logger.info("Аутентификация для обмена токенов пройдена для пользователя: %s (ID: %s)", user_email, user_google_id)
 
-        # 2. Обмен кода авторизации на токены (access и refresh)
-        try:
-            # Конфигурация для Flow берется из централизованных настроек
-            client_config = {
-                "web": {
-                    "client_id": settings.GOOGLE_CLIENT_ID,
-                    "client_secret": settings.GOOGLE_CLIENT_SECRET,
-                    "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                    "token_uri": "https://oauth2.googleapis.com/token",
-                    "redirect_uris": ["postmessage"], # 'postmessage' - стандартное значение для JS-библиотеки Google
-                }
-            }
-
-            # 'postmessage' является безопасным и стандартным redirect_uri для клиентских приложений,
-            # которые передают auth_code на бэкенд. Убедись, что он разрешен в Google Cloud Console.
-            flow = Flow.from_client_config(
-                client_config=client_config,
-                scopes=settings.SCOPES,
-                redirect_uri='postmessage'
-            )
+        # 2. Обмен кода авторизации на токены (access и refresh).
+        # Отдельный лимит параллельности с очередью: шторм логинов не должен вытеснять календарь.
+        async with login_gate.slot():
+            return await self._exchange_and_store(payload, user_google_id, user_email, user_full_name)
 
-            logger.info(f"Попытка получить токены от Google по auth_code для пользователя: {user_email}")
-            # Этот вызов делает синхронный HTTP-запрос к Google
-            flow.fetch_token(code=payload.auth_code)
+    async def _exchange_and_store(self, payload: TokenExchangeRequest, user_google_id: str,
+                                  user_email: str, user_full_name: Optional[str]) -> str:
+        try:
+            logger.info("Попытка получить токены от Google по auth_code для пользователя: %s", user_email)
+            # Асинхронный запрос через общий пул соединений, event loop не блокируется
+            credentials = await google_oauth_client.exchange_code(payload.auth_code)
 
-            credentials = flow.credentials
             if not credentials or not credentials.token:
                 logger.error("Не удалось получить access_token от Google.")
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Could not obtain valid tokens from Google.")
 
             refresh_token = credentials.refresh_token
 
-            # 3. Работа с базой данных
+            # 3. Работа с базой данных (в пуле потоков логина)
             if refresh_token:
                 # Мы получили новый refresh_token. Это обычно происходит при первом логине
                 # или если пользователь отозвал доступ и предоставил его заново.
                 # Сохраняем или обновляем его в нашей БД.
-                logger.info(f"Получен новый refresh_token для {user_email}. Сохранение в БД.")
-                users_crud.upsert_user_token(
-                    db=self.db,
-                    google_id=user_google_id,
-                    email=user_email,
-                    full_name=user_full_name,
-                    refresh_token=refresh_token
+                logger.info("Получен новый refresh_token для %s. Сохранение в БД.", user_email)
+                await login_gate.run_sync(
+                    lambda: users_crud.upsert_user_token(
+                        db=self.db,
+                        google_id=user_google_id,
+                        email=user_email,
+                        full_name=user_full_name,
+                        refresh_token=refresh_token
+                    )
                 )
-                logger.info(f"Refresh token для {user_email} успешно сохранен/обновлен.")
+                logger.info("Refresh token для %s успешно сохранен/обновлен.", user_email)
+                # Свежий access token сразу пригодится первым запросам к календарю
+                token_manager.store(user_google_id, credentials)
             else:
                 # Refresh token не пришел. Это нормальное поведение, если пользователь
                 # уже давал разрешение ранее.
-                logger.warning(f"Новый refresh_token для {user_email} не получен. Проверяем наличие старого в БД.")
+                logger.warning("Новый refresh_token для %s не получен. Проверяем наличие старого в БД.", user_email)
                 # Критически важно убедиться, что у нас уже есть refresh_token для этого пользователя.
-                existing_user = users_crud.get_user_by_google_id(self.db, user_google_id)
-                if not existing_user or not existing_user.refresh_token:
+                existing_refresh_token = await login_gate.run_sync(users_crud.get_refresh_token, self.db, user_google_id)
+                if not existing_refresh_token:
                     # Это проблемная ситуация: Google не дал токен, и у нас его нет.
                     # Пользователь не сможет работать с API в фоновом режиме.
-                    logger.error(f"У пользователя {user_email} нет refresh_token в БД, и Google не предоставил новый.")
+                    logger.error("У пользователя %s нет refresh_token в БД, и Google не предоставил новый.", user_email)
                     raise HTTPException(
                         status_code=status.HTTP_400_BAD_REQUEST,
                         detail="Authorization inconsistent. Please sign out from Google, revoke app access, and sign in again."
                     )
-                logger.info(f"Пользователь {user_email} уже имеет refresh_token в БД. Обновление не требуется.")
+                logger.info("Пользователь %s уже имеет refresh_token в БД. Обновление не требуется.", user_email)
 
-            logger.info(f"Авторизация для пользователя {user_email} прошла успешно.")
+            logger.info("Авторизация для пользователя %s прошла успешно.", user_email)
+            # Первый экран календаря почти всегда запрашивает ближайшие недели -
+            # прогреваем кэш в фоне, не задерживая ответ на логин.
+            prefetch_pool.schedule(credentials, user_email)
             return user_email
 
+        except HTTPException:
+            raise
+        except httpx.HTTPError as e:
+            logger.error("Сетевая ошибка при обмене кода с Google: %s", e, exc_info=True)
+            raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Google token endpoint is unavailable.")
         except GoogleAuthError as e:
             # Обработка ошибок от библиотеки Google
             error_detail = str(e)
-            logger.error(f"Ошибка Google Auth при обмене кода: {error_detail}", exc_info=True)
+            logger.error("Ошибка Google Auth при обмене кода: %s", error_detail, exc_info=True)
             # 'invalid_grant' - частая ошибка, если код уже использован или redirect_uri не совпадает
             if "invalid_grant" in error_detail:
                 detail_message = "Failed to exchange auth code. It might be expired, already used, or the redirect_uri is incorrect."
@@ -177,5 +226,5 @@ class AuthService:
             
         except Exception as e:
             # Обработка других неожиданных ошибок (например, сетевых или ошибок БД из CRUD)
-            logger.error(f"Неожиданная ошибка в процессе обмена кода: {e}", exc_info=True)
+            logger.error("Неожиданная ошибка в процессе обмена кода: %s", e, exc_info=True)
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An unexpected internal error occurred.")
\ No newline at end of file
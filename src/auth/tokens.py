@@ -0,0 +1,243 @@
+# src/auth/tokens.py
+import datetime
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from google.auth.exceptions import RefreshError
+from google.auth.transport import requests as google_requests
+from google.oauth2.credentials import Credentials
+
+from src.core.config import settings
+from src.core.deadline import call_timeout
+from src.core.metrics import metrics
+from src.core.ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_TOKEN_URI = "https://oauth2.googleapis.com/token"
+
+
+class TokenRevokedError(Exception):
+    """Refresh token пользователя отозван (invalid_grant) - нужен повторный вход."""
+
+
+def build_google_credentials(refresh_token: str) -> Credentials:
+    """
+    Собирает Credentials пользователя из сохраненного refresh_token.
+    Access token не заполнен - он будет получен при первом refresh.
+    """
+    return Credentials.from_authorized_user_info(
+        info={
+            "refresh_token": refresh_token,
+            "client_id": settings.GOOGLE_CLIENT_ID,
+            "client_secret": settings.GOOGLE_CLIENT_SECRET,
+            "token_uri": GOOGLE_TOKEN_URI,
+        },
+        scopes=settings.SCOPES
+    )
+
+
+def _utcnow() -> datetime.datetime:
+    # google-auth хранит expiry как naive UTC
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def _is_invalid_grant(error: Exception) -> bool:
+    return "invalid_grant" in str(error)
+
+
+def _clear_revoked_token_in_db(google_id: str, refresh_token: str) -> None:
+    from src.core.database import get_db_session
+    from src.users import crud as users_crud
+
+    with get_db_session() as db:
+        users_crud.clear_refresh_token(db, google_id, refresh_token)
+
+
+class _TimeoutRequest:
+    """
+    Транспорт google-auth с явным таймаутом: сам refresh его не передает, и без
+    него обмен токена ждет по умолчанию до 120 секунд. На пути запроса таймаут
+    ограничен остатком его бюджета.
+    """
+
+    def __init__(self, request: google_requests.Request):
+        self._request = request
+
+    def __call__(self, url, method="GET", body=None, headers=None, timeout=None, **kwargs):
+        return self._request(url, method=method, body=body, headers=headers,
+                             timeout=call_timeout(settings.GOOGLE_CALL_TIMEOUT_SECONDS), **kwargs)
+
+
+class _Entry:
+    __slots__ = ("refresh_token", "creds", "last_seen")
+
+    def __init__(self, refresh_token: str, creds: Credentials):
+        self.refresh_token = refresh_token
+        self.creds = creds
+        self.last_seen = time.monotonic()
+
+
+class TokenRefreshManager:
+    """
+    Хранит Credentials активных пользователей и обновляет access token в фоне
+    незадолго до истечения, чтобы интерактивные запросы не ждали creds.refresh().
+
+    - Пользователь считается активным active_window_seconds после последнего запроса.
+    - Фоновые обновления ограничены token bucket'ом.
+    - При invalid_grant пользователь помечается отозванным: запросы с тем же
+      refresh token сразу получают 403, а токен удаляется из БД.
+    """
+
+    def __init__(self, refresh_ahead_seconds: float, active_window_seconds: float, max_refreshes_per_second: float,
+                 request_factory: Callable[[], google_requests.Request] = google_requests.Request,
+                 on_revoked: Callable[[str, str], None] = _clear_revoked_token_in_db):
+        self.refresh_ahead = datetime.timedelta(seconds=refresh_ahead_seconds)
+        self.active_window_seconds = active_window_seconds
+        self.request_factory = request_factory
+        self.on_revoked = on_revoked
+        self._bucket = TokenBucket(rate=max_refreshes_per_second)
+        self._lock = threading.Lock()
+        self._entries: Dict[str, _Entry] = {}
+        self._revoked: Dict[str, str] = {}  # google_id -> отозванный refresh token
+
+    # --- Путь запроса ---
+
+    def is_revoked(self, google_id: str, refresh_token: Optional[str]) -> bool:
+        with self._lock:
+            return refresh_token is not None and self._revoked.get(google_id) == refresh_token
+
+    def get_credentials(self, google_id: str, refresh_token: str, track_activity: bool = True) -> Credentials:
+        """
+        Возвращает закэшированные Credentials пользователя (или создает новые).
+
+        Raises:
+            TokenRevokedError: Если этот refresh token уже отозван.
+        """
+        with self._lock:
+            if self._revoked.get(google_id) == refresh_token:
+                raise TokenRevokedError(f"Refresh token of user {google_id} was revoked")
+            entry = self._entries.get(google_id)
+            if entry is None or entry.refresh_token != refresh_token:
+                entry = _Entry(refresh_token, build_google_credentials(refresh_token))
+                self._entries[google_id] = entry
+            if track_activity:
+                entry.last_seen = time.monotonic()
+            return entry.creds
+
+    def store(self, google_id: str, creds: Credentials) -> None:
+        """Сохраняет только что полученные при логине Credentials (с действующим access token)."""
+        if not creds.refresh_token:
+            return
+        with self._lock:
+            self._revoked.pop(google_id, None)
+            self._entries[google_id] = _Entry(creds.refresh_token, creds)
+
+    def ensure_fresh(self, google_id: str, creds: Credentials) -> None:
+        """
+        Обновляет токен на пути запроса, только если фоновое обновление не успело
+        (первый запрос пользователя или задержка планировщика).
+
+        Raises:
+            TokenRevokedError: Если Google ответил invalid_grant.
+        """
+        if creds.valid:
+            return
+        metrics.inc("token_refresh_on_request_total")
+        try:
+            creds.refresh(_TimeoutRequest(self.request_factory()))
+        except RefreshError as e:
+            if _is_invalid_grant(e):
+                self._mark_revoked(google_id, creds.refresh_token)
+                raise TokenRevokedError(str(e)) from e
+            raise
+
+    # --- Фоновое обновление ---
+
+    def _due_entries(self) -> List[Tuple[str, _Entry]]:
+        now = time.monotonic()
+        threshold = _utcnow() + self.refresh_ahead
+        due = []
+        with self._lock:
+            for google_id, entry in list(self._entries.items()):
+                if now - entry.last_seen > self.active_window_seconds:
+                    # Неактивных пользователей забываем - Credentials создадутся заново при следующем запросе
+                    del self._entries[google_id]
+                    continue
+                expiry = entry.creds.expiry
+                if entry.creds.token is None or expiry is None or expiry <= threshold:
+                    due.append((google_id, entry))
+            metrics.set_gauge("token_active_users", len(self._entries))
+            metrics.set_gauge("token_revoked_users", len(self._revoked))
+        # Первыми обновляем те, что истекают раньше
+        due.sort(key=lambda item: item[1].creds.expiry or datetime.datetime.min)
+        return due
+
+    def refresh_due(self) -> int:
+        """
+        Задача планировщика: обновляет токены активных пользователей, истекающие
+        в ближайшие refresh_ahead секунд.
+
+        Returns:
+            Количество успешно обновленных токенов.
+        """
+        refreshed = 0
+        for google_id, entry in self._due_entries():
+            if not self._bucket.try_acquire():
+                # Остальные обновим на следующем тике планировщика
+                metrics.inc("token_refresh_total", result="rate_limited")
+                break
+            if self._refresh_entry(google_id, entry):
+                refreshed += 1
+        return refreshed
+
+    def _refresh_entry(self, google_id: str, entry: _Entry) -> bool:
+        # Обновляем копию, а не объект, которым сейчас могут пользоваться запросы
+        new_creds = build_google_credentials(entry.refresh_token)
+        started = time.perf_counter()
+        try:
+            new_creds.refresh(_TimeoutRequest(self.request_factory()))
+        except RefreshError as e:
+            if _is_invalid_grant(e):
+                logger.warning("Refresh token of user %s was revoked: %s", google_id, e)
+                self._mark_revoked(google_id, entry.refresh_token)
+                metrics.inc("token_refresh_total", result="revoked")
+            else:
+                logger.error("Background token refresh failed for user %s: %s", google_id, e)
+                metrics.inc("token_refresh_total", result="error")
+            return False
+        except Exception as e:
+            logger.error("Background token refresh failed for user %s: %s", google_id, e, exc_info=True)
+            metrics.inc("token_refresh_total", result="error")
+            return False
+        finally:
+            metrics.observe("token_refresh_seconds", time.perf_counter() - started)
+
+        with self._lock:
+            current = self._entries.get(google_id)
+            if current is not None and current.refresh_token == entry.refresh_token:
+                current.creds = new_creds
+        metrics.inc("token_refresh_total", result="ok")
+        return True
+
+    def _mark_revoked(self, google_id: str, refresh_token: Optional[str]) -> None:
+        if not refresh_token:
+            return
+        with self._lock:
+            self._revoked[google_id] = refresh_token
+            entry = self._entries.get(google_id)
+            if entry is not None and entry.refresh_token == refresh_token:
+                del self._entries[google_id]
+        try:
+            self.on_revoked(google_id, refresh_token)
+        except Exception as e:
+            logger.error("Failed to clear revoked refresh token of user %s: %s", google_id, e, exc_info=True)
+
+
+token_manager = TokenRefreshManager(
+    refresh_ahead_seconds=settings.TOKEN_REFRESH_AHEAD_SECONDS,
+    active_window_seconds=settings.TOKEN_ACTIVE_USER_WINDOW_SECONDS,
+    max_refreshes_per_second=settings.TOKEN_REFRESH_RATE_PER_SECOND,
+)
@@ -0,0 +1,249 @@
+# src/calendar/cache.py
+import bisect
+import datetime
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+logger = logging.getLogger(__name__)
+
+
+def parse_event_time(value: str) -> datetime.datetime:
+    """
+    Преобразует startTime/endTime события (дата или дата-время ISO 8601)
+    в datetime с таймзоной. Даты all-day событий считаются полуночью UTC -
+    так же, как get_events строит timeMin/timeMax.
+    """
+    if len(value) == 10:
+        return datetime.datetime.combine(datetime.date.fromisoformat(value), datetime.time.min, tzinfo=datetime.timezone.utc)
+    parsed = datetime.datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed
+
+
+def range_bounds(start_date: datetime.date, end_date: datetime.date) -> Tuple[datetime.datetime, datetime.datetime]:
+    """Границы [timeMin, timeMax) для диапазона дат включительно."""
+    time_min = datetime.datetime.combine(start_date, datetime.time.min, tzinfo=datetime.timezone.utc)
+    time_max = datetime.datetime.combine(end_date + datetime.timedelta(days=1), datetime.time.min, tzinfo=datetime.timezone.utc)
+    return time_min, time_max
+
+
+def merge_date_ranges(ranges: Iterable[Tuple[datetime.date, datetime.date]],
+                      max_gap_days: int = 0) -> List[Tuple[datetime.date, datetime.date]]:
+    """
+    Объединяет диапазоны дат (включительно) в минимальный набор непересекающихся окон.
+    Диапазоны, между которыми не больше max_gap_days пропущенных дней, сливаются:
+    загрузить короткий промежуток дешевле, чем сделать еще один запрос к Google.
+    """
+    merged: List[Tuple[datetime.date, datetime.date]] = []
+    for start, end in sorted(ranges):
+        if merged and (start - merged[-1][1]).days - 1 <= max_gap_days:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def event_overlaps(event: Dict[str, Any], time_min: datetime.datetime, time_max: datetime.datetime) -> bool:
+    """Та же семантика, что у Google: end > timeMin и start < timeMax."""
+    start = parse_event_time(event['startTime'])
+    end = parse_event_time(event['endTime'])
+    if end == start:
+        return time_min <= start < time_max
+    return end > time_min and start < time_max
+
+
+def event_interval(start_time: str, end_time: str, time_zone: Optional[str] = None) -> Tuple[datetime.datetime, datetime.datetime]:
+    """
+    Интервал события со временем как пара aware datetime. Время без смещения
+    (так его присылает клиент вместе с timeZoneId) трактуется в time_zone.
+
+    Raises:
+        ValueError: Если время или таймзона невалидны.
+    """
+    try:
+        tz = ZoneInfo(time_zone) if time_zone else datetime.timezone.utc
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown time zone: {time_zone}")
+    bounds = []
+    for value in (start_time, end_time):
+        parsed = datetime.datetime.fromisoformat(value)
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=tz)
+        bounds.append(parsed)
+    return bounds[0], bounds[1]
+
+
+class IntervalIndex:
+    """
+    Статический индекс интервалов событий со временем: начала отсортированы,
+    поэтому пересечения с [start, end) ищутся бинарным поиском в окне
+    [start - максимальная длительность, end). All-day события не индексируются.
+    """
+
+    def __init__(self, events: Iterable[Dict[str, Any]]):
+        items = []
+        for event in events:
+            if event.get('isAllDay'):
+                continue
+            try:
+                start = parse_event_time(event['startTime']).timestamp()
+                end = parse_event_time(event['endTime']).timestamp()
+            except (KeyError, TypeError, ValueError):
+                continue
+            items.append((start, end, event))
+        items.sort(key=lambda item: item[0])
+        self._starts = [item[0] for item in items]
+        self._ends = [item[1] for item in items]
+        self._events = [item[2] for item in items]
+        self._max_duration = max((end - start for start, end, _ in items), default=0.0)
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def overlapping(self, start: datetime.datetime, end: datetime.datetime) -> List[Dict[str, Any]]:
+        """События, которые пересекаются с [start, end) (касание границ - не пересечение)."""
+        start_ts, end_ts = start.timestamp(), end.timestamp()
+        lo = bisect.bisect_left(self._starts, start_ts - self._max_duration)
+        hi = bisect.bisect_left(self._starts, end_ts)
+        return [self._events[i] for i in range(lo, hi) if self._ends[i] > start_ts]
+
+
+class _Window:
+    __slots__ = ("start_date", "end_date", "events", "stored_at", "invalidated", "intervals")
+
+    def __init__(self, start_date: datetime.date, end_date: datetime.date, events: List[Dict[str, Any]]):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.events = events
+        self.stored_at = time.monotonic()
+        # Инвалидированное окно не отдается как свежее, но остается последним известным результатом
+        self.invalidated = False
+        # Индекс интервалов строится при первой проверке конфликтов в этом окне
+        self.intervals: Optional[IntervalIndex] = None
+
+    def covers(self, start_date: datetime.date, end_date: datetime.date) -> bool:
+        return self.start_date <= start_date and end_date <= self.end_date
+
+
+class RangeCache:
+    """
+    In-process кэш распарсенных событий по окнам дат для каждого пользователя.
+
+    Запрос обслуживается из любого свежего окна, которое покрывает диапазон
+    целиком (события фильтруются по пересечению). Инвалидация - по пользователю:
+    после мутаций и push-уведомлений Google. Кэш живет в памяти процесса,
+    поэтому TTL ограничивает устаревание в остальных воркерах.
+
+    Просроченные и инвалидированные окна не удаляются, пока их не вытеснят
+    новые: get_stale() отдает их, когда Google недоступен.
+    """
+
+    def __init__(self, ttl_seconds: float, max_windows_per_user: int = 16):
+        self.ttl_seconds = ttl_seconds
+        self.max_windows_per_user = max_windows_per_user
+        self._lock = threading.Lock()
+        self._windows: Dict[str, "OrderedDict[Tuple[datetime.date, datetime.date], _Window]"] = {}
+        self._generations: Dict[str, int] = {}
+
+    def generation(self, user: str) -> int:
+        """Текущее поколение данных пользователя; передается в put(), чтобы не сохранить устаревшее."""
+        with self._lock:
+            return self._generations.get(user, 0)
+
+    def get(self, user: str, start_date: datetime.date, end_date: datetime.date) -> Optional[List[Dict[str, Any]]]:
+        window = self._find(user, start_date, end_date)
+        if window is None:
+            return None
+        if (window.start_date, window.end_date) == (start_date, end_date):
+            return list(window.events)
+        time_min, time_max = range_bounds(start_date, end_date)
+        return [e for e in window.events if event_overlaps(e, time_min, time_max)]
+
+    def get_stale(self, user: str, start_date: datetime.date, end_date: datetime.date,
+                  max_age_seconds: float) -> Optional[Tuple[List[Dict[str, Any]], float]]:
+        """
+        Последний сохраненный результат для диапазона - без учета TTL и инвалидации
+        (для выдачи при недоступности Google).
+
+        Returns:
+            (события, возраст в секундах) или None, если подходящего окна нет.
+        """
+        now = time.monotonic()
+        with self._lock:
+            windows = self._windows.get(user)
+            candidates = [
+                w for w in (windows.values() if windows else ())
+                if w.covers(start_date, end_date) and now - w.stored_at <= max_age_seconds
+            ]
+            if not candidates:
+                return None
+            window = max(candidates, key=lambda w: w.stored_at)
+        time_min, time_max = range_bounds(start_date, end_date)
+        events = [e for e in window.events if event_overlaps(e, time_min, time_max)]
+        return events, now - window.stored_at
+
+    def find_overlapping(self, user: str, start: datetime.datetime, end: datetime.datetime) -> Optional[List[Dict[str, Any]]]:
+        """
+        События со временем, пересекающиеся с [start, end), из свежего окна,
+        покрывающего этот интервал. None - если такого окна нет.
+        """
+        start_date = start.astimezone(datetime.timezone.utc).date()
+        end_date = max(start_date, (end - datetime.timedelta(microseconds=1)).astimezone(datetime.timezone.utc).date())
+        window = self._find(user, start_date, end_date)
+        if window is None:
+            return None
+        if window.intervals is None:
+            # Окно не меняется после сохранения: повторная сборка в гонке даст тот же индекс
+            window.intervals = IntervalIndex(window.events)
+        return window.intervals.overlapping(start, end)
+
+    def _find(self, user: str, start_date: datetime.date, end_date: datetime.date) -> Optional[_Window]:
+        now = time.monotonic()
+        with self._lock:
+            windows = self._windows.get(user)
+            if not windows:
+                return None
+            exact = windows.get((start_date, end_date))
+            candidates = [exact] if exact is not None else [w for w in windows.values() if w.covers(start_date, end_date)]
+            for window in candidates:
+                if not window.invalidated and now - window.stored_at <= self.ttl_seconds:
+                    windows.move_to_end((window.start_date, window.end_date))
+                    return window
+        return None
+
+    def put(self, user: str, start_date: datetime.date, end_date: datetime.date,
+            events: List[Dict[str, Any]], generation: Optional[int] = None) -> bool:
+        """
+        Сохраняет окно. Если с момента получения generation данные пользователя
+        были инвалидированы, окно не сохраняется.
+
+        Returns:
+            True, если окно сохранено.
+        """
+        with self._lock:
+            if generation is not None and generation != self._generations.get(user, 0):
+                logger.debug("Skipping cache put for %s: data changed during fetch", user)
+                return False
+            windows = self._windows.setdefault(user, OrderedDict())
+            windows[(start_date, end_date)] = _Window(start_date, end_date, list(events))
+            windows.move_to_end((start_date, end_date))
+            while len(windows) > self.max_windows_per_user:
+                windows.popitem(last=False)
+            return True
+
+    def invalidate_user(self, user: str) -> None:
+        with self._lock:
+            self._generations[user] = self._generations.get(user, 0) + 1
+            for window in self._windows.get(user, {}).values():
+                window.invalidated = True
+
+    def clear(self) -> None:
+        with self._lock:
+            for user in self._windows:
+                self._generations[user] = self._generations.get(user, 0) + 1
+            self._windows.clear()
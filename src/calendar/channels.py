@@ -0,0 +1,192 @@
+# src/calendar/channels.py
+import logging
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from src.core.config import settings
+from src.core.security import sign_value, unsign_value
+from .service import GoogleCalendarService, invalidate_user_data
+from .search import search_index
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_TOKEN_PURPOSE = "watch-channel"
+
+# Состояния X-Goog-Resource-State, которые означают изменение данных
+CHANGE_STATES = {"exists", "not_exists"}
+
+
+@dataclass
+class WatchChannel:
+    channel_id: str
+    resource_id: str
+    google_id: str
+    user_email: str
+    expiration: float  # epoch, секунды
+
+
+def service_for_user(google_id: str) -> Optional[GoogleCalendarService]:
+    """Собирает сервис календаря пользователя вне HTTP-запроса (для фоновых задач)."""
+    from src.core.database import get_db_session
+    from src.users import crud as users_crud
+    from src.auth.tokens import token_manager
+
+    with get_db_session() as db:
+        user = users_crud.get_user_by_google_id(db, google_id)
+        if not user or not user.refresh_token:
+            return None
+        creds = token_manager.get_credentials(google_id, user.refresh_token, track_activity=False)
+        return GoogleCalendarService(creds=creds, user_email=user.email, google_id=google_id)
+
+
+class WatchChannelManager:
+    """
+    Управляет каналами push-уведомлений Google (events.watch) по пользователям.
+
+    Пользователи, обращавшиеся к календарю, отмечаются через track_user().
+    Фоновая задача sync_channels() регистрирует для них каналы и продлевает те,
+    что скоро истекут; каналы пользователей, не обращавшихся к календарю дольше
+    active_window_seconds, останавливаются. Токен канала подписан и содержит email пользователя,
+    поэтому уведомление может обработать любой воркер, даже не регистрировавший канал.
+    """
+
+    def __init__(self, webhook_url: Optional[str], ttl_seconds: int, renew_before_seconds: int,
+                 active_window_seconds: float,
+                 service_factory: Callable[[str], Optional[GoogleCalendarService]] = service_for_user):
+        self.webhook_url = webhook_url
+        self.ttl_seconds = ttl_seconds
+        self.renew_before_seconds = renew_before_seconds
+        self.active_window_seconds = active_window_seconds
+        self.service_factory = service_factory
+        self._lock = threading.Lock()
+        self._channels: Dict[str, WatchChannel] = {}  # google_id -> канал
+        self._tracked: Dict[str, float] = {}  # google_id -> последнее обращение (monotonic)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.webhook_url)
+
+    def track_user(self, google_id: str, user_email: str) -> None:
+        """Отмечает пользователя как активного: ему нужен канал уведомлений."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._tracked[google_id] = time.monotonic()
+
+    def get_channel(self, google_id: str) -> Optional[WatchChannel]:
+        with self._lock:
+            return self._channels.get(google_id)
+
+    def register(self, calendar_service: GoogleCalendarService, google_id: str) -> WatchChannel:
+        """Регистрирует новый канал; старый канал пользователя останавливается."""
+        channel_id = str(uuid.uuid4())
+        token = sign_value(calendar_service.user_email, CHANNEL_TOKEN_PURPOSE)
+        response = calendar_service.watch_events(channel_id, self.webhook_url, token, self.ttl_seconds)
+        expiration_ms = response.get('expiration')
+        channel = WatchChannel(
+            channel_id=channel_id,
+            resource_id=response['resourceId'],
+            google_id=google_id,
+            user_email=calendar_service.user_email,
+            expiration=int(expiration_ms) / 1000 if expiration_ms else time.time() + self.ttl_seconds,
+        )
+        with self._lock:
+            previous = self._channels.get(google_id)
+            self._channels[google_id] = channel
+        if previous:
+            self._stop_quietly(calendar_service, previous)
+        # Пока канала не было, кэш мог пропустить изменения
+        invalidate_user_data(calendar_service.user_email)
+        search_index.mark_stale(calendar_service.user_email)
+        return channel
+
+    def _needs_channel(self, google_id: str, now: float) -> bool:
+        channel = self._channels.get(google_id)
+        return channel is None or channel.expiration - now <= self.renew_before_seconds
+
+    def sync_channels(self) -> None:
+        """Фоновая задача: регистрирует недостающие каналы, продлевает истекающие и останавливает неактивные."""
+        if not self.enabled:
+            return
+        now = time.time()
+        seen_after = time.monotonic() - self.active_window_seconds
+        with self._lock:
+            inactive = [g for g, last_seen in self._tracked.items() if last_seen < seen_after]
+            for google_id in inactive:
+                del self._tracked[google_id]
+            retired = [self._channels.pop(g) for g in inactive if g in self._channels]
+            due = [g for g in self._tracked if self._needs_channel(g, now)]
+        if retired:
+            logger.info("Stopping %s watch channel(s) of inactive users", len(retired))
+            self._stop_channels(retired)
+            for channel in retired:
+                # Без канала изменения больше не приходят: кэш и индекс пользователя нельзя считать актуальными
+                invalidate_user_data(channel.user_email)
+                search_index.mark_stale(channel.user_email)
+        for google_id in due:
+            try:
+                calendar_service = self.service_factory(google_id)
+                if calendar_service is None:
+                    logger.warning("Cannot (re)register watch channel for %s: no credentials.", google_id)
+                    with self._lock:
+                        self._tracked.pop(google_id, None)
+                    continue
+                self.register(calendar_service, google_id)
+            except Exception as e:
+                logger.error("Failed to (re)register watch channel for %s: %s", google_id, e, exc_info=True)
+
+    def handle_notification(self, channel_id: str, channel_token: Optional[str], resource_state: str) -> Optional[str]:
+        """
+        Обрабатывает уведомление Google.
+
+        Returns:
+            Email пользователя, чьи данные были инвалидированы, или None.
+
+        Raises:
+            PermissionError: Если токен канала не прошел проверку.
+        """
+        user_email = unsign_value(channel_token, CHANNEL_TOKEN_PURPOSE)
+        if user_email is None:
+            raise PermissionError(f"Invalid token for channel {channel_id}")
+        if resource_state not in CHANGE_STATES:
+            # 'sync' приходит один раз сразу после регистрации канала
+            logger.debug("Ignoring '%s' notification for channel %s", resource_state, channel_id)
+            return None
+        logger.info("Calendar change notification for %s (channel %s), dropping cached data.", user_email, channel_id)
+        invalidate_user_data(user_email)
+        # Что именно изменилось, неизвестно: индекс поиска остается, но до следующей синхронизации неполон
+        search_index.mark_stale(user_email)
+        return user_email
+
+    def stop_all(self) -> None:
+        """Останавливает все каналы процесса (при остановке приложения)."""
+        with self._lock:
+            channels: List[WatchChannel] = list(self._channels.values())
+            self._channels.clear()
+        self._stop_channels(channels)
+
+    def _stop_channels(self, channels: List[WatchChannel]) -> None:
+        for channel in channels:
+            try:
+                calendar_service = self.service_factory(channel.google_id)
+                if calendar_service is not None:
+                    self._stop_quietly(calendar_service, channel)
+            except Exception as e:
+                logger.warning("Failed to stop watch channel %s: %s", channel.channel_id, e)
+
+    def _stop_quietly(self, calendar_service: GoogleCalendarService, channel: WatchChannel) -> None:
+        try:
+            calendar_service.stop_channel(channel.channel_id, channel.resource_id)
+        except Exception as e:
+            logger.warning("Failed to stop watch channel %s: %s", channel.channel_id, e)
+
+
+channel_manager = WatchChannelManager(
+    webhook_url=settings.GOOGLE_WEBHOOK_URL,
+    ttl_seconds=settings.WATCH_CHANNEL_TTL_SECONDS,
+    renew_before_seconds=settings.WATCH_RENEW_BEFORE_SECONDS,
+    active_window_seconds=settings.WATCH_ACTIVE_USER_WINDOW_SECONDS,
+)
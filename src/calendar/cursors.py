@@ -0,0 +1,41 @@
+# src/calendar/cursors.py
+import base64
+import json
+from typing import Any, Dict, Mapping, Optional
+
+
+def encode_cursor(kind: str, state: Dict[str, Any]) -> str:
+    """Кодирует состояние постраничного чтения в непрозрачную для клиента строку."""
+    payload = json.dumps({"k": kind, **state}, separators=(",", ":"), sort_keys=True)
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor: str, kind: str, required: Optional[Mapping[str, type]] = None,
+                  optional: Optional[Mapping[str, type]] = None) -> Dict[str, Any]:
+    """
+    Args:
+        required: Поля, которые обязаны быть в курсоре, и их типы.
+        optional: Поля, которые могут отсутствовать или быть null, и их типы.
+
+    Raises:
+        ValueError: Если курсор поврежден, выдан другим эндпоинтом или его поля не того типа.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        state = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor.")
+    if not isinstance(state, dict) or state.pop("k", None) != kind:
+        raise ValueError("Invalid cursor.")
+    for key, expected in (required or {}).items():
+        if not _is_instance(state.get(key), expected):
+            raise ValueError("Invalid cursor.")
+    for key, expected in (optional or {}).items():
+        if state.get(key) is not None and not _is_instance(state[key], expected):
+            raise ValueError("Invalid cursor.")
+    return state
+
+
+def _is_instance(value: Any, expected: type) -> bool:
+    # bool в JSON - не число, хотя в Python это подкласс int
+    return isinstance(value, expected) and (expected is bool or not isinstance(value, bool))
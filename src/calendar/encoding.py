@@ -0,0 +1,179 @@
+# src/calendar/encoding.py
+import logging
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from pydantic_core import to_json
+
+try:
+    import msgpack
+except ImportError:  # msgpack - необязательная зависимость, без нее отдаем только JSON
+    msgpack = None
+
+from .schemas import CalendarEventResponse
+
+logger = logging.getLogger(__name__)
+
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+MSGPACK_MEDIA_TYPES = {MSGPACK_MEDIA_TYPE, "application/msgpack", "application/vnd.msgpack"}
+
+COLUMNAR_FORMAT_VERSION = 1
+# Набор и порядок полей тот же, что у JSON-ответа
+EVENT_FIELDS = list(CalendarEventResponse.model_fields)
+# Поля с большим количеством повторов кодируются словарем: значение -> индекс
+DICTIONARY_FIELDS = ("recurringEventId", "recurrenceRule")
+
+
+def msgpack_available() -> bool:
+    return msgpack is not None
+
+
+def wants_msgpack(accept: Optional[str]) -> bool:
+    """Content negotiation: MessagePack отдается, только если клиент явно его запросил."""
+    if not accept or msgpack is None:
+        return False
+    for part in accept.split(","):
+        media_type, _, params = part.strip().partition(";")
+        if media_type.strip().lower() in MSGPACK_MEDIA_TYPES:
+            return _quality(params) > 0
+    return False
+
+
+def _quality(params: str) -> float:
+    """q-value медиатипа из параметров Accept (RFC 9110, 12.4.2); по умолчанию 1."""
+    for param in params.split(";"):
+        name, _, value = param.partition("=")
+        if name.strip().lower() == "q":
+            try:
+                return float(value.strip())
+            except ValueError:
+                # Невалидный q не считаем явным запросом MessagePack
+                return 0.0
+    return 1.0
+
+
+def encode_events_columnar(events: List[Dict[str, Any]]) -> bytes:
+    """
+    Кодирует список событий в колоночный MessagePack:
+
+        {"v": 1, "n": <кол-во>,
+         "columns": {<поле>: [значения по событиям]},
+         "dict": {"recurringEventId": [...], "recurrenceRule": [...]}}
+
+    Для полей из DICTIONARY_FIELDS колонка содержит индексы в "dict"
+    (или None). Отсутствующие значения - None, как null в JSON-ответе.
+    """
+    columns: Dict[str, List[Any]] = {}
+    dictionaries: Dict[str, List[str]] = {}
+    for field in EVENT_FIELDS:
+        values = [event.get(field) for event in events]
+        if field in DICTIONARY_FIELDS:
+            index: Dict[str, int] = {}
+            values = [None if v is None else index.setdefault(v, len(index)) for v in values]
+            dictionaries[field] = list(index)
+        columns[field] = values
+    payload = {"v": COLUMNAR_FORMAT_VERSION, "n": len(events), "columns": columns, "dict": dictionaries}
+    return msgpack.packb(payload, use_bin_type=True)
+
+
+def decode_events_columnar(data: bytes) -> List[Dict[str, Any]]:
+    """Обратное преобразование (эталон для клиентов): возвращает те же объекты, что и JSON-ответ."""
+    payload = msgpack.unpackb(data, raw=False)
+    if payload.get("v") != COLUMNAR_FORMAT_VERSION:
+        raise ValueError(f"Unsupported columnar format version: {payload.get('v')}")
+    columns, dictionaries = payload["columns"], payload["dict"]
+    for field, values in dictionaries.items():
+        columns[field] = [None if i is None else values[i] for i in columns[field]]
+    names = list(columns)
+    return [dict(zip(names, row)) for row in zip(*(columns[name] for name in names))]
+
+
+COMPACT_FORMAT_VERSION = 1
+# Поля, которые экземпляры серии обычно повторяют за мастером
+SERIES_FIELDS = ("summary", "description", "location", "isAllDay", "recurrenceRule")
+
+
+def compact_series(events: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Компактное представление событий с повторяющимися сериями:
+
+        {"v": 1,
+         "series": [{"id": <recurringEventId>, общие поля экземпляров серии}],
+         "events": [одиночное событие целиком | экземпляр-дельта]}
+
+    Шаблон серии - самое частое значение каждого поля из SERIES_FIELDS среди
+    ее экземпляров в ответе. Экземпляр-дельта вместо recurringEventId содержит
+    "series" - индекс шаблона, а также id, startTime, endTime и только поля,
+    отличающиеся от шаблона (null - у экземпляра этого поля нет).
+    originalStartTime опускается, если совпадает со startTime; id вида
+    "<recurringEventId>_<время>" передается как "_<время>". Порядок событий сохраняется.
+    """
+    index: Dict[str, int] = {}
+    by_series: List[List[Dict[str, Any]]] = []
+    for event in events:
+        series_id = event.get('recurringEventId')
+        if series_id:
+            if series_id not in index:
+                index[series_id] = len(by_series)
+                by_series.append([])
+            by_series[index[series_id]].append(event)
+
+    series = []
+    for series_id, instances in zip(index, by_series):
+        template = {'id': series_id}
+        for field in SERIES_FIELDS:
+            value, _ = Counter(instance.get(field) for instance in instances).most_common(1)[0]
+            if value is not None:
+                template[field] = value
+        series.append(template)
+
+    items = []
+    for event in events:
+        series_id = event.get('recurringEventId')
+        if not series_id:
+            items.append(event)
+            continue
+        position = index[series_id]
+        template = series[position]
+        item: Dict[str, Any] = {'series': position}
+        for key, value in event.items():
+            if key == 'id':
+                item['id'] = value[len(series_id):] if value.startswith(series_id + '_') else value
+            elif key not in SERIES_FIELDS and key not in ('recurringEventId', 'originalStartTime'):
+                item[key] = value
+        for field in SERIES_FIELDS:
+            value = event.get(field)
+            if value != template.get(field):
+                item[field] = value
+        if event.get('originalStartTime') != event['startTime']:
+            item['originalStartTime'] = event.get('originalStartTime')
+        items.append(item)
+    return {"v": COMPACT_FORMAT_VERSION, "series": series, "events": items}
+
+
+def encode_compact_series(events: List[Dict[str, Any]]) -> bytes:
+    """JSON-тело ответа compact=true (сериализация pydantic-core, без валидации response_model)."""
+    return to_json(compact_series(events))
+
+
+def expand_series(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Обратное преобразование (эталон для клиентов): возвращает те же объекты,
+    что и JSON-ответ /calendar/events/range, включая null для отсутствующих полей.
+    """
+    if payload.get("v") != COMPACT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported compact format version: {payload.get('v')}")
+    series = payload["series"]
+    events = []
+    for item in payload["events"]:
+        if 'series' not in item:
+            events.append({field: item.get(field) for field in EVENT_FIELDS})
+            continue
+        template = series[item['series']]
+        event = {**template, **item, 'recurringEventId': template['id']}
+        if item['id'].startswith('_'):
+            event['id'] = template['id'] + item['id']
+        if 'originalStartTime' not in item:
+            event['originalStartTime'] = item['startTime']
+        events.append({field: event.get(field) for field in EVENT_FIELDS})
+    return events
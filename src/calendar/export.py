@@ -0,0 +1,149 @@
+# src/calendar/export.py
+import datetime
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from email.utils import format_datetime
+from typing import Callable, List, Optional
+
+from src.core.config import settings
+from src.core.metrics import metrics
+from src.core.security import sign_value, unsign_value
+from .channels import service_for_user
+from .ics import CALENDAR_FOOTER, calendar_header, to_vevent
+from .service import GoogleCalendarService, is_upstream_failure, range_cache
+from .singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+FEED_TOKEN_PURPOSE = "ics-feed"
+
+
+def feed_token(google_id: str) -> str:
+    """Токен ссылки подписки: подписчики (другие календари) не умеют передавать наш Bearer."""
+    return sign_value(google_id, FEED_TOKEN_PURPOSE)
+
+
+def feed_user(token: Optional[str]) -> Optional[str]:
+    """google_id владельца ленты или None, если подпись не сошлась."""
+    return unsign_value(token, FEED_TOKEN_PURPOSE)
+
+
+class IcsFeed:
+    """Собранная лента пользователя: части тела (по VEVENT) и валидаторы для условных запросов."""
+
+    __slots__ = ("user_email", "chunks", "size", "etag", "last_modified", "built_at", "generation")
+
+    def __init__(self, user_email: str, chunks: List[bytes], last_modified: datetime.datetime, generation: int):
+        self.user_email = user_email
+        self.chunks = chunks
+        self.size = sum(len(chunk) for chunk in chunks)
+        digest = hashlib.sha256()
+        for chunk in chunks:
+            digest.update(chunk)
+        self.etag = f'"{digest.hexdigest()[:32]}"'
+        self.last_modified = last_modified
+        self.built_at = time.monotonic()
+        self.generation = generation
+
+    @property
+    def last_modified_header(self) -> str:
+        return format_datetime(self.last_modified, usegmt=True)
+
+    def not_modified(self, if_none_match: Optional[str], if_modified_since: Optional[str]) -> bool:
+        """Условный запрос подписчика: If-None-Match важнее If-Modified-Since (RFC 9110, 13.2.2)."""
+        if if_none_match is not None:
+            tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            return "*" in tags or self.etag in tags
+        if if_modified_since is not None:
+            try:
+                since = datetime.datetime.strptime(if_modified_since, "%a, %d %b %Y %H:%M:%S GMT")
+            except ValueError:
+                return False
+            return self.last_modified.replace(microsecond=0) <= since.replace(tzinfo=datetime.timezone.utc)
+        return False
+
+
+class IcsFeedCache:
+    """
+    Ленты .ics для подписок (GET /calendar/export.ics). Лента собирается
+    одним проходом events.list без раскрытия серий (серии - мастер-событиями
+    с RRULE) и хранится ttl_seconds. Мутации и push-уведомления сбрасывают
+    ее вместе с кэшем диапазонов (поколение range_cache пользователя), поэтому
+    частые опросы без изменений отвечают 304 без обращения к Google.
+    Тело детерминировано (DTSTAMP - время последнего изменения), так что
+    пересборка без изменений дает тот же ETag.
+    """
+
+    def __init__(self, ttl_seconds: float, past_days: int, max_feeds: int,
+                 service_factory: Callable[[str], Optional[GoogleCalendarService]] = service_for_user):
+        self.ttl_seconds = ttl_seconds
+        self.past_days = past_days
+        self.max_feeds = max_feeds
+        self.service_factory = service_factory
+        self._lock = threading.Lock()
+        self._feeds: "OrderedDict[str, IcsFeed]" = OrderedDict()
+        self._flight = SingleFlight()
+
+    def get(self, google_id: str) -> Optional[IcsFeed]:
+        """
+        Свежая лента из кэша или собранная заново; None, если у пользователя нет доступа к Google.
+        Если Google недоступен, отдается прежняя лента.
+
+        Raises:
+            HttpError: В случае ошибки от Google Calendar API.
+        """
+        with self._lock:
+            feed = self._feeds.get(google_id)
+            if feed is not None:
+                self._feeds.move_to_end(google_id)
+        if feed is not None and self._is_fresh(feed):
+            metrics.inc("ics_feed_requests_total", result="hit")
+            return feed
+        metrics.inc("ics_feed_requests_total", result="miss")
+        try:
+            return self._flight.do(google_id, lambda: self._build(google_id), owner=google_id)
+        except Exception as e:
+            if feed is None or not is_upstream_failure(e):
+                raise
+            # Как и у диапазонов: пока Google недоступен, подписчик получает последнюю собранную ленту
+            logger.warning("Google unavailable for %s (%s), serving the previous ICS feed", feed.user_email, e)
+            metrics.inc("ics_feed_requests_total", result="stale")
+            return feed
+
+    def _is_fresh(self, feed: IcsFeed) -> bool:
+        return (time.monotonic() - feed.built_at < self.ttl_seconds
+                and range_cache.generation(feed.user_email) == feed.generation)
+
+    def _build(self, google_id: str) -> Optional[IcsFeed]:
+        calendar_service = self.service_factory(google_id)
+        if calendar_service is None:
+            return None
+        generation = range_cache.generation(calendar_service.user_email)
+        started = time.perf_counter()
+        since = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=self.past_days)
+        events, cancelled, last_updated = calendar_service.get_export_events(since)
+        last_modified = (datetime.datetime.fromisoformat(last_updated.replace("Z", "+00:00")) if last_updated
+                         else datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc))
+        stamp = last_modified.astimezone(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        chunks = [calendar_header(calendar_service.user_email).encode()]
+        chunks.extend(to_vevent(event, stamp, cancelled.get(event.id, ())).encode() for event in events)
+        chunks.append(CALENDAR_FOOTER.encode())
+        feed = IcsFeed(calendar_service.user_email, chunks, last_modified, generation)
+        metrics.observe("ics_feed_build_seconds", time.perf_counter() - started)
+        logger.info("Built ICS feed for %s: %s events, %s bytes", calendar_service.user_email, len(events), feed.size)
+        with self._lock:
+            self._feeds[google_id] = feed
+            self._feeds.move_to_end(google_id)
+            while len(self._feeds) > self.max_feeds:
+                self._feeds.popitem(last=False)
+        return feed
+
+
+ics_feeds = IcsFeedCache(
+    ttl_seconds=settings.EXPORT_CACHE_TTL_SECONDS,
+    past_days=settings.EXPORT_PAST_DAYS,
+    max_feeds=settings.EXPORT_MAX_CACHED_FEEDS,
+)
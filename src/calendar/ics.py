@@ -0,0 +1,330 @@
+# src/calendar/ics.py
+import datetime
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from .schemas import CreateEventRequest
+from .service import SimpleCalendarEvent
+
+# Разбор и запись iCalendar (RFC 5545) без внешних библиотек: при разборе файл
+# читается построчно, в памяти держится только текущий VEVENT.
+
+Property = Tuple[Dict[str, str], str]  # (параметры, значение)
+
+_DATE_TIME = re.compile(r'(\d{8})T(\d{6})(Z?)')
+_DURATION = re.compile(r'([+-])?P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?')
+_PARAM = re.compile(r'(?:[^;"]|"[^"]*")+')
+_ESCAPED = re.compile(r'\\([\\;,nN])')
+# Правила повторения, которые Google принимает в поле recurrence
+RECURRENCE_PROPERTIES = ('RRULE', 'EXRULE', 'RDATE', 'EXDATE')
+
+
+class IcsError(ValueError):
+    """VEVENT нельзя перенести в Google Calendar."""
+
+
+class IcsSkipped(IcsError):
+    """VEVENT намеренно пропущен (отмененное событие, измененный экземпляр серии)."""
+
+
+def unfold(lines: Iterable[str]) -> Iterator[Tuple[int, str]]:
+    """Склеивает перенесенные строки (продолжение начинается с пробела или табуляции). Отдает (номер строки, строка)."""
+    current: Optional[str] = None
+    start = 0
+    for number, line in enumerate(lines, 1):
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and current is not None:
+            current += line[1:]
+            continue
+        if current:
+            yield start, current
+        current, start = line, number
+    if current:
+        yield start, current
+
+
+def parse_line(line: str) -> Tuple[str, Dict[str, str], str]:
+    """'NAME;PARAM=value:значение' -> (NAME, {PARAM: value}, значение). Двоеточие в кавычках параметра - не разделитель."""
+    in_quotes = False
+    for i, char in enumerate(line):
+        if char == '"':
+            in_quotes = not in_quotes
+        elif char == ':' and not in_quotes:
+            break
+    else:
+        raise IcsError(f"Malformed content line: {line[:80]!r}")
+    head, value = line[:i], line[i + 1:]
+    parts = _PARAM.findall(head)
+    if not parts:
+        raise IcsError(f"Malformed content line: {line[:80]!r}")
+    params = {}
+    for part in parts[1:]:
+        key, _, param_value = part.partition('=')
+        params[key.strip().upper()] = param_value.strip('"')
+    return parts[0].strip().upper(), params, value
+
+
+def unescape_text(value: str) -> str:
+    return _ESCAPED.sub(lambda m: '\n' if m.group(1) in 'nN' else m.group(1), value)
+
+
+class VEvent:
+    """Свойства одного VEVENT в порядке появления; line - номер строки BEGIN:VEVENT."""
+
+    __slots__ = ('line', 'props', 'error')
+
+    def __init__(self, line: int):
+        self.line = line
+        self.props: Dict[str, List[Property]] = {}
+        self.error: Optional[str] = None
+
+    def first(self, name: str) -> Optional[Property]:
+        values = self.props.get(name)
+        return values[0] if values else None
+
+    def text(self, name: str) -> Optional[str]:
+        prop = self.first(name)
+        return unescape_text(prop[1]) if prop is not None else None
+
+    @property
+    def uid(self) -> Optional[str]:
+        prop = self.first('UID')
+        return prop[1].strip() if prop is not None and prop[1].strip() else None
+
+
+class IcsReader:
+    """
+    Потоковый разбор .ics: итерация отдает VEVENT по одному. Вложенные
+    компоненты (VALARM, VTIMEZONE) пропускаются; time_zone - часовой пояс
+    календаря (X-WR-TIMEZONE), если он уже встретился.
+    """
+
+    def __init__(self, lines: Iterable[str]):
+        self._lines = lines
+        self.time_zone: Optional[str] = None
+
+    def __iter__(self) -> Iterator[VEvent]:
+        stack: List[str] = []
+        event: Optional[VEvent] = None
+        for number, line in unfold(self._lines):
+            if not line.strip():
+                continue
+            try:
+                name, params, value = parse_line(line)
+            except IcsError as e:
+                if event is not None and event.error is None:
+                    event.error = f"line {number}: {e}"
+                continue
+            if name == 'BEGIN':
+                component = value.strip().upper()
+                stack.append(component)
+                if component == 'VEVENT' and event is None:
+                    event = VEvent(number)
+            elif name == 'END':
+                component = value.strip().upper()
+                if stack:
+                    stack.pop()
+                if component == 'VEVENT' and event is not None:
+                    yield event
+                    event = None
+            elif event is not None and stack and stack[-1] == 'VEVENT':
+                event.props.setdefault(name, []).append((params, value))
+            elif name == 'X-WR-TIMEZONE' and stack == ['VCALENDAR']:
+                self.time_zone = value.strip() or None
+
+
+def _zone(name: str) -> Tuple[str, ZoneInfo]:
+    """TZID -> (имя IANA, зона). Некоторые программы пишут путь: /mozilla.org/20050126_1/Europe/Berlin."""
+    candidates = [name]
+    if '/' in name:
+        candidates.append('/'.join(name.strip('/').split('/')[-2:]))
+    for candidate in candidates:
+        try:
+            return candidate, ZoneInfo(candidate)
+        except (ZoneInfoNotFoundError, ValueError):
+            continue
+    raise IcsError(f"Unknown time zone {name!r}")
+
+
+def _parse_time(prop: Property, default_tz: Optional[str]) -> Tuple[Union[datetime.date, datetime.datetime], Optional[str]]:
+    """DTSTART/DTEND -> (дата у all-day или aware datetime, часовой пояс события)."""
+    params, value = prop
+    value = value.strip()
+    if params.get('VALUE', '').upper() == 'DATE' or re.fullmatch(r'\d{8}', value):
+        try:
+            return datetime.datetime.strptime(value[:8], '%Y%m%d').date(), None
+        except ValueError:
+            raise IcsError(f"Invalid date {value!r}")
+    match = _DATE_TIME.fullmatch(value)
+    if not match:
+        raise IcsError(f"Unsupported date-time {value!r}")
+    try:
+        naive = datetime.datetime.strptime(match.group(1) + match.group(2), '%Y%m%d%H%M%S')
+    except ValueError:
+        raise IcsError(f"Invalid date-time {value!r}")
+    if match.group(3):
+        # UTC; часовой пояс события - пояс календаря (нужен Google для повторяющихся событий)
+        try:
+            tz_name = _zone(default_tz)[0] if default_tz else 'UTC'
+        except IcsError:
+            tz_name = 'UTC'
+        return naive.replace(tzinfo=datetime.timezone.utc), tz_name
+    # Локальное время в TZID или "плавающее" - в поясе календаря
+    tz_name, zone = _zone(params.get('TZID') or default_tz or 'UTC')
+    return naive.replace(tzinfo=zone), tz_name
+
+
+def _parse_duration(value: str) -> datetime.timedelta:
+    match = _DURATION.fullmatch(value.strip())
+    if not match or not any(match.groups()[1:]):
+        raise IcsError(f"Invalid duration {value!r}")
+    sign, weeks, days, hours, minutes, seconds = match.groups()
+    duration = datetime.timedelta(weeks=int(weeks or 0), days=int(days or 0), hours=int(hours or 0),
+                                  minutes=int(minutes or 0), seconds=int(seconds or 0))
+    return -duration if sign == '-' else duration
+
+
+def _format_property(name: str, params: Dict[str, str], value: str) -> str:
+    head = name
+    for key, param_value in params.items():
+        if any(char in param_value for char in ':;,'):
+            param_value = f'"{param_value}"'
+        head += f';{key}={param_value}'
+    return f'{head}:{value}'
+
+
+def to_create_request(event: VEvent, default_tz: Optional[str] = None) -> CreateEventRequest:
+    """
+    VEVENT -> тело POST /calendar/events. Серии переносятся правилами
+    (RRULE/EXDATE/RDATE), а не экземплярами.
+
+    Raises:
+        IcsSkipped: Отмененное событие или измененный экземпляр серии (RECURRENCE-ID).
+        IcsError: Если событие нельзя перенести.
+    """
+    if event.error:
+        raise IcsError(event.error)
+    if (event.text('STATUS') or '').strip().upper() == 'CANCELLED':
+        raise IcsSkipped("Cancelled event")
+    if event.first('RECURRENCE-ID') is not None:
+        raise IcsSkipped("Modified instances of recurring events are not imported")
+    dtstart = event.first('DTSTART')
+    if dtstart is None:
+        raise IcsError("DTSTART is missing")
+    start, time_zone = _parse_time(dtstart, default_tz)
+    all_day = time_zone is None
+
+    dtend = event.first('DTEND')
+    duration = event.first('DURATION')
+    if dtend is not None:
+        end, end_time_zone = _parse_time(dtend, default_tz)
+        if (end_time_zone is None) != all_day:
+            raise IcsError("DTSTART and DTEND must both be dates or both be date-times")
+    elif duration is not None:
+        end = start + _parse_duration(duration[1])
+    else:
+        end = start + datetime.timedelta(days=1) if all_day else start
+    if end < start:
+        raise IcsError("Event ends before it starts")
+
+    recurrence = [_format_property(name, params, value.strip())
+                  for name in RECURRENCE_PROPERTIES for params, value in event.props.get(name, [])]
+    return CreateEventRequest(
+        summary=(event.text('SUMMARY') or '').strip() or '(No title)',
+        startTime=start.isoformat(),
+        endTime=end.isoformat(),
+        isAllDay=all_day,
+        timeZoneId=time_zone,
+        description=event.text('DESCRIPTION'),
+        location=event.text('LOCATION'),
+        recurrence=recurrence or None,
+    )
+
+
+# --- Запись ---
+
+# Строки длиннее 75 октетов переносятся (RFC 5545, 3.1)
+_MAX_LINE_OCTETS = 75
+
+
+def escape_text(value: str) -> str:
+    return (value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def fold(line: str) -> str:
+    """Строка с CRLF; длинная - с переносами, не разрывающими символы UTF-8."""
+    data = line.encode('utf-8')
+    if len(data) <= _MAX_LINE_OCTETS:
+        return line + '\r\n'
+    parts = []
+    limit = _MAX_LINE_OCTETS
+    while data:
+        cut = min(limit, len(data))
+        while cut < len(data) and (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(data[:cut].decode('utf-8'))
+        data = data[cut:]
+        limit = _MAX_LINE_OCTETS - 1  # продолжение начинается с пробела
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def format_time(name: str, value: str, time_zone: Optional[str]) -> str:
+    """
+    Свойство со временем Google ('2024-07-04' или ISO 8601 со смещением): дата -
+    VALUE=DATE, время - местное в TZID, если пояс известен, иначе в UTC.
+    """
+    if len(value) == 10:
+        return f"{name};VALUE=DATE:{value.replace('-', '')}"
+    moment = datetime.datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=datetime.timezone.utc)
+    if time_zone:
+        try:
+            local = moment.astimezone(ZoneInfo(time_zone))
+            return f"{name};TZID={time_zone}:{local.strftime('%Y%m%dT%H%M%S')}"
+        except (ZoneInfoNotFoundError, ValueError):
+            pass
+    return f"{name}:{moment.astimezone(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ')}"
+
+
+def calendar_header(name: Optional[str] = None) -> str:
+    lines = ['BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//Caliinda//Calendar export//EN',
+             'CALSCALE:GREGORIAN', 'METHOD:PUBLISH']
+    if name:
+        lines.append(f'X-WR-CALNAME:{escape_text(name)}')
+    return ''.join(fold(line) for line in lines)
+
+
+CALENDAR_FOOTER = fold('END:VCALENDAR')
+
+
+def to_vevent(event: SimpleCalendarEvent, stamp: str, cancelled: Iterable[str] = ()) -> str:
+    """
+    VEVENT события. Мастер серии несет правила и EXDATE отмененных экземпляров
+    (cancelled - их originalStartTime), измененный экземпляр - UID серии и RECURRENCE-ID.
+    TZID - имена IANA, без VTIMEZONE (их понимают Google, Apple и Outlook).
+    """
+    series_id = event.recurringEventId
+    time_zone = None if event.isAllDay else event.timeZone
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:{series_id or event.id}@google.com',
+        f'DTSTAMP:{stamp}',
+        format_time('DTSTART', event.startTime, time_zone),
+        format_time('DTEND', event.endTime, time_zone),
+    ]
+    if series_id and event.originalStartTime:
+        lines.append(format_time('RECURRENCE-ID', event.originalStartTime, time_zone))
+    lines.append(f'SUMMARY:{escape_text(event.summary or "")}')
+    if event.description:
+        lines.append(f'DESCRIPTION:{escape_text(event.description)}')
+    if event.location:
+        lines.append(f'LOCATION:{escape_text(event.location)}')
+    if not series_id:
+        # У экземпляров recurrence_list - правила мастера, повторять их нельзя
+        lines.extend(rule for rule in event.recurrence_list or [] if rule.split(':', 1)[0].split(';', 1)[0] in RECURRENCE_PROPERTIES)
+        lines.extend(format_time('EXDATE', original_start, time_zone) for original_start in cancelled)
+    lines.append('END:VEVENT')
+    return ''.join(fold(line) for line in lines)
@@ -0,0 +1,253 @@
+# src/calendar/imports.py
+import base64
+import hashlib
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, BinaryIO, Callable, Dict, List, Optional
+
+from googleapiclient.errors import HttpError
+from pydantic import ValidationError
+
+from src.core.config import settings
+from src.core.metrics import metrics
+from src.core.ratelimit import TokenBucket
+from .channels import service_for_user
+from .ics import IcsError, IcsReader, IcsSkipped, VEvent, to_create_request
+from .schemas import CreateEventRequest
+from .service import BATCH_MAX_REQUESTS, GoogleCalendarService, is_upstream_failure
+
+logger = logging.getLogger(__name__)
+
+
+class ImportNotFoundError(Exception):
+    """Импорт не найден (завершился давно или принадлежит другому пользователю)."""
+
+
+class ImportBusyError(Exception):
+    """У пользователя уже идет импорт."""
+
+
+def import_event_id(google_id: str, uid: str) -> str:
+    """
+    ID события Google для VEVENT с этим UID (base32hex, как требует Google):
+    повторный импорт того же файла получает 409 вместо дубликатов.
+    """
+    digest = hashlib.sha1(f"{google_id}\n{uid}".encode()).digest()
+    return base64.b32hexencode(digest).decode().lower().rstrip('=')
+
+
+def _is_duplicate(error: Exception) -> bool:
+    return isinstance(error, HttpError) and getattr(error.resp, 'status', None) == 409
+
+
+def _is_rate_limited(error: Exception) -> bool:
+    # Превышение квоты Google отдает как 403 rateLimitExceeded/userRateLimitExceeded
+    return (isinstance(error, HttpError) and getattr(error.resp, 'status', None) == 403
+            and b'ateLimitExceeded' in (error.content or b''))
+
+
+def _describe(error: Exception) -> str:
+    if isinstance(error, HttpError):
+        return f"Google API error {error.resp.status}: {error._get_reason()}"
+    if isinstance(error, ValidationError):
+        return "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in error.errors())
+    return str(error)
+
+
+class _Pending:
+    __slots__ = ("event", "request", "event_id")
+
+    def __init__(self, event: VEvent, request: CreateEventRequest, event_id: Optional[str]):
+        self.event = event
+        self.request = request
+        self.event_id = event_id
+
+
+class ImportJob:
+    """Ход одного импорта; snapshot() отдается GET /calendar/import/{id}."""
+
+    def __init__(self, google_id: str, max_errors: int):
+        self.id = uuid.uuid4().hex
+        self.google_id = google_id
+        self.max_errors = max_errors
+        self.status = "running"
+        self.parsed = 0
+        self.imported = 0
+        self.duplicates = 0
+        self.skipped = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.error: Optional[str] = None
+        self.finished_at: Optional[float] = None
+
+    def add_failure(self, event: VEvent, reason: str) -> None:
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": event.line, "uid": event.uid, "summary": event.text('SUMMARY'), "error": reason})
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "importId": self.id,
+            "status": self.status,
+            "parsed": self.parsed,
+            "imported": self.imported,
+            "duplicates": self.duplicates,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "errors": list(self.errors),
+            "errorsTruncated": self.failed > len(self.errors),
+            "error": self.error,
+        }
+
+
+class IcsImporter:
+    """
+    Импорт .ics (POST /calendar/import). Загруженный файл разбирается
+    построчно в фоновом потоке, VEVENT копятся до batch_size и создаются
+    одним batch-запросом к Google. Вставки идут через TokenBucket
+    (writes_per_second на импорт - в пределах квоты Google на пользователя);
+    сбои Google и превышение квоты повторяются с задержкой, ошибки отдельных
+    событий записываются в ход импорта и не останавливают его.
+    """
+
+    def __init__(self, batch_size: int, writes_per_second: float, max_attempts: int, retry_base_seconds: float,
+                 workers: int, max_errors: int, result_ttl_seconds: float,
+                 service_factory: Callable[[str], Optional[GoogleCalendarService]] = service_for_user):
+        self.batch_size = min(batch_size, BATCH_MAX_REQUESTS)
+        self.writes_per_second = writes_per_second
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.workers = workers
+        self.max_errors = max_errors
+        self.result_ttl_seconds = result_ttl_seconds
+        self.service_factory = service_factory
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[str, ImportJob]" = OrderedDict()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._stop = threading.Event()
+
+    def start(self, google_id: str, source: BinaryIO) -> ImportJob:
+        """
+        Запускает импорт; source закрывается по его завершении.
+
+        Raises:
+            ImportBusyError: Если у пользователя уже идет импорт.
+        """
+        with self._lock:
+            self._prune()
+            if any(job.google_id == google_id and job.status == "running" for job in self._jobs.values()):
+                raise ImportBusyError("An import is already running for this user")
+            job = ImportJob(google_id, self.max_errors)
+            self._jobs[job.id] = job
+            if self._executor is None:
+                self._stop.clear()
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ics-import")
+            executor = self._executor
+        executor.submit(self.run, job, source)
+        metrics.inc("ics_imports_total")
+        return job
+
+    def get(self, google_id: str, import_id: str) -> ImportJob:
+        """
+        Raises:
+            ImportNotFoundError: Если импорта нет у этого пользователя.
+        """
+        with self._lock:
+            job = self._jobs.get(import_id)
+        if job is None or job.google_id != google_id:
+            raise ImportNotFoundError(f"Import {import_id} not found")
+        return job
+
+    def shutdown(self) -> None:
+        self._stop.set()
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _prune(self) -> None:
+        expire_before = time.time() - self.result_ttl_seconds
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished_at is not None and job.finished_at < expire_before]:
+            del self._jobs[job_id]
+
+    def run(self, job: ImportJob, source: BinaryIO) -> None:
+        started = time.monotonic()
+        try:
+            calendar_service = self.service_factory(job.google_id)
+            if calendar_service is None:
+                raise ValueError("No Google credentials for user")
+            bucket = TokenBucket(rate=self.writes_per_second, capacity=self.batch_size)
+            reader = IcsReader(raw.decode('utf-8', errors='replace') for raw in source)
+            chunk: Dict[str, _Pending] = {}
+            for event in reader:
+                if self._stop.is_set():
+                    raise RuntimeError("Import interrupted by server shutdown")
+                job.parsed += 1
+                try:
+                    request = to_create_request(event, reader.time_zone)
+                except IcsSkipped:
+                    job.skipped += 1
+                    continue
+                except (IcsError, ValidationError) as e:
+                    job.add_failure(event, _describe(e))
+                    continue
+                event_id = import_event_id(job.google_id, event.uid) if event.uid else None
+                chunk[str(job.parsed)] = _Pending(event, request, event_id)
+                if len(chunk) >= self.batch_size:
+                    self._insert(job, calendar_service, bucket, chunk)
+                    chunk = {}
+            if chunk:
+                self._insert(job, calendar_service, bucket, chunk)
+            job.status = "done"
+        except Exception as e:
+            logger.error("ICS import %s for %s failed: %s", job.id, job.google_id, e, exc_info=True)
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            source.close()
+            job.finished_at = time.time()
+            metrics.observe("ics_import_seconds", time.monotonic() - started)
+            for result in ("imported", "duplicates", "skipped", "failed"):
+                metrics.inc("ics_import_events_total", getattr(job, result), result=result)
+            logger.info("ICS import %s for %s %s: %s parsed, %s imported, %s duplicates, %s skipped, %s failed",
+                        job.id, job.google_id, job.status, job.parsed, job.imported, job.duplicates, job.skipped, job.failed)
+
+    def _insert(self, job: ImportJob, calendar_service: GoogleCalendarService, bucket: TokenBucket,
+                chunk: Dict[str, _Pending]) -> None:
+        """Создает события одним batch-запросом; сбои Google повторяются для не созданных событий."""
+        for attempt in range(1, self.max_attempts + 1):
+            bucket.acquire(len(chunk))
+            results, errors = calendar_service.insert_events(
+                {key: pending.request for key, pending in chunk.items()},
+                {key: pending.event_id for key, pending in chunk.items() if pending.event_id},
+            )
+            job.imported += len(results)
+            retry = {}
+            for key, error in errors.items():
+                if _is_duplicate(error):
+                    job.duplicates += 1
+                elif (is_upstream_failure(error) or _is_rate_limited(error)) and attempt < self.max_attempts:
+                    retry[key] = chunk[key]
+                else:
+                    job.add_failure(chunk[key].event, _describe(error))
+            if not retry:
+                return
+            chunk = retry
+            time.sleep(self.retry_base_seconds * 2 ** (attempt - 1) * random.uniform(0.5, 1.0))
+
+
+ics_importer = IcsImporter(
+    batch_size=settings.IMPORT_BATCH_SIZE,
+    writes_per_second=settings.IMPORT_WRITES_PER_SECOND,
+    max_attempts=settings.IMPORT_MAX_ATTEMPTS,
+    retry_base_seconds=settings.IMPORT_RETRY_BASE_SECONDS,
+    workers=settings.IMPORT_WORKERS,
+    max_errors=settings.IMPORT_MAX_ERRORS,
+    result_ttl_seconds=settings.IMPORT_RESULT_TTL_SECONDS,
+)
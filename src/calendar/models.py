@@ -0,0 +1,33 @@
+# src/calendar/models.py
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, Text
+from sqlalchemy.sql import func
+from src.core.database import Base
+
+class PendingMutation(Base):
+    """
+    Изменение календаря, принятое в асинхронном режиме (202) и ожидающее
+    отправки в Google (src/calendar/mutations.py). Изменения одного события
+    (ordering_key) отправляются строго по порядку seq.
+    """
+    __tablename__ = "calendar_mutations"
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    id = Column(String(64), unique=True, nullable=False)  # Отдается клиенту; у создания это и временный ID события
+    google_id = Column(String(255), ForeignKey("users.google_id", ondelete="CASCADE"), nullable=False, index=True)
+    operation = Column(String(16), nullable=False)  # create, update, delete
+    event_id = Column(String(1024), nullable=True)  # Событие Google (у update/delete, если уже известно)
+    depends_on = Column(String(64), nullable=True)  # Создание, чей временный ID указал клиент
+    ordering_key = Column(String(1024), nullable=False)  # ID события Google (у создания - выбранный нами)
+    payload = Column(Text, nullable=False)  # JSON: data, mode, checkConflicts
+    status = Column(String(16), nullable=False, default="pending")  # pending, in_progress, done, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now())
+    claimed_at = Column(DateTime(timezone=True), nullable=True)
+    result_event_id = Column(String(1024), nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    __table_args__ = (
+        Index("ix_calendar_mutations_status_seq", "status", "seq"),
+        Index("ix_calendar_mutations_ordering", "google_id", "ordering_key", "seq"),
+    )
@@ -0,0 +1,322 @@
+# src/calendar/mutations.py
+import base64
+import datetime
+import hashlib
+import json
+import logging
+import random
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from googleapiclient.errors import HttpError
+from sqlalchemy import and_, exists, or_, select, update
+from sqlalchemy.orm import Session, aliased
+
+from src.core.config import settings
+from src.core.database import get_db_session
+from src.core.metrics import metrics
+from .channels import service_for_user
+from .models import PendingMutation
+from .service import GoogleCalendarService, is_upstream_failure
+
+logger = logging.getLogger(__name__)
+
+# Временные ID, которые отдаются клиенту; в ID событий Google дефиса не бывает
+MUTATION_ID_PREFIX = "mut-"
+_UNFINISHED = ("pending", "in_progress")
+
+
+def mutation_event_id(mutation_id: str) -> str:
+    """
+    ID события Google для создания из очереди (base32hex, как требует Google):
+    повтор вставки, уже выполненной Google до сбоя, получает 409, а не дубликат.
+    """
+    digest = hashlib.sha1(mutation_id.encode()).digest()
+    return base64.b32hexencode(digest).decode().lower().rstrip('=')
+
+
+class MutationNotFoundError(Exception):
+    """Изменение не найдено (или принадлежит другому пользователю)."""
+
+
+def _utcnow() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def is_provisional_id(event_id: Optional[str]) -> bool:
+    return bool(event_id) and event_id.startswith(MUTATION_ID_PREFIX)
+
+
+class MutationQueue:
+    """
+    Отложенная запись изменений календаря (режим ?async=true у POST/PATCH/DELETE).
+
+    Запрос только записывает изменение в таблицу calendar_mutations и сразу
+    получает 202 с ID изменения; у создания он же служит временным ID события,
+    и последующие PATCH/DELETE с ним выполняются после создания.
+
+    Фоновый поток забирает готовые изменения (не больше batch_size за проход),
+    по одному на событие - изменения одного события идут строго по порядку,
+    и отправляет их пулом воркеров по пользователям batch-запросами
+    (GoogleCalendarService.apply_mutations). Сбои Google повторяются с
+    экспоненциальной задержкой до max_attempts раз, ошибки запроса (4xx)
+    сразу завершают изменение статусом failed. Изменение, взятое воркером,
+    который затем упал, через lease_seconds забирает другой воркер.
+    """
+
+    def __init__(self, batch_size: int, workers: int, interval_seconds: float, max_attempts: int,
+                 retry_base_seconds: float, retry_max_seconds: float, lease_seconds: float,
+                 service_factory: Callable[[str], Optional[GoogleCalendarService]] = service_for_user,
+                 session_factory: Callable[[], Any] = get_db_session):
+        self.batch_size = batch_size
+        self.workers = workers
+        self.interval_seconds = interval_seconds
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.lease_seconds = lease_seconds
+        self.service_factory = service_factory
+        self.session_factory = session_factory
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    # --- Прием изменений (поток запроса) ---
+
+    def enqueue(self, db: Session, google_id: str, operation: str, event_id: Optional[str],
+                data: Dict[str, Any], mode: Optional[str] = None, check_conflicts: bool = False) -> PendingMutation:
+        """
+        Записывает изменение одной вставкой и будит фоновый поток.
+
+        Raises:
+            MutationNotFoundError: Если event_id - временный ID неизвестного создания.
+        """
+        mutation_id = MUTATION_ID_PREFIX + uuid.uuid4().hex
+        depends_on = None
+        if is_provisional_id(event_id):
+            create = db.scalars(select(PendingMutation).where(
+                PendingMutation.id == event_id, PendingMutation.google_id == google_id,
+                PendingMutation.operation == "create")).one_or_none()
+            if create is None:
+                raise MutationNotFoundError(f"Unknown provisional event id {event_id}")
+            if create.result_event_id:
+                event_id = create.result_event_id
+            else:
+                depends_on, event_id = create.id, None
+        # Ключ порядка - ID события Google; у создания он известен заранее (mutation_event_id),
+        # поэтому изменения по временному и по настоящему ID попадают в одну очередь
+        ordering_key = event_id
+        if operation == "create" or depends_on:
+            ordering_key = mutation_event_id(depends_on or mutation_id)
+        mutation = PendingMutation(
+            id=mutation_id,
+            google_id=google_id,
+            operation=operation,
+            event_id=event_id,
+            depends_on=depends_on,
+            ordering_key=ordering_key,
+            payload=json.dumps({"data": data, "mode": mode, "checkConflicts": check_conflicts}),
+            status="pending",
+            attempts=0,
+            next_attempt_at=_utcnow(),
+        )
+        db.add(mutation)
+        db.commit()
+        metrics.inc("mutations_enqueued_total", operation=operation)
+        self._wake.set()
+        return mutation
+
+    def get(self, db: Session, google_id: str, mutation_id: str) -> PendingMutation:
+        """
+        Raises:
+            MutationNotFoundError: Если изменения нет у этого пользователя.
+        """
+        mutation = db.scalars(select(PendingMutation).where(
+            PendingMutation.id == mutation_id, PendingMutation.google_id == google_id)).one_or_none()
+        if mutation is None:
+            raise MutationNotFoundError(f"Mutation {mutation_id} not found")
+        return mutation
+
+    def has_unfinished(self, db: Session, google_id: str, event_id: str) -> bool:
+        """Есть ли у события изменения, еще не отправленные в Google (синхронная запись обогнала бы их)."""
+        return db.scalar(select(PendingMutation.seq).where(
+            PendingMutation.google_id == google_id, PendingMutation.ordering_key == event_id,
+            PendingMutation.status.in_(_UNFINISHED)).limit(1)) is not None
+
+    # --- Фоновая отправка ---
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="mutation-flusher", daemon=True)
+        self._thread.start()
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                flushed = self.flush_once()
+            except Exception as e:
+                logger.error("Mutation flush failed: %s", e, exc_info=True)
+                flushed = 0
+            if flushed < self.batch_size:
+                self._wake.wait(self.interval_seconds)
+                self._wake.clear()
+
+    def flush_once(self) -> int:
+        """Забирает готовые изменения и отправляет их в Google. Returns: сколько изменений обработано."""
+        with self.session_factory() as db:
+            claimed = self._claim(db)
+        if not claimed:
+            return 0
+        by_user: Dict[str, List[Dict[str, Any]]] = {}
+        for mutation in claimed:
+            by_user.setdefault(mutation["googleId"], []).append(mutation)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="mutation-worker")
+        for future in [self._executor.submit(self._flush_user, google_id, mutations)
+                       for google_id, mutations in by_user.items()]:
+            future.result()
+        return len(claimed)
+
+    def _claim(self, db: Session) -> List[Dict[str, Any]]:
+        """
+        Берет первые batch_size готовых изменений. Из изменений одного события
+        готово только самое раннее незавершенное, так что порядок не нарушается
+        даже при нескольких процессах: остальные ждут его завершения.
+        """
+        now = _utcnow()
+        stale_before = now - datetime.timedelta(seconds=self.lease_seconds)
+        ready_condition = or_(
+            and_(PendingMutation.status == "pending", PendingMutation.next_attempt_at <= now),
+            and_(PendingMutation.status == "in_progress", PendingMutation.claimed_at < stale_before),
+        )
+        # Голова очереди события: раньше него нет незавершенных изменений с тем же ключом
+        earlier = aliased(PendingMutation)
+        is_head = ~exists().where(
+            earlier.google_id == PendingMutation.google_id,
+            earlier.ordering_key == PendingMutation.ordering_key,
+            earlier.seq < PendingMutation.seq,
+            earlier.status.in_(_UNFINISHED),
+        )
+        candidates = db.scalars(
+            select(PendingMutation.seq)
+            .where(PendingMutation.status.in_(_UNFINISHED), ready_condition, is_head)
+            .order_by(PendingMutation.seq)
+            .limit(self.batch_size)
+        ).all()
+
+        claimed = []
+        for seq in candidates:
+            result = db.execute(
+                update(PendingMutation)
+                .where(PendingMutation.seq == seq, ready_condition)
+                .values(status="in_progress", claimed_at=now, attempts=PendingMutation.attempts + 1)
+            )
+            if result.rowcount == 1:
+                claimed.append(seq)
+        db.commit()
+        if not claimed:
+            return []
+
+        rows = db.scalars(select(PendingMutation).where(PendingMutation.seq.in_(claimed))
+                          .order_by(PendingMutation.seq)).all()
+        dependencies = {row.depends_on for row in rows if row.depends_on}
+        creates = {}
+        if dependencies:
+            creates = {row.id: row for row in db.scalars(select(PendingMutation).where(PendingMutation.id.in_(dependencies)))}
+        mutations = []
+        for row in rows:
+            payload = json.loads(row.payload)
+            event_id = mutation_event_id(row.id) if row.operation == "create" else row.event_id
+            blocked_by = None
+            if row.depends_on:
+                create = creates.get(row.depends_on)
+                event_id = create.result_event_id if create is not None else None
+                if event_id is None:
+                    blocked_by = row.depends_on
+            mutations.append({
+                "seq": row.seq, "id": row.id, "googleId": row.google_id, "operation": row.operation,
+                "eventId": event_id, "attempts": row.attempts, "blockedBy": blocked_by,
+                "data": payload["data"], "mode": payload["mode"], "checkConflicts": payload["checkConflicts"],
+            })
+        return mutations
+
+    def _flush_user(self, google_id: str, mutations: List[Dict[str, Any]]) -> None:
+        outcomes: Dict[str, Any] = {}
+        runnable = []
+        for mutation in mutations:
+            if mutation["blockedBy"]:
+                # Создание, от которого зависит изменение, завершилось ошибкой
+                outcomes[mutation["id"]] = ValueError(f"Depends on failed mutation {mutation['blockedBy']}")
+            else:
+                runnable.append(mutation)
+        if runnable:
+            try:
+                calendar_service = self.service_factory(google_id)
+                if calendar_service is None:
+                    raise ValueError("No Google credentials for user")
+                outcomes.update(calendar_service.apply_mutations(runnable))
+            except Exception as e:
+                for mutation in runnable:
+                    outcomes.setdefault(mutation["id"], e)
+        with self.session_factory() as db:
+            for mutation in mutations:
+                self._record(db, mutation, outcomes.get(mutation["id"]))
+            db.commit()
+
+    def _record(self, db: Session, mutation: Dict[str, Any], outcome: Any) -> None:
+        now = _utcnow()
+        values: Dict[str, Any] = {"claimed_at": None}
+        if not isinstance(outcome, Exception) or _already_applied(mutation, outcome):
+            values.update(status="done", error=None,
+                          result_event_id=outcome.get("id") if isinstance(outcome, dict) else mutation["eventId"])
+            result = "done"
+        elif is_upstream_failure(outcome) and mutation["attempts"] < self.max_attempts:
+            delay = min(self.retry_max_seconds, self.retry_base_seconds * 2 ** (mutation["attempts"] - 1))
+            values.update(status="pending", error=str(outcome),
+                          next_attempt_at=now + datetime.timedelta(seconds=delay * random.uniform(0.5, 1.0)))
+            result = "retry"
+        else:
+            values.update(status="failed", error=str(outcome))
+            result = "failed"
+            logger.warning("Mutation %s (%s) for %s failed after %s attempt(s): %s",
+                           mutation["id"], mutation["operation"], mutation["googleId"], mutation["attempts"], outcome)
+        db.execute(update(PendingMutation).where(PendingMutation.seq == mutation["seq"]).values(**values))
+        metrics.inc("mutations_flushed_total", operation=mutation["operation"], result=result)
+
+
+def _already_applied(mutation: Dict[str, Any], error: Exception) -> bool:
+    """Ошибка повтора, означающая, что предыдущая попытка уже дошла до Google."""
+    if not isinstance(error, HttpError):
+        return False
+    status = getattr(error.resp, "status", None)
+    if mutation["operation"] == "delete":
+        # Как и в DELETE /calendar/events: 404/410 - событие уже удалено, это успех
+        return status in (404, 410)
+    # Событие с ID этого создания уже есть: вставка прошла, но ответ до нас не дошел
+    return mutation["operation"] == "create" and status == 409 and mutation["attempts"] > 1
+
+
+mutation_queue = MutationQueue(
+    batch_size=settings.MUTATION_BATCH_SIZE,
+    workers=settings.MUTATION_WORKERS,
+    interval_seconds=settings.MUTATION_FLUSH_INTERVAL_SECONDS,
+    max_attempts=settings.MUTATION_MAX_ATTEMPTS,
+    retry_base_seconds=settings.MUTATION_RETRY_BASE_SECONDS,
+    retry_max_seconds=settings.MUTATION_RETRY_MAX_SECONDS,
+    lease_seconds=settings.MUTATION_LEASE_SECONDS,
+)
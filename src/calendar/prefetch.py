@@ -0,0 +1,143 @@
+# src/calendar/prefetch.py
+import datetime
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+
+from google.oauth2.credentials import Credentials
+
+from src.core.config import settings
+from .service import GoogleCalendarService, StaleEvents
+
+logger = logging.getLogger(__name__)
+
+
+def prefetch_window(today: datetime.date, weeks: int) -> Tuple[datetime.date, datetime.date]:
+    """Окно с понедельника текущей недели до воскресенья последней из weeks недель."""
+    monday = today - datetime.timedelta(days=today.weekday())
+    return monday, monday + datetime.timedelta(weeks=weeks, days=-1)
+
+
+class _PrefetchJob:
+    __slots__ = ("cancelled", "future")
+
+    def __init__(self):
+        self.cancelled = threading.Event()
+        self.future: Optional[Future] = None
+
+
+class PrefetchPool:
+    """
+    Фоновый прогрев кэша событий после логина.
+
+    Запуск не блокирует вызывающего: задача ставится в ограниченный пул потоков
+    и загружает одно окно на несколько недель вперед через обычный get_events,
+    так что результат попадает в range_cache и покрывает запросы отдельных недель.
+
+    Тот же пул перезагружает диапазоны, отданные устаревшими (revalidate).
+    """
+
+    def __init__(self, max_workers: int, weeks: int,
+                 service_factory: Callable[[Credentials, str], GoogleCalendarService] = GoogleCalendarService):
+        self.max_workers = max_workers
+        self.weeks = weeks
+        self.service_factory = service_factory
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, _PrefetchJob] = {}  # email (прогрев) или ключ диапазона (revalidate) -> задача
+
+    @property
+    def enabled(self) -> bool:
+        return self.weeks > 0 and self.max_workers > 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="prefetch")
+        return self._executor
+
+    def schedule(self, creds: Credentials, user_email: str, today: Optional[datetime.date] = None) -> Optional[Future]:
+        """
+        Ставит прогрев в очередь; предыдущая задача того же пользователя отменяется.
+
+        Returns:
+            Future задачи или None, если прогрев выключен.
+        """
+        if not self.enabled:
+            return None
+        start_date, end_date = prefetch_window(today or datetime.datetime.now(datetime.timezone.utc).date(), self.weeks)
+        job = _PrefetchJob()
+        with self._lock:
+            previous = self._jobs.get(user_email)
+            self._jobs[user_email] = job
+            job.future = self._get_executor().submit(self._run, job, user_email, creds, user_email, start_date, end_date)
+        if previous:
+            self._cancel_job(previous)
+        return job.future
+
+    def revalidate(self, creds: Credentials, user_email: str,
+                   start_date: datetime.date, end_date: datetime.date) -> Optional[Future]:
+        """
+        Ставит в очередь перезагрузку диапазона. Если такая же перезагрузка уже
+        в очереди или выполняется, новая не ставится.
+
+        Returns:
+            Future задачи или None, если задача уже есть.
+        """
+        key = f"revalidate:{user_email}:{start_date.isoformat()}:{end_date.isoformat()}"
+        with self._lock:
+            if key in self._jobs:
+                return None
+            job = self._jobs[key] = _PrefetchJob()
+            job.future = self._get_executor().submit(self._run, job, key, creds, user_email, start_date, end_date)
+        return job.future
+
+    def cancel(self, user_email: str) -> bool:
+        """Отменяет прогрев пользователя. Уже начатый запрос к Google не прерывается."""
+        with self._lock:
+            job = self._jobs.pop(user_email, None)
+        if job is None:
+            return False
+        self._cancel_job(job)
+        return True
+
+    def _cancel_job(self, job: _PrefetchJob) -> None:
+        job.cancelled.set()
+        if job.future is not None:
+            job.future.cancel()
+
+    def _run(self, job: _PrefetchJob, key: str, creds: Credentials, user_email: str,
+             start_date: datetime.date, end_date: datetime.date) -> int:
+        try:
+            if job.cancelled.is_set():
+                return 0
+            calendar_service = self.service_factory(creds, user_email)
+            if job.cancelled.is_set():
+                return 0
+            events = calendar_service.get_events(start_date, end_date)
+            if isinstance(events, StaleEvents):
+                logger.info("Google still unavailable, %s..%s for %s not refreshed", start_date, end_date, user_email)
+                return 0
+            logger.info("Prefetched %s events (%s..%s) for %s", len(events), start_date, end_date, user_email)
+            return len(events)
+        except Exception as e:
+            # Прогрев - оптимизация: ошибка не должна влиять на пользователя
+            logger.warning("Prefetch failed for %s: %s", user_email, e)
+            return 0
+        finally:
+            with self._lock:
+                if self._jobs.get(key) is job:
+                    del self._jobs[key]
+
+    def shutdown(self) -> None:
+        with self._lock:
+            jobs = list(self._jobs.values())
+            self._jobs.clear()
+            executor, self._executor = self._executor, None
+        for job in jobs:
+            self._cancel_job(job)
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+prefetch_pool = PrefetchPool(max_workers=settings.PREFETCH_WORKERS, weeks=settings.PREFETCH_WEEKS)
@@ -0,0 +1,156 @@
+# src/calendar/recurrence.py
+import datetime
+from typing import Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+# Правила повторения Google (строки RRULE/EXDATE/RDATE из поля recurrence)
+# и идентификаторы экземпляров серий: "<id серии>_<начало по расписанию>".
+
+# Строки recurrence со списком дат, которые исключаются из серии или добавляются к ней
+DATE_PROPERTIES = ('EXDATE', 'RDATE')
+
+
+def _parse_rule(line: str) -> Dict[str, str]:
+    return dict(part.split('=', 1) for part in line[len('RRULE:'):].split(';') if part)
+
+
+def _format_rule(parts: Dict[str, str]) -> str:
+    return 'RRULE:' + ';'.join(f'{key}={value}' for key, value in parts.items())
+
+
+def is_all_day(start: Dict[str, Optional[str]]) -> bool:
+    return bool(start.get('date'))
+
+
+def local_start(start: Dict[str, Optional[str]], time_zone: Optional[str]) -> datetime.datetime:
+    """
+    Начало события или экземпляра ({'date'} или {'dateTime'}) как наивное
+    локальное время в часовом поясе серии; у all-day событий - полночь.
+    """
+    if is_all_day(start):
+        return datetime.datetime.combine(datetime.date.fromisoformat(start['date']), datetime.time())
+    value = datetime.datetime.fromisoformat(start['dateTime'])
+    if value.tzinfo is not None:
+        value = value.astimezone(ZoneInfo(time_zone or 'UTC'))
+    return value.replace(tzinfo=None)
+
+
+def instance_suffix(local: datetime.datetime, all_day: bool, time_zone: Optional[str]) -> str:
+    """Суффикс id экземпляра: дата у all-day серий, время в UTC у остальных."""
+    if all_day:
+        return local.strftime('%Y%m%d')
+    utc = local.replace(tzinfo=ZoneInfo(time_zone or 'UTC')).astimezone(datetime.timezone.utc)
+    return utc.strftime('%Y%m%dT%H%M%SZ')
+
+
+def until_before(local: datetime.datetime, all_day: bool, time_zone: Optional[str]) -> str:
+    """Значение UNTIL, при котором серия заканчивается прямо перед экземпляром, начинающимся в local."""
+    if all_day:
+        return (local.date() - datetime.timedelta(days=1)).strftime('%Y%m%d')
+    return instance_suffix(local - datetime.timedelta(seconds=1), False, time_zone)
+
+
+def has_count(recurrence: List[str]) -> bool:
+    return any(line.startswith('RRULE:') and 'COUNT' in _parse_rule(line) for line in recurrence)
+
+
+def truncate_recurrence(recurrence: List[str], until: str) -> List[str]:
+    """Заканчивает серию на until: COUNT и прежний UNTIL в RRULE заменяются, остальные строки не меняются."""
+    result = []
+    for line in recurrence:
+        if line.startswith('RRULE:'):
+            parts = _parse_rule(line)
+            parts.pop('COUNT', None)
+            parts['UNTIL'] = until
+            line = _format_rule(parts)
+        result.append(line)
+    return result
+
+
+def continue_recurrence(recurrence: List[str], occurrences_before: int) -> List[str]:
+    """
+    Правила для продолжения серии с экземпляра: только RRULE (EXDATE/RDATE
+    после экземпляра переносит split_recurrence_dates), COUNT уменьшается на
+    экземпляры до него.
+    """
+    result = []
+    for line in recurrence:
+        if not line.startswith('RRULE:'):
+            continue
+        parts = _parse_rule(line)
+        if 'COUNT' in parts:
+            parts['COUNT'] = str(max(int(parts['COUNT']) - occurrences_before, 1))
+        result.append(_format_rule(parts))
+    return result
+
+
+def _parse_dates(line: str, time_zone: Optional[str]) -> Optional[Tuple[str, List[Tuple[str, datetime.datetime]]]]:
+    """
+    Строка EXDATE/RDATE: имя и значения (исходная строка, наивное местное время
+    в часовом поясе серии). None для других строк и значений, которые не разобрать (PERIOD).
+    """
+    head, _, values = line.partition(':')
+    name, *raw_params = head.split(';')
+    name = name.upper()
+    if name not in DATE_PROPERTIES:
+        return None
+    params = dict(param.split('=', 1) for param in raw_params if '=' in param)
+    if params.get('VALUE', '').upper() == 'PERIOD':
+        return None
+    try:
+        zone = ZoneInfo(params['TZID']) if 'TZID' in params else None
+        series_zone = ZoneInfo(time_zone or 'UTC')
+        dates = []
+        for raw in values.split(','):
+            raw = raw.strip()
+            if len(raw) == 8:
+                dates.append((raw, datetime.datetime.strptime(raw, '%Y%m%d')))
+                continue
+            value = datetime.datetime.strptime(raw.rstrip('Z'), '%Y%m%dT%H%M%S')
+            if raw.endswith('Z'):
+                value = value.replace(tzinfo=datetime.timezone.utc)
+            elif zone is not None:
+                value = value.replace(tzinfo=zone)
+            if value.tzinfo is not None:
+                value = value.astimezone(series_zone).replace(tzinfo=None)
+            dates.append((raw, value))
+    except (ValueError, ZoneInfoNotFoundError):
+        return None
+    return name, dates
+
+
+def split_recurrence_dates(recurrence: List[str], split_at: datetime.datetime,
+                           time_zone: Optional[str]) -> Tuple[List[str], Dict[str, List[datetime.datetime]]]:
+    """
+    Делит EXDATE/RDATE серии в экземпляре split_at (местное время серии).
+
+    Returns:
+        (recurrence без дат начиная с split_at - для обрезанной старой серии,
+        {EXDATE/RDATE: эти даты в местном времени} - для новой серии).
+    """
+    kept, later = [], {}
+    for line in recurrence:
+        parsed = _parse_dates(line, time_zone)
+        if parsed is None:
+            kept.append(line)
+            continue
+        name, dates = parsed
+        earlier = [raw for raw, value in dates if value < split_at]
+        later.setdefault(name, []).extend(value for _, value in dates if value >= split_at)
+        if earlier:
+            kept.append(line.partition(':')[0] + ':' + ','.join(earlier))
+    return kept, {name: values for name, values in later.items() if values}
+
+
+def format_recurrence_dates(dates: Dict[str, List[datetime.datetime]], all_day: bool,
+                            time_zone: Optional[str]) -> List[str]:
+    """Строки EXDATE/RDATE для дат в местном времени серии: даты у all-day, TZID серии у остальных."""
+    lines = []
+    for name, values in dates.items():
+        if all_day:
+            lines.append(f"{name};VALUE=DATE:" + ','.join(value.strftime('%Y%m%d') for value in values))
+        elif time_zone:
+            lines.append(f"{name};TZID={time_zone}:" + ','.join(value.strftime('%Y%m%dT%H%M%S') for value in values))
+        else:
+            lines.append(f"{name}:" + ','.join(value.strftime('%Y%m%dT%H%M%SZ') for value in values))
+    return lines
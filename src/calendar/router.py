@@ -1,14 +1,26 @@
 # src/calendar/router.py
 
-from fastapi import APIRouter, Depends, status, Path, Query, Response, HTTPException
-from typing import List
+from fastapi import APIRouter, Depends, status, Path, Query, Request, Response, HTTPException, Header
+from typing import List, Optional, Tuple
 import datetime
 import logging
+import tempfile
+from fastapi.responses import JSONResponse, StreamingResponse
 from googleapiclient.errors import HttpError
+from sqlalchemy.orm import Session
 
 from . import schemas
-from .service import GoogleCalendarService
-from src.core.dependencies import get_calendar_service
+from .service import GoogleCalendarService, EventConflictError, StaleEvents
+from .channels import channel_manager
+from .export import feed_token, feed_user, ics_feeds
+from .imports import ImportBusyError, ImportNotFoundError, ics_importer
+from .mutations import MutationNotFoundError, is_provisional_id, mutation_queue
+from .encoding import MSGPACK_MEDIA_TYPE, encode_compact_series, encode_events_columnar, wants_msgpack
+from src.core.dependencies import get_calendar_service, get_current_user, get_db
+from src.core.circuit import CircuitOpenError
+from src.core.config import settings
+from src.core.idempotency import IdempotencyInProgressError, IdempotencyKeyReusedError, idempotency, request_fingerprint
+from src.users.models import User
 
 # Инициализация роутера и логгера
 router = APIRouter(
@@ -17,13 +29,18 @@ router = APIRouter(
 )
 logger = logging.getLogger(__name__)
 
+# Заголовок ответа, если данные отданы из последнего известного результата
+STALE_HEADER = "X-Calendar-Stale"
+# Заголовок ответа на повтор запроса с уже выполненным Idempotency-Key
+IDEMPOTENT_REPLAY_HEADER = "Idempotent-Replayed"
+
 # --- Обработчик ошибок для Google API ---
 # Это можно вынести в отдельную утилиту, если будет использоваться в других роутерах
 def handle_google_api_error(e: HttpError, user_email: str, action: str):
     """Преобразует HttpError от Google в FastAPI HTTPException."""
     error_details = e.content.decode('utf-8') if e.content else str(e)
     status_code = e.resp.status if hasattr(e, 'resp') else 500
-    logger.error(f"Google API error during '{action}' for user {user_email}: {status_code} - {error_details}", exc_info=True)
+    logger.error("Google API error during '%s' for user %s: %s - %s", action, user_email, status_code, error_details, exc_info=True)
     
     if status_code in [401, 403]:
         detail = f"Access to Google Calendar denied or token invalid. Please sign in again. (Reason: {e.reason})"
@@ -36,20 +53,81 @@ def handle_google_api_error(e: HttpError, user_email: str, action: str):
     # Общая ошибка для всех остальных случаев
     raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=f"Google Calendar API Error: {e.reason}")
 
+def handle_upstream_unavailable(e: Exception, user_email: str, action: str):
+    """
+    Google недоступен, а устаревших данных нет: 503 сразу, если цепь разомкнута;
+    504, если истек таймаут вызова или бюджет времени запроса.
+    """
+    logger.warning("Failing fast during '%s' for user %s: %s", action, user_email, e)
+    if isinstance(e, TimeoutError):
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                            detail="Google Calendar did not respond in time. Please retry later.")
+    raise HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Google Calendar is temporarily unavailable. Please retry later.",
+        headers={"Retry-After": str(max(1, int(e.retry_after + 0.5)))},
+    )
+
+def resolve_event_id(db: Session, google_id: str, event_id: str) -> str:
+    """
+    Временный ID из асинхронного создания -> ID события Google, если оно уже создано.
+    Синхронное изменение события, у которого есть изменения в очереди, отклоняется с 409:
+    иначе оно обогнало бы их, а очередь потом перезаписала бы его результат.
+    """
+    if not is_provisional_id(event_id):
+        ensure_no_queued_changes(db, google_id, event_id)
+        return event_id
+    try:
+        mutation = mutation_queue.get(db, google_id, event_id)
+    except MutationNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    if mutation.status == "failed":
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Creation of {event_id} failed: {mutation.error}")
+    if not mutation.result_event_id:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, headers={"Retry-After": "1"},
+                            detail="The event is still being created. Retry later or use async=true.")
+    ensure_no_queued_changes(db, google_id, mutation.result_event_id)
+    return mutation.result_event_id
+
+def ensure_no_queued_changes(db: Session, google_id: str, event_id: str) -> None:
+    if mutation_queue.has_unfinished(db, google_id, event_id):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, headers={"Retry-After": "1"},
+                            detail="The event has queued changes that are not applied yet. Retry later or use async=true.")
+
+def accepted(mutation_id: str, event_id: Optional[str], headers: Optional[dict] = None) -> JSONResponse:
+    """Ответ асинхронного режима: изменение записано в очередь, результат - через GET /calendar/mutations/{id}."""
+    body = schemas.MutationAcceptedResponse(mutationId=mutation_id, eventId=event_id).model_dump()
+    return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=body, headers=headers)
+
+def raise_conflict(e: EventConflictError):
+    """Ответ режима checkConflicts: 409 со списком пересекающихся событий."""
+    conflicts = [schemas.CalendarEventResponse(**event).model_dump(exclude_none=True) for event in e.conflicts]
+    raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail={"message": str(e), "conflicts": conflicts})
+
 @router.get(
     "/events/range",
     response_model=List[schemas.CalendarEventResponse],
     summary="Get events for a date range"
 )
 def get_calendar_events_range(
+    response: Response,
     startDate: str = Query(..., description="Start date (YYYY-MM-DD)", regex=r"^\d{4}-\d{2}-\d{2}$"),
     endDate: str = Query(..., description="End date (YYYY-MM-DD)", regex=r"^\d{4}-\d{2}-\d{2}$"),
+    compact: bool = Query(False, description="Send each recurring series once and its instances as deltas"),
+    accept: Optional[str] = Header(None),
     calendar_service: GoogleCalendarService = Depends(get_calendar_service)
 ):
     """
     Fetches calendar events for the authenticated user within a specified date range.
+    With `Accept: application/x-msgpack` the events are returned as columnar MessagePack
+    (see src/calendar/encoding.py) instead of JSON.
+    With `compact=true` the response is `{"v", "series", "events"}`: the fields shared by a series'
+    instances are sent once in `series`, and instances carry only their own fields
+    (see `compact_series` / `expand_series` in src/calendar/encoding.py for the reconstruction rules).
+    While Google is unavailable the last known result is returned with `X-Calendar-Stale: true`
+    and `Age` headers.
     """
-    logger.info(f"Request to get events from {startDate} to {endDate} for user {calendar_service.user_email}")
+    logger.info("Request to get events from %s to %s for user %s", startDate, endDate, calendar_service.user_email)
     try:
         start_date_obj = datetime.date.fromisoformat(startDate)
         end_date_obj = datetime.date.fromisoformat(endDate)
@@ -61,87 +139,496 @@ def get_calendar_events_range(
 
     try:
         events = calendar_service.get_events(start_date_obj, end_date_obj)
+        headers = {"Vary": "Accept"}
+        if isinstance(events, StaleEvents):
+            # Google недоступен: последний известный результат, обновится в фоне
+            headers[STALE_HEADER] = "true"
+            headers["Age"] = str(int(events.age_seconds))
+        if compact:
+            return Response(content=encode_compact_series(events), media_type="application/json", headers=headers)
+        if wants_msgpack(accept):
+            return Response(content=encode_events_columnar(events), media_type=MSGPACK_MEDIA_TYPE, headers=headers)
+        response.headers.update(headers)
         return events
+    except (CircuitOpenError, TimeoutError) as e:
+        handle_upstream_unavailable(e, calendar_service.user_email, "get_events")
     except HttpError as e:
         handle_google_api_error(e, calendar_service.user_email, "get_events")
     except Exception as e:
-        logger.error(f"Unexpected error getting events for {calendar_service.user_email}: {e}", exc_info=True)
+        logger.error("Unexpected error getting events for %s: %s", calendar_service.user_email, e, exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal server error.")
+
+def _parse_date_range(value: str) -> Tuple[datetime.date, datetime.date]:
+    start, sep, end = value.partition("..")
+    if not sep:
+        raise ValueError(value)
+    return datetime.date.fromisoformat(start), datetime.date.fromisoformat(end)
+
+@router.get(
+    "/events/ranges",
+    response_model=schemas.MultiRangeEventsResponse,
+    summary="Get events for several date ranges at once"
+)
+def get_calendar_events_ranges(
+    response: Response,
+    ranges: List[str] = Query(..., alias="range", description="Date range YYYY-MM-DD..YYYY-MM-DD; repeat for each range"),
+    calendar_service: GoogleCalendarService = Depends(get_calendar_service)
+):
+    """
+    Fetches events for several, possibly overlapping date ranges (e.g. the month grid and the agenda pane)
+    in one request. Ranges are merged into as few upstream windows as possible; each event is returned
+    once in `events`, and every range lists the IDs of its events.
+    While Google is unavailable the last known result is returned with `X-Calendar-Stale: true` and `Age` headers.
+    """
+    try:
+        parsed = [_parse_date_range(value) for value in ranges]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid range format. Use YYYY-MM-DD..YYYY-MM-DD.")
+
+    try:
+        result = calendar_service.get_events_for_ranges(parsed)
+        stale_age = result.pop('staleAgeSeconds')
+        if stale_age is not None:
+            response.headers[STALE_HEADER] = "true"
+            response.headers["Age"] = str(int(stale_age))
+        return result
+    except (CircuitOpenError, TimeoutError) as e:
+        handle_upstream_unavailable(e, calendar_service.user_email, "get_events_for_ranges")
+    except HttpError as e:
+        handle_google_api_error(e, calendar_service.user_email, "get_events_for_ranges")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error("Unexpected error getting ranges for %s: %s", calendar_service.user_email, e, exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal server error.")
+
+@router.get(
+    "/events/agenda",
+    response_model=schemas.EventsPageResponse,
+    summary="Get the next events of a date range, page by page"
+)
+def get_calendar_events_agenda(
+    startDate: Optional[str] = Query(None, description="Start date (YYYY-MM-DD), not needed with a cursor", pattern=r"^\d{4}-\d{2}-\d{2}$"),
+    endDate: Optional[str] = Query(None, description="End date (YYYY-MM-DD), not needed with a cursor", pattern=r"^\d{4}-\d{2}-\d{2}$"),
+    limit: int = Query(50, ge=1, le=250, description="Maximum number of events to return"),
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page"),
+    calendar_service: GoogleCalendarService = Depends(get_calendar_service)
+):
+    """
+    Returns up to `limit` events in start-time order plus a cursor for the next page.
+    Only as many upstream pages are fetched as needed to fill the page.
+    """
+    try:
+        start_date_obj = datetime.date.fromisoformat(startDate) if startDate else None
+        end_date_obj = datetime.date.fromisoformat(endDate) if endDate else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD.")
+
+    try:
+        events, next_cursor = calendar_service.get_events_page(start_date_obj, end_date_obj, limit, cursor)
+        return schemas.EventsPageResponse(events=events, nextCursor=next_cursor)
+    except (CircuitOpenError, TimeoutError) as e:
+        handle_upstream_unavailable(e, calendar_service.user_email, "get_events_page")
+    except HttpError as e:
+        handle_google_api_error(e, calendar_service.user_email, "get_events_page")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error("Unexpected error getting agenda for %s: %s", calendar_service.user_email, e, exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal server error.")
+
+@router.get(
+    "/events/search",
+    response_model=List[schemas.CalendarEventResponse],
+    summary="Full-text search over the user's events"
+)
+def search_calendar_events(
+    q: str = Query(..., min_length=1, max_length=200, description="Search words; each word also matches as a prefix"),
+    limit: int = Query(20, ge=1, le=100, description="Maximum number of events to return"),
+    calendar_service: GoogleCalendarService = Depends(get_calendar_service)
+):
+    """
+    Searches summary, location and description of the user's events, best matches first.
+    A recurring series is returned once, as its next occurrence. Answered from a local index;
+    Google is only queried when the index may not hold everything the query needs.
+    """
+    try:
+        return calendar_service.search_events(q, limit)
+    except (CircuitOpenError, TimeoutError) as e:
+        handle_upstream_unavailable(e, calendar_service.user_email, "search_events")
+    except HttpError as e:
+        handle_google_api_error(e, calendar_service.user_email, "search_events")
+    except Exception as e:
+        logger.error("Unexpected error searching events for %s: %s", calendar_service.user_email, e, exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal server error.")
+
+@router.get(
+    "/events/changes",
+    response_model=schemas.EventChangesResponse,
+    summary="Get events changed since a cursor"
+)
+def get_calendar_event_changes(
+    cursor: Optional[str] = Query(None, description="Cursor from the previous response; omit for a full sync"),
+    calendar_service: GoogleCalendarService = Depends(get_calendar_service)
+):
+    """
+    Returns events created, updated and deleted since `cursor`, plus a new cursor.
+    Without a cursor (or when the old one has expired upstream) a full sync is returned.
+    """
+    try:
+        return calendar_service.get_event_changes(cursor)
+    except (CircuitOpenError, TimeoutError) as e:
+        handle_upstream_unavailable(e, calendar_service.user_email, "get_event_changes")
+    except HttpError as e:
+        handle_google_api_error(e, calendar_service.user_email, "get_event_changes")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error("Unexpected error getting changes for %s: %s", calendar_service.user_email, e, exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal server error.")
+
+@router.get(
+    "/stats",
+    response_model=schemas.CalendarStatsResponse,
+    summary="Get time-usage statistics for a date range"
+)
+def get_calendar_stats(
+    startDate: str = Query(..., description="Start date (YYYY-MM-DD)", pattern=r"^\d{4}-\d{2}-\d{2}$"),
+    endDate: str = Query(..., description="End date (YYYY-MM-DD)", pattern=r"^\d{4}-\d{2}-\d{2}$"),
+    timeZone: str = Query("UTC", description="IANA time zone used for day and week boundaries"),
+    calendar_service: GoogleCalendarService = Depends(get_calendar_service)
+):
+    """
+    Returns busy hours per day and week, meeting counts and the recurring/one-off split.
+    Overlapping events are counted once; all-day events are counted separately and are not busy time.
+    """
+    try:
+        start_date_obj = datetime.date.fromisoformat(startDate)
+        end_date_obj = datetime.date.fromisoformat(endDate)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD.")
+
+    try:
+        return calendar_service.get_time_stats(start_date_obj, end_date_obj, timeZone)
+    except (CircuitOpenError, TimeoutError) as e:
+        handle_upstream_unavailable(e, calendar_service.user_email, "get_time_stats")
+    except HttpError as e:
+        handle_google_api_error(e, calendar_service.user_email, "get_time_stats")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error("Unexpected error computing stats for %s: %s", calendar_service.user_email, e, exc_info=True)
         raise HTTPException(status_code=500, detail="Internal server error.")
 
 @router.post(
     "/events",
     response_model=schemas.CreateEventResponse,
     status_code=status.HTTP_201_CREATED,
+    responses={202: {"model": schemas.MutationAcceptedResponse, "description": "Accepted for asynchronous creation"}},
     summary="Create a new event"
 )
 def create_calendar_event(
     event_data: schemas.CreateEventRequest,
+    response: Response,
+    checkConflicts: bool = Query(False, description="Reject with 409 and the overlapping events instead of creating"),
+    async_mode: bool = Query(False, alias="async", description="Queue the change and return 202 without waiting for Google"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255,
+                                            description="Retries with the same key return the first response instead of creating a duplicate"),
+    db: Session = Depends(get_db),
     calendar_service: GoogleCalendarService = Depends(get_calendar_service)
 ):
-    """Creates a new event in the user's primary Google Calendar."""
-    logger.info(f"Request to create event for user {calendar_service.user_email}: {event_data.model_dump()}")
+    """
+    Creates a new event in the user's primary Google Calendar.
+
+    With an `Idempotency-Key` header the event is created once: a retry with the same key and body
+    returns the stored response (marked with `Idempotent-Replayed: true`), and a retry that arrives
+    while the first request is still running waits for it.
+
+    With `async=true` the event is only queued: the response is `202` with a `mutationId` (also usable
+    as a provisional event ID in later PATCH/DELETE requests), and the event is written to Google in the
+    background. The final status and event ID are available from `GET /calendar/mutations/{mutationId}`.
+    """
+    logger.info("Request to create event for user %s", calendar_service.user_email)
+    logger.debug("Create event payload: %s", event_data)
+
+    def create() -> dict:
+        if async_mode:
+            mutation = mutation_queue.enqueue(db, calendar_service.google_id, "create", None, event_data.model_dump(),
+                                              check_conflicts=checkConflicts)
+            return {"mutationId": mutation.id, "eventId": mutation.id}
+        created_event = calendar_service.create_event(event_data, check_conflicts=checkConflicts)
+        return schemas.CreateEventResponse(eventId=created_event.get('id')).model_dump()
+
     try:
-        created_event = calendar_service.create_event(event_data)
-        return schemas.CreateEventResponse(eventId=created_event.get('id'))
+        replayed = False
+        if not idempotency_key:
+            body = create()
+        else:
+            fingerprint = request_fingerprint(event_data.model_dump(), checkConflicts, async_mode)
+            body, replayed = idempotency.run(calendar_service.user_email, idempotency_key, fingerprint, create)
+        if replayed:
+            logger.info("Replaying create event response for %s (Idempotency-Key %s)", calendar_service.user_email, idempotency_key)
+            response.headers[IDEMPOTENT_REPLAY_HEADER] = "true"
+        if async_mode:
+            return accepted(body["mutationId"], body["eventId"], headers={IDEMPOTENT_REPLAY_HEADER: "true"} if replayed else None)
+        return body
+    except IdempotencyKeyReusedError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except IdempotencyInProgressError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e), headers={"Retry-After": "1"})
+    except EventConflictError as e:
+        raise_conflict(e)
+    except (CircuitOpenError, TimeoutError) as e:
+        handle_upstream_unavailable(e, calendar_service.user_email, "create_event")
     except HttpError as e:
         handle_google_api_error(e, calendar_service.user_email, "create_event")
     except ValueError as e: # Для обработки ошибок валидации из сервиса
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"Unexpected error creating event for {calendar_service.user_email}: {e}", exc_info=True)
+        logger.error("Unexpected error creating event for %s: %s", calendar_service.user_email, e, exc_info=True)
         raise HTTPException(status_code=500, detail="Internal server error.")
 
 @router.patch(
     "/events/{event_id}",
     response_model=schemas.UpdateEventResponse,
+    responses={202: {"model": schemas.MutationAcceptedResponse, "description": "Accepted for asynchronous update"}},
     summary="Update an existing event"
 )
 def update_calendar_event(
     event_id: str = Path(..., description="The ID of the event to update"),
     event_data: schemas.UpdateEventRequest = ...,
     update_mode: schemas.UpdateEventMode = Query(..., description="Update mode for recurring events"),
+    checkConflicts: bool = Query(False, description="Reject with 409 and the overlapping events if the new time conflicts"),
+    async_mode: bool = Query(False, alias="async", description="Queue the change and return 202 without waiting for Google"),
+    db: Session = Depends(get_db),
     calendar_service: GoogleCalendarService = Depends(get_calendar_service)
 ):
-    """Updates an existing event in the user's primary Google Calendar."""
-    logger.info(f"Request to update event {event_id} for user {calendar_service.user_email} with mode {update_mode}")
+    """
+    Updates an existing event in the user's primary Google Calendar.
+
+    With `update_mode=this_and_following` on a recurring instance the series is split: the original
+    series ends before the instance and a new series (its id is returned as `eventId`) starts from it
+    with the changes applied. Later modified or cancelled instances are carried over to the new series.
+
+    With `async=true` the change is queued and the response is `202` (see `POST /calendar/events`).
+    Changes of one event are applied in the order they were accepted; while an event has queued
+    changes, synchronous updates and deletions of it are rejected with `409` and `Retry-After`.
+    """
+    logger.info("Request to update event %s for user %s with mode %s", event_id, calendar_service.user_email, update_mode)
+    if async_mode:
+        try:
+            mutation = mutation_queue.enqueue(db, calendar_service.google_id, "update", event_id,
+                                              event_data.model_dump(exclude_unset=True), mode=update_mode.value,
+                                              check_conflicts=checkConflicts)
+        except MutationNotFoundError as e:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+        return accepted(mutation.id, event_id)
+    event_id = resolve_event_id(db, calendar_service.google_id, event_id)
     try:
-        updated_event, updated_fields = calendar_service.update_event(event_id, event_data, update_mode)
+        updated_event, updated_fields = calendar_service.update_event(event_id, event_data, update_mode, check_conflicts=checkConflicts)
         # Формируем правильный объект ответа
         return schemas.UpdateEventResponse(
             eventId=updated_event.get('id'),
             updatedFields=updated_fields
         )
+    except EventConflictError as e:
+        raise_conflict(e)
+    except (CircuitOpenError, TimeoutError) as e:
+        handle_upstream_unavailable(e, calendar_service.user_email, f"update_event:{event_id}")
     except HttpError as e:
         handle_google_api_error(e, calendar_service.user_email, f"update_event:{event_id}")
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
-    except NotImplementedError as e: # Для режима THIS_AND_FOLLOWING
-        raise HTTPException(status_code=501, detail=str(e))
     except Exception as e:
-        logger.error(f"Unexpected error updating event {event_id} for {calendar_service.user_email}: {e}", exc_info=True)
+        logger.error("Unexpected error updating event %s for %s: %s", event_id, calendar_service.user_email, e, exc_info=True)
         raise HTTPException(status_code=500, detail="Internal server error.")
 
 @router.delete(
     "/events/{event_id}",
     status_code=status.HTTP_204_NO_CONTENT,
+    responses={202: {"model": schemas.MutationAcceptedResponse, "description": "Accepted for asynchronous deletion"}},
     summary="Delete an event"
 )
 def delete_calendar_event(
     event_id: str = Path(..., description="The ID of the event to delete"),
     mode: schemas.DeleteEventMode = Query(schemas.DeleteEventMode.DEFAULT, description="Deletion mode"),
+    async_mode: bool = Query(False, alias="async", description="Queue the change and return 202 without waiting for Google"),
+    db: Session = Depends(get_db),
     calendar_service: GoogleCalendarService = Depends(get_calendar_service)
 ):
-    """Deletes an event from the user's primary Google Calendar."""
-    logger.info(f"Request to delete event {event_id} for user {calendar_service.user_email} with mode {mode}")
+    """
+    Deletes an event from the user's primary Google Calendar.
+
+    With `async=true` the deletion is queued and the response is `202` (see `POST /calendar/events`).
+    """
+    logger.info("Request to delete event %s for user %s with mode %s", event_id, calendar_service.user_email, mode)
+    if async_mode:
+        try:
+            mutation = mutation_queue.enqueue(db, calendar_service.google_id, "delete", event_id, {}, mode=mode.value)
+        except MutationNotFoundError as e:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+        return accepted(mutation.id, event_id)
+    event_id = resolve_event_id(db, calendar_service.google_id, event_id)
     try:
         calendar_service.delete_event(event_id, mode)
         return Response(status_code=status.HTTP_204_NO_CONTENT)
+    except (CircuitOpenError, TimeoutError) as e:
+        handle_upstream_unavailable(e, calendar_service.user_email, f"delete_event:{event_id}")
     except HttpError as e:
         # Особый случай для 410 Gone - событие уже удалено, это успех
         if hasattr(e, 'resp') and e.resp.status == 410:
-            logger.warning(f"Event {event_id} was already deleted (410 Gone). Returning success.")
+            logger.warning("Event %s was already deleted (410 Gone). Returning success.", event_id)
             return Response(status_code=status.HTTP_204_NO_CONTENT)
         handle_google_api_error(e, calendar_service.user_email, f"delete_event:{event_id}")
     except Exception as e:
-        logger.error(f"Unexpected error deleting event {event_id} for {calendar_service.user_email}: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail="Internal server error.")
\ No newline at end of file
+        logger.error("Unexpected error deleting event %s for %s: %s", event_id, calendar_service.user_email, e, exc_info=True)
+        raise HTTPException(status_code=500, detail="Internal server error.")
+
+@router.get(
+    "/mutations/{mutation_id}",
+    response_model=schemas.MutationStatusResponse,
+    summary="Get the status of an asynchronous change"
+)
+def get_mutation_status(
+    mutation_id: str = Path(..., description="mutationId from a 202 response"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """Returns the status of a change accepted with `async=true` and, once written, the Google event ID."""
+    try:
+        mutation = mutation_queue.get(db, current_user.google_id, mutation_id)
+    except MutationNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    return schemas.MutationStatusResponse(
+        mutationId=mutation.id,
+        operation=mutation.operation,
+        status=mutation.status,
+        eventId=mutation.result_event_id or mutation.event_id,
+        attempts=mutation.attempts,
+        error=mutation.error,
+    )
+
+@router.post(
+    "/import",
+    response_model=schemas.ImportStatusResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Import events from an .ics file"
+)
+async def import_calendar(
+    request: Request,
+    calendar_service: GoogleCalendarService = Depends(get_calendar_service)
+):
+    """
+    Imports the VEVENTs of an iCalendar file sent as the raw request body (`Content-Type: text/calendar`)
+    into the user's primary calendar.
+
+    The import runs in the background: the response is `202` with an `importId`, and progress and
+    per-event errors are available from `GET /calendar/import/{importId}`. Recurring series are imported
+    as series (RRULE/EXDATE/RDATE); cancelled events and modified instances (RECURRENCE-ID) are skipped.
+    Events with a UID are imported once: importing the same file again reports them as duplicates.
+    """
+    logger.info("Request to import ICS for user %s", calendar_service.user_email)
+    # Файл не держим в памяти целиком: больше IMPORT_SPOOL_BYTES - во временный файл, разбор - построчно
+    source = tempfile.SpooledTemporaryFile(max_size=settings.IMPORT_SPOOL_BYTES)
+    try:
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > settings.IMPORT_MAX_BYTES:
+                raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                                    detail=f"The file is larger than {settings.IMPORT_MAX_BYTES} bytes")
+            source.write(chunk)
+        if size == 0:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="The request body must be an .ics file")
+        source.seek(0)
+        job = ics_importer.start(calendar_service.google_id, source)
+    except ImportBusyError as e:
+        source.close()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except BaseException:
+        source.close()
+        raise
+    return job.snapshot()
+
+@router.get(
+    "/import/{import_id}",
+    response_model=schemas.ImportStatusResponse,
+    summary="Get the progress of an .ics import"
+)
+def get_import_status(
+    import_id: str = Path(..., description="importId from POST /calendar/import"),
+    current_user: User = Depends(get_current_user),
+):
+    """Returns the progress of an import and the events that could not be imported."""
+    try:
+        return ics_importer.get(current_user.google_id, import_id).snapshot()
+    except ImportNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+
+@router.get(
+    "/export/link",
+    response_model=schemas.ExportLinkResponse,
+    summary="Get the .ics subscription link"
+)
+def get_export_link(request: Request, current_user: User = Depends(get_current_user)):
+    """
+    Returns the URL of the user's calendar as an iCalendar feed, for subscribing from other calendar apps.
+    The link carries a signed token instead of the Authorization header, which subscribers cannot send.
+    """
+    url = request.url_for("export_calendar_ics").include_query_params(token=feed_token(current_user.google_id))
+    return schemas.ExportLinkResponse(url=str(url))
+
+@router.get(
+    "/export.ics",
+    name="export_calendar_ics",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"text/calendar": {}}}, 304: {"description": "Not modified"}},
+    summary="iCalendar feed of the user's calendar"
+)
+def export_calendar_ics(
+    token: str = Query(..., description="Token from GET /calendar/export/link"),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    if_modified_since: Optional[str] = Header(None, alias="If-Modified-Since"),
+):
+    """
+    Streams the user's events (from `EXPORT_PAST_DAYS` ago onwards) as VEVENTs. Recurring series are sent
+    as RRULE masters with EXDATEs for cancelled instances, and modified instances as RECURRENCE-ID overrides.
+
+    The feed is served from cache with `ETag` and `Last-Modified`: a poll with `If-None-Match` or
+    `If-Modified-Since` gets `304` while nothing has changed, without a call to Google.
+    """
+    google_id = feed_user(token)
+    if google_id is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Feed not found")
+    try:
+        feed = ics_feeds.get(google_id)
+    except (CircuitOpenError, TimeoutError) as e:
+        handle_upstream_unavailable(e, google_id, "export_ics")
+    except HttpError as e:
+        handle_google_api_error(e, google_id, "export_ics")
+    if feed is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Feed not found")
+    headers = {"ETag": feed.etag, "Last-Modified": feed.last_modified_header, "Cache-Control": "private, no-cache"}
+    if feed.not_modified(if_none_match, if_modified_since):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    headers["Content-Length"] = str(feed.size)
+    return StreamingResponse(iter(feed.chunks), media_type="text/calendar; charset=utf-8", headers=headers)
+
+@router.post(
+    "/notifications",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="Receive Google Calendar push notifications",
+    include_in_schema=False
+)
+def receive_calendar_notification(
+    channel_id: str = Header(..., alias="X-Goog-Channel-ID"),
+    resource_state: str = Header(..., alias="X-Goog-Resource-State"),
+    channel_token: Optional[str] = Header(None, alias="X-Goog-Channel-Token"),
+):
+    """Webhook for events.watch channels: drops cached calendar data of the notified user."""
+    try:
+        channel_manager.handle_notification(channel_id, channel_token, resource_state)
+    except PermissionError as e:
+        logger.warning("Rejected calendar notification: %s", e)
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid channel token.")
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -5,7 +5,6 @@ from pydantic import BaseModel, Field, field_validator
 from typing import List, Optional
 from enum import Enum
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class CalendarEventResponse(BaseModel):
@@ -23,6 +22,57 @@ class CalendarEventResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class EventsPageResponse(BaseModel):
+    events: List[CalendarEventResponse]
+    nextCursor: Optional[str] = Field(None, description="Opaque cursor for the next page; absent on the last page")
+
+class RangeEventsResponse(BaseModel):
+    startDate: str
+    endDate: str
+    eventIds: List[str] = Field(..., description="IDs of the events in `events` that overlap this range")
+
+class MultiRangeEventsResponse(BaseModel):
+    events: List[CalendarEventResponse] = Field(..., description="Events of all ranges, each event once")
+    ranges: List[RangeEventsResponse] = Field(..., description="Requested ranges in request order")
+
+class DeletedEventResponse(BaseModel):
+    id: str
+    recurringEventId: Optional[str] = None
+    originalStartTime: Optional[str] = None
+
+class EventChangesResponse(BaseModel):
+    created: List[CalendarEventResponse]
+    updated: List[CalendarEventResponse]
+    deleted: List[DeletedEventResponse] = Field(..., description="Tombstones of deleted events and cancelled instances")
+    fullSync: bool = Field(..., description="True if the client must replace its local copy with `created`")
+    nextCursor: str
+
+class StatsTotals(BaseModel):
+    busyHours: float = Field(..., description="Time covered by timed events; overlaps are counted once")
+    meetingCount: int
+    allDayEventCount: int
+    recurringHours: float
+    oneOffHours: float
+    recurringMeetingCount: int
+    oneOffMeetingCount: int
+
+class DayStats(BaseModel):
+    date: str
+    busyHours: float
+    meetingCount: int = Field(..., description="Timed events starting on this day")
+    allDayEventCount: int = Field(..., description="All-day events covering this day")
+
+class WeekStats(BaseModel):
+    weekStart: str = Field(..., description="Monday of the week (YYYY-MM-DD)")
+    busyHours: float
+    meetingCount: int
+
+class CalendarStatsResponse(BaseModel):
+    timeZone: str
+    totals: StatsTotals
+    days: List[DayStats]
+    weeks: List[WeekStats]
+
 class CreateEventRequest(BaseModel):
     summary: str = Field(..., min_length=1, description="Event title")
     startTime: str = Field(..., description="Start time in ISO 8601 format (date or datetime)")
@@ -55,7 +105,7 @@ class CreateEventRequest(BaseModel):
         #      logger.warning(f"Could not perform strict datetime validation for startTime='{start_time}', endTime='{v}'")
         #      pass # Пока пропускаем, если не можем распарсить
         if start_time and v < start_time: # Простое строковое сравнение (ненадежно)
-            logger.warning(f"Validation warning: endTime '{v}' might be before startTime '{start_time}'. Allowing for now.")
+            logger.warning("Validation warning: endTime '%s' might be before startTime '%s'. Allowing for now.", v, start_time)
         return v
     
 class UpdateEventRequest(BaseModel):
@@ -91,4 +141,38 @@ class CreateEventResponse(BaseModel):
 class DeleteEventMode(str, Enum):
     DEFAULT = "default"
     INSTANCE_ONLY = "instance_only"
-    # ALL_SERIES = "all_series" # Можно использовать DEFAULT для этого
\ No newline at end of file
+    # ALL_SERIES = "all_series" # Можно использовать DEFAULT для этого
+# Отложенная запись изменений (?async=true)
+class MutationAcceptedResponse(BaseModel):
+    status: str = "pending"
+    mutationId: str = Field(..., description="Poll GET /calendar/mutations/{mutationId} for the final status")
+    eventId: Optional[str] = Field(None, description="Target event; for a create this is a provisional ID usable in later PATCH/DELETE")
+
+class MutationStatusResponse(BaseModel):
+    mutationId: str
+    operation: str = Field(..., description="create, update or delete")
+    status: str = Field(..., description="pending, in_progress, done or failed")
+    eventId: Optional[str] = Field(None, description="Google Calendar event ID once known")
+    attempts: int
+    error: Optional[str] = None
+
+class ImportEventError(BaseModel):
+    line: int = Field(..., description="Line of BEGIN:VEVENT in the uploaded file")
+    uid: Optional[str] = None
+    summary: Optional[str] = None
+    error: str
+
+class ImportStatusResponse(BaseModel):
+    importId: str
+    status: str = Field(..., description="running, done or failed")
+    parsed: int = Field(..., description="VEVENTs read so far")
+    imported: int
+    duplicates: int = Field(..., description="Events already imported earlier (same UID)")
+    skipped: int = Field(..., description="Cancelled events and modified instances of recurring events")
+    failed: int
+    errors: List[ImportEventError]
+    errorsTruncated: bool
+    error: Optional[str] = Field(None, description="Why the whole import failed")
+
+class ExportLinkResponse(BaseModel):
+    url: str = Field(..., description="Subscription URL of the .ics feed; anyone with the link can read the calendar")
@@ -0,0 +1,277 @@
+# src/calendar/search.py
+import bisect
+import datetime
+import heapq
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from src.core.config import settings
+from .cache import event_overlaps, parse_event_time
+
+logger = logging.getLogger(__name__)
+
+# Веса полей при ранжировании: совпадение в названии важнее, чем в описании
+FIELD_WEIGHTS = {"summary": 3.0, "location": 2.0, "description": 1.0}
+# Совпадение по префиксу ("стенд" -> "стендап") ценится меньше точного
+PREFIX_MATCH_FACTOR = 0.5
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    return [token.casefold() for token in _TOKEN_RE.findall(text)]
+
+
+def _overlaps(event: Dict[str, Any], time_min: datetime.datetime, time_max: datetime.datetime) -> bool:
+    try:
+        return event_overlaps(event, time_min, time_max)
+    except (KeyError, TypeError, ValueError):
+        return False
+
+
+class _UserIndex:
+    """Инвертированный индекс событий одного пользователя."""
+
+    __slots__ = ("docs", "starts", "postings", "doc_tokens", "sorted_tokens", "synced_at", "upstream_queries")
+
+    def __init__(self):
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        # Начало события (epoch) для ранжирования, разбирается один раз при индексации
+        self.starts: Dict[str, float] = {}
+        # токен -> {id события: вес лучшего поля с этим токеном}
+        self.postings: Dict[str, Dict[str, float]] = {}
+        self.doc_tokens: Dict[str, Set[str]] = {}
+        # Отсортированный словарь для поиска по префиксу; None - нужно перестроить
+        self.sorted_tokens: Optional[List[str]] = []
+        # Время последней полной синхронизации (monotonic) или None
+        self.synced_at: Optional[float] = None
+        # Запросы, уже выполненные в Google с q= (нормализованный запрос -> monotonic)
+        self.upstream_queries: Dict[str, float] = {}
+
+    def add(self, event: Dict[str, Any]) -> None:
+        event_id = event["id"]
+        self.remove(event_id)
+        try:
+            start = parse_event_time(event["startTime"]).timestamp()
+        except (KeyError, TypeError, ValueError):
+            return
+        weights: Dict[str, float] = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(event.get(field)):
+                if weight > weights.get(token, 0):
+                    weights[token] = weight
+        for token, weight in weights.items():
+            postings = self.postings.get(token)
+            if postings is None:
+                postings = self.postings[token] = {}
+                self.sorted_tokens = None
+            postings[event_id] = weight
+        self.docs[event_id] = event
+        self.starts[event_id] = start
+        self.doc_tokens[event_id] = set(weights)
+
+    def remove(self, event_id: str) -> None:
+        if self.docs.pop(event_id, None) is None:
+            return
+        del self.starts[event_id]
+        for token in self.doc_tokens.pop(event_id, ()):
+            postings = self.postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(event_id, None)
+            if not postings:
+                del self.postings[token]
+                self.sorted_tokens = None
+
+    def remove_with_instances(self, event_ids: Set[str]) -> None:
+        """Удаляет события и, если среди них есть мастер-события, все экземпляры их серий."""
+        doomed = [i for i, e in self.docs.items() if i in event_ids or e.get("recurringEventId") in event_ids]
+        for event_id in doomed:
+            self.remove(event_id)
+
+    def match(self, term: str) -> Dict[str, float]:
+        """Вес совпадения каждого события с термом: точное совпадение токена или префикс."""
+        if self.sorted_tokens is None:
+            self.sorted_tokens = sorted(self.postings)
+        scores: Dict[str, float] = {}
+        position = bisect.bisect_left(self.sorted_tokens, term)
+        while position < len(self.sorted_tokens) and self.sorted_tokens[position].startswith(term):
+            token = self.sorted_tokens[position]
+            factor = 1.0 if token == term else PREFIX_MATCH_FACTOR
+            for event_id, weight in self.postings[token].items():
+                score = weight * factor
+                if score > scores.get(event_id, 0):
+                    scores[event_id] = score
+            position += 1
+        return scores
+
+
+class EventSearchIndex:
+    """
+    In-process полнотекстовый индекс событий (summary, location, description)
+    по пользователям.
+
+    Наполняется событиями, которые сервис и так получает от Google: окна
+    get_events (загруженное окно заменяет проиндексированное) и дельты
+    get_event_changes; мутации через API применяются сразу.
+    После полной синхронизации (get_event_changes без курсора) индекс считается
+    полным на fresh_seconds, и каждая следующая дельта продлевает этот срок -
+    тогда поиск не обращается к Google совсем.
+    Хранит не больше max_users пользователей (LRU).
+    """
+
+    def __init__(self, max_users: int = 1000, fresh_seconds: float = 300):
+        self.max_users = max_users
+        self.fresh_seconds = fresh_seconds
+        self._lock = threading.Lock()
+        self._users: "OrderedDict[str, _UserIndex]" = OrderedDict()
+
+    def _user(self, user: str) -> _UserIndex:
+        index = self._users.get(user)
+        if index is None:
+            index = self._users[user] = _UserIndex()
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        self._users.move_to_end(user)
+        return index
+
+    # --- Наполнение ---
+
+    def add_events(self, user: str, events: Iterable[Dict[str, Any]]) -> None:
+        with self._lock:
+            index = self._user(user)
+            for event in events:
+                index.add(event)
+
+    def replace_window(self, user: str, time_min: datetime.datetime, time_max: datetime.datetime,
+                       events: Iterable[Dict[str, Any]]) -> None:
+        """
+        Результат загрузки окна [time_min, time_max): проиндексированные события
+        этого окна заменяются загруженными, события, которых Google больше не
+        вернул (удалены или перенесены вне нашего API), убираются.
+        """
+        events = list(events)
+        fetched = {event["id"] for event in events}
+        with self._lock:
+            index = self._user(user)
+            for event_id in [i for i, e in index.docs.items() if i not in fetched and _overlaps(e, time_min, time_max)]:
+                index.remove(event_id)
+            for event in events:
+                index.add(event)
+
+    def replace_all(self, user: str, events: Iterable[Dict[str, Any]]) -> None:
+        """Результат полной синхронизации: индекс пользователя строится заново и считается полным."""
+        index = _UserIndex()
+        for event in events:
+            index.add(event)
+        index.synced_at = time.monotonic()
+        with self._lock:
+            self._users[user] = index
+            self._users.move_to_end(user)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+
+    def apply_changes(self, user: str, deleted_ids: Iterable[str], events: Iterable[Dict[str, Any]]) -> None:
+        """
+        Дельта инкрементальной синхронизации. Индекс, который был полным и не
+        помечен устаревшим, после нее снова актуален - его полнота продлевается.
+        """
+        with self._lock:
+            index = self._user(user)
+            index.remove_with_instances(set(deleted_ids))
+            for event in events:
+                index.add(event)
+            now = time.monotonic()
+            if index.synced_at is not None and now - index.synced_at <= self.fresh_seconds:
+                index.synced_at = now
+
+    def remove_events(self, user: str, event_ids: Iterable[str]) -> None:
+        with self._lock:
+            index = self._users.get(user)
+            if index is not None:
+                index.remove_with_instances(set(event_ids))
+
+    def mark_stale(self, user: str) -> None:
+        """Данные изменились вне нашего API: индекс остается, но больше не считается полным."""
+        with self._lock:
+            index = self._users.get(user)
+            if index is not None:
+                index.synced_at = None
+                index.upstream_queries.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._users.clear()
+
+    # --- Поиск ---
+
+    def is_complete(self, user: str, query: Optional[str] = None) -> bool:
+        """
+        True, если индекс пользователя можно считать полным: недавно была полная
+        синхронизация или этот же запрос недавно уже выполнялся в Google.
+        """
+        now = time.monotonic()
+        with self._lock:
+            index = self._users.get(user)
+            if index is None:
+                return False
+            if index.synced_at is not None and now - index.synced_at <= self.fresh_seconds:
+                return True
+            searched_at = index.upstream_queries.get(" ".join(tokenize(query))) if query else None
+            return searched_at is not None and now - searched_at <= self.fresh_seconds
+
+    def note_upstream_search(self, user: str, query: str) -> None:
+        """Запоминает, что результаты запроса в Google уже добавлены в индекс."""
+        with self._lock:
+            index = self._user(user)
+            index.upstream_queries[" ".join(tokenize(query))] = time.monotonic()
+
+    def search(self, user: str, query: str, limit: int) -> List[Dict[str, Any]]:
+        """
+        Ищет события, содержащие все слова запроса (каждое - как точное слово или префикс).
+
+        Результаты ранжируются по сумме весов полей; из серии повторяющихся
+        событий возвращается одно - ближайшее предстоящее (или последнее прошедшее).
+        При равном весе предстоящие события идут раньше прошедших.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+        with self._lock:
+            index = self._users.get(user)
+            if index is None:
+                return []
+            # Пересекаем, начиная с самого редкого слова
+            matches = sorted((index.match(term) for term in terms), key=len)
+            scores = matches[0]
+            for matched in matches[1:]:
+                if not scores:
+                    break
+                scores = {i: s + matched[i] for i, s in scores.items() if i in matched}
+            if not scores:
+                return []
+            now = time.time()
+            best: Dict[str, Tuple[Tuple[float, int, float], Dict[str, Any]]] = {}
+            for event_id, score in scores.items():
+                event = index.docs[event_id]
+                distance = index.starts[event_id] - now
+                # Ключ сортировки: больший вес, затем предстоящие по близости, затем прошедшие от новых к старым
+                key = (-score, 0 if distance >= 0 else 1, abs(distance))
+                series = event.get("recurringEventId") or event_id
+                current = best.get(series)
+                if current is None or key < current[0]:
+                    best[series] = (key, event)
+        ranked = heapq.nsmallest(limit, best.values(), key=lambda item: item[0])
+        return [event for _, event in ranked]
+
+
+search_index = EventSearchIndex(
+    max_users=settings.SEARCH_INDEX_MAX_USERS,
+    fresh_seconds=settings.EVENTS_CACHE_TTL_SECONDS,
+)
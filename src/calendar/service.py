@@ -1,17 +1,145 @@
 # src/calendar/service.py
 from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build, Resource
 from googleapiclient.errors import HttpError
+import copy
+import json
 import logging
-from googleapiclient.discovery import build
-from typing import Dict, List, Any, Optional, Tuple
+import threading
+import time
+import uuid
+from typing import TYPE_CHECKING, Dict, List, Any, Optional, Tuple
 import datetime
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+if TYPE_CHECKING:
+    from googleapiclient.discovery import Resource
+    from googleapiclient.http import HttpRequest
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
 from .schemas import CreateEventRequest, UpdateEventRequest, UpdateEventMode, DeleteEventMode
+from .singleflight import SingleFlight
+from .cache import RangeCache, IntervalIndex, event_interval, event_overlaps, merge_date_ranges, range_bounds
+from .search import search_index
+from .cursors import encode_cursor, decode_cursor
+from .recurrence import (continue_recurrence, format_recurrence_dates, has_count, instance_suffix, is_all_day,
+                         local_start, split_recurrence_dates, truncate_recurrence, until_before)
+from src.core.config import settings
+from src.core.metrics import metrics
+from src.core.circuit import CircuitOpenError, circuit_breakers
+from src.core.deadline import call_timeout
+from src.core.hedging import Hedger, LatencyWindow
+
+# Общий для всех запросов процесса: схлопывает одинаковые параллельные
+# запросы диапазона одного пользователя в один поход в Google.
+_range_flight = SingleFlight()
+# Кэш распарсенных событий по окнам дат, инвалидируется мутациями и push-уведомлениями
+range_cache = RangeCache(ttl_seconds=settings.EVENTS_CACHE_TTL_SECONDS)
+
+# Максимальная длина диапазона для статистики
+STATS_MAX_DAYS = 731
+# Запрос нескольких диапазонов: сколько диапазонов и какой промежуток между ними загружать одним окном
+MULTI_RANGE_MAX_RANGES = 16
+MULTI_RANGE_MERGE_GAP_DAYS = 7
+
+# Google рекомендует не больше 50 запросов в одном batch
+BATCH_MAX_REQUESTS = 50
+# Поля мастер-события, которые переходят к новой серии при разделении ("этот и последующие")
+SERIES_COPY_FIELDS = ('summary', 'description', 'location', 'colorId', 'transparency', 'visibility',
+                      'attendees', 'reminders', 'guestsCanModify', 'guestsCanInviteOthers',
+                      'guestsCanSeeOtherGuests', 'extendedProperties')
+# Поля исключения серии, которые переносятся на экземпляр новой серии
+EXCEPTION_OVERRIDE_FIELDS = ('summary', 'description', 'location', 'colorId', 'transparency', 'attendees')
+
+# Идемпотентные чтения, которые можно продублировать, если Google отвечает дольше обычного
+HEDGED_METHODS = frozenset({'events.list', 'events.get'})
+# Длительности успешных вызовов Google по методам: из них берется порог хеджирования
+upstream_latency = LatencyWindow(min_samples=settings.GOOGLE_HEDGE_MIN_SAMPLES)
+google_hedger = Hedger(max_workers=settings.GOOGLE_HEDGE_WORKERS, thread_name_prefix="google-hedge")
+
+
+# Discovery-документ Calendar API разбирается один раз на процесс. googleapiclient.discovery
+# импортируется лениво: это самый тяжелый модуль клиента Google и не нужен до первого запроса.
+_discovery_document: Optional[Dict[str, Any]] = None
+_discovery_lock = threading.Lock()
+
+
+def load_discovery_document() -> Dict[str, Any]:
+    """Загружает (из пакета googleapiclient, без сети) и кэширует discovery-документ calendar v3."""
+    global _discovery_document
+    if _discovery_document is None:
+        with _discovery_lock:
+            if _discovery_document is None:
+                from googleapiclient import discovery_cache
+                _discovery_document = json.loads(discovery_cache.get_static_doc('calendar', 'v3'))
+    return _discovery_document
+
+
+def _build_calendar_resource(creds: Credentials) -> "Resource":
+    from googleapiclient.discovery import build_from_document
+    return build_from_document(load_discovery_document(), credentials=creds)
+
+
+def _new_authorized_http(creds: Credentials) -> Any:
+    """Отдельное HTTP-соединение с Google: httplib2.Http нельзя использовать из нескольких потоков сразу."""
+    import google_auth_httplib2
+    import httplib2
+    return google_auth_httplib2.AuthorizedHttp(creds, http=httplib2.Http(timeout=settings.GOOGLE_CALL_TIMEOUT_SECONDS))
+
+
+def _set_socket_timeout(http: Any, timeout: float) -> None:
+    """httplib2 задает таймаут сокета при подключении, поэтому у открытых соединений меняем его на месте."""
+    inner = getattr(http, 'http', http)  # AuthorizedHttp оборачивает httplib2.Http
+    inner.timeout = timeout
+    for conn in list(getattr(inner, 'connections', {}).values()):
+        conn.timeout = timeout
+        if getattr(conn, 'sock', None) is not None:
+            conn.sock.settimeout(timeout)
+
+
+def _copy_request(request: "HttpRequest") -> "HttpRequest":
+    """Копия запроса для хеджа: execute() дописывает заголовки в сам объект запроса."""
+    clone = copy.copy(request)
+    clone.headers = dict(request.headers)
+    return clone
+
+
+def is_upstream_failure(error: BaseException) -> bool:
+    """
+    Ошибка, говорящая о проблеме на стороне Google (а не в запросе): 5xx, 429,
+    таймауты и сетевые ошибки, отказ circuit breaker'а. Учитывается breaker'ом
+    и разрешает отдать устаревшие данные.
+    """
+    if isinstance(error, CircuitOpenError):
+        return True
+    if isinstance(error, HttpError):
+        status = getattr(getattr(error, 'resp', None), 'status', None)
+        return status is None or int(status) >= 500 or int(status) == 429
+    # socket.timeout и ошибки соединения - подклассы OSError; у httplib2 свой базовый класс
+    return isinstance(error, OSError) or type(error).__module__.startswith('httplib2')
+
+
+class StaleEvents(list):
+    """События из последнего известного результата, отданные потому, что Google недоступен."""
+
+    def __init__(self, events: List[Dict[str, Any]], age_seconds: float):
+        super().__init__(events)
+        self.age_seconds = age_seconds
+
+
+class EventConflictError(Exception):
+    """Событие пересекается с другими событиями пользователя (режим checkConflicts)."""
+
+    def __init__(self, conflicts: List[Dict[str, Any]]):
+        super().__init__(f"Event overlaps with {len(conflicts)} existing event(s)")
+        self.conflicts = conflicts
+
+
+def invalidate_user_data(user_email: str) -> None:
+    """Сбрасывает все закэшированные и выполняющиеся чтения календаря пользователя."""
+    _range_flight.forget(user_email)
+    range_cache.invalidate_user(user_email)
 
 class SimpleCalendarEvent:
     def __init__(self, id: str, summary: str, start_time: str, end_time: str,
@@ -20,7 +148,8 @@ class SimpleCalendarEvent:
                  location: Optional[str] = None,
                  recurring_event_id: Optional[str] = None,
                  original_start_time: Optional[str] = None,
-                 recurrence: Optional[List[str]] = None):
+                 recurrence: Optional[List[str]] = None,
+                 time_zone: Optional[str] = None):
         self.id = id
         self.summary = summary
         self.startTime = start_time
@@ -31,6 +160,8 @@ class SimpleCalendarEvent:
         self.recurringEventId = recurring_event_id
         self.originalStartTime = original_start_time
         self.recurrence_list = recurrence
+        # Часовой пояс события (в ответ API не входит; нужен экспорту .ics для серий)
+        self.timeZone = time_zone
 
     def to_dict(self) -> Dict[str, Any]: # Явно указываем тип возвращаемого значения
         main_rrule = None
@@ -66,12 +197,13 @@ class GoogleCalendarService:
     с Google Calendar API.
     """
 
-    def __init__(self, creds: Credentials, user_email: str):
+    def __init__(self, creds: Credentials, user_email: str, google_id: Optional[str] = None):
         """
         Инициализирует сервис с учетными данными Google.
 
         Args:
             creds: Объект Credentials для аутентификации запросов.
+            google_id: ID пользователя - владелец изменений в очереди отложенной записи.
         
         Raises:
             ValueError: если creds не предоставлены.
@@ -82,20 +214,132 @@ class GoogleCalendarService:
             raise ValueError("User email is required for logging and context")
         self.creds = creds
         self.user_email = user_email
-        # Создаем сервисный объект один раз при инициализации
-        # cache_discovery=False рекомендуется для долгоживущих приложений, чтобы избежать
-        # проблем с устаревшим кэшем API.
+        self.google_id = google_id
+        # Создаем сервисный объект один раз при инициализации.
+        # Discovery-документ уже разобран и закэширован, поэтому сборка почти бесплатна.
         try:
-            self.service: Resource = build('calendar', 'v3', credentials=self.creds, cache_discovery=False)
+            self.service: "Resource" = _build_calendar_resource(self.creds)
         except Exception as e:
-            logger.error(f"Failed to build Google Calendar service for user {self.user_email}: {e}")
+            logger.error("Failed to build Google Calendar service for user %s: %s", self.user_email, e)
             raise
+        # Свободные HTTP-соединения сервиса; второе создается, только если вызовы идут параллельно (хедж)
+        self._http_lock = threading.Lock()
+        self._idle_http: List[Any] = [getattr(self.service, '_http', None)]
     
     # --- CRUD МЕТОДЫ ---
 
     def get_events(self, start_date: datetime.date, end_date: datetime.date) -> List[Dict[str, Any]]:
         """
         Получает список событий календаря за указанный диапазон дат.
+        Сначала ищет свежее окно в кэше; одинаковые параллельные промахи
+        пользователя выполняются одним запросом к Google.
+
+        Args:
+            start_date: Начальная дата диапазона.
+            end_date: Конечная дата диапазона.
+
+        Returns:
+            Список словарей, представляющих события календаря.
+        
+        Raises:
+            HttpError: В случае ошибки от Google Calendar API.
+        """
+        cached = range_cache.get(self.user_email, start_date, end_date)
+        if cached is not None:
+            logger.debug("Serving events %s..%s for %s from cache", start_date, end_date, self.user_email)
+            return cached
+
+        key = (self.user_email, 'primary', start_date, end_date)
+        try:
+            events = _range_flight.do(
+                key, lambda: self._fetch_and_cache(start_date, end_date), owner=self.user_email
+            )
+        except Exception as e:
+            if not is_upstream_failure(e):
+                raise
+            stale = range_cache.get_stale(self.user_email, start_date, end_date, settings.EVENTS_STALE_MAX_AGE_SECONDS)
+            if stale is None:
+                raise
+            stale_events, age = stale
+            logger.warning("Google unavailable for %s (%s), serving events %s..%s from a result %.0fs old",
+                           self.user_email, e, start_date, end_date, age)
+            metrics.inc("events_served_stale_total")
+            self._schedule_revalidation(start_date, end_date)
+            return StaleEvents(stale_events, age)
+        # Результат разделяется между запросами, поэтому отдаем копию списка
+        return list(events)
+
+    def _schedule_revalidation(self, start_date: datetime.date, end_date: datetime.date) -> None:
+        """Перезагружает диапазон в фоне; пока цепь разомкнута, попытка завершится сразу."""
+        from .prefetch import prefetch_pool
+        prefetch_pool.revalidate(self.creds, self.user_email, start_date, end_date)
+
+    def _execute(self, method: str, request: "HttpRequest") -> Any:
+        """
+        Выполняет запрос к Google через circuit breaker метода ('events.list', 'events.get', ...).
+        Таймаут вызова - остаток бюджета HTTP-запроса (не больше GOOGLE_CALL_TIMEOUT_SECONDS);
+        чтения из HEDGED_METHODS дублируются, если ответ дольше p95 метода.
+
+        Raises:
+            DeadlineExceeded: Если бюджет запроса исчерпан - без обращения к Google.
+            CircuitOpenError: Если цепь метода разомкнута - без обращения к Google.
+            HttpError: В случае ошибки от Google Calendar API.
+        """
+        timeout = call_timeout(settings.GOOGLE_CALL_TIMEOUT_SECONDS)
+        return circuit_breakers.get(method).call(
+            lambda: self._execute_with_hedge(method, request, timeout), is_failure=is_upstream_failure
+        )
+
+    def _execute_with_hedge(self, method: str, request: "HttpRequest", timeout: float) -> Any:
+        hedge_after = None
+        if settings.GOOGLE_HEDGE_READS and method in HEDGED_METHODS:
+            hedge_after = upstream_latency.quantile(method, settings.GOOGLE_HEDGE_QUANTILE)
+        if hedge_after is None:
+            return self._send(method, request, timeout)
+        hedge_after = max(hedge_after, settings.GOOGLE_HEDGE_MIN_DELAY_SECONDS)
+        if hedge_after >= timeout:
+            return self._send(method, request, timeout)
+        result, outcome = google_hedger.call(
+            lambda: self._send(method, request, timeout),
+            lambda: self._send(method, _copy_request(request), timeout - hedge_after),
+            hedge_after,
+        )
+        metrics.inc("google_hedge_total", method=method, outcome=outcome)
+        return result
+
+    def _send(self, method: str, request: "HttpRequest", timeout: float) -> Any:
+        with self._http_lock:
+            http = self._idle_http.pop() if self._idle_http else None
+        if http is None:
+            http = _new_authorized_http(self.creds)
+        started = time.perf_counter()
+        try:
+            _set_socket_timeout(http, timeout)
+            result = request.execute(http=http)
+        finally:
+            with self._http_lock:
+                self._idle_http.append(http)
+        elapsed = time.perf_counter() - started
+        upstream_latency.observe(method, elapsed)
+        metrics.observe("google_call_seconds", elapsed, method=method)
+        return result
+
+    def _fetch_and_cache(self, start_date: datetime.date, end_date: datetime.date) -> List[Dict[str, Any]]:
+        generation = range_cache.generation(self.user_email)
+        events = self._fetch_events(start_date, end_date)
+        # Если во время загрузки данные пользователя изменились, не кладем устаревшее ни в кэш, ни в индекс
+        if range_cache.put(self.user_email, start_date, end_date, events, generation=generation):
+            time_min, time_max = range_bounds(start_date, end_date)
+            search_index.replace_window(self.user_email, time_min, time_max, events)
+        return events
+
+    def _invalidate_user_cache(self) -> None:
+        """Вызывается после любой мутации: последующие чтения идут мимо кэша и старых запросов."""
+        invalidate_user_data(self.user_email)
+
+    def _fetch_events(self, start_date: datetime.date, end_date: datetime.date) -> List[Dict[str, Any]]:
+        """
+        Загружает события диапазона из Google Calendar API (без схлопывания).
 
         Args:
             start_date: Начальная дата диапазона.
@@ -108,25 +352,25 @@ class GoogleCalendarService:
             HttpError: В случае ошибки от Google Calendar API.
         """
         if start_date > end_date:
-            logger.warning(f"Start date {start_date} is after end date {end_date}. Returning empty list.")
+            logger.warning("Start date %s is after end date %s. Returning empty list.", start_date, end_date)
             return []
 
         time_min = datetime.datetime.combine(start_date, datetime.time.min, tzinfo=datetime.timezone.utc).isoformat()
         time_max = datetime.datetime.combine(end_date + datetime.timedelta(days=1), datetime.time.min, tzinfo=datetime.timezone.utc).isoformat()
 
-        logger.info(f"Querying Google Calendar API with timeMin={time_min}, timeMax={time_max}")
+        logger.debug("Querying Google Calendar API with timeMin=%s, timeMax=%s", time_min, time_max)
         
         all_items = []
         page_token = None
         while True:
-            events_result = self.service.events().list(
+            events_result = self._execute('events.list', self.service.events().list(
                 calendarId='primary',
                 timeMin=time_min,
                 timeMax=time_max,
                 singleEvents=True, # Важно для раскрытия повторяющихся событий
                 orderBy='startTime',
                 pageToken=page_token
-            ).execute()
+            ))
 
             items = events_result.get('items', [])
             all_items.extend(items)
@@ -137,10 +381,10 @@ class GoogleCalendarService:
             logger.debug("Fetching next page of events...")
 
         if not all_items:
-            logger.info(f"No events found for range {start_date.isoformat()} to {end_date.isoformat()}.")
+            logger.debug("No events found for range %s to %s.", start_date, end_date)
             return []
 
-        logger.info(f"Found {len(all_items)} total event instances.")
+        logger.debug("Found %s total event instances.", len(all_items))
         
         # Кэш для мастер-событий, чтобы не запрашивать одно и то же событие несколько раз
         master_events_cache: Dict[str, Dict[Any, Any]] = {}
@@ -151,23 +395,436 @@ class GoogleCalendarService:
                 if parsed_event:
                     parsed_events.append(parsed_event.to_dict())
             except Exception as e:
-                logger.error(f"Failed to parse event item {item.get('id')}: {e}", exc_info=True)
+                logger.error("Failed to parse event item %s: %s", item.get('id'), e, exc_info=True)
         
         return parsed_events
 
-    def create_event(self, event_data: CreateEventRequest) -> Dict[str, Any]:
+    def get_events_page(self, start_date: Optional[datetime.date], end_date: Optional[datetime.date],
+                        limit: int, cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Возвращает следующие limit событий диапазона (agenda-представление).
+
+        Курсор хранит диапазон, pageToken страницы Google и позицию внутри нее,
+        поэтому загружается ровно столько страниц Google, сколько нужно для limit
+        событий - время ответа зависит от limit, а не от длины диапазона.
+
+        Args:
+            start_date: Начальная дата диапазона (не нужна, если передан cursor).
+            end_date: Конечная дата диапазона (не нужна, если передан cursor).
+            limit: Максимальное количество событий на странице.
+            cursor: Курсор из предыдущего ответа.
+
+        Returns:
+            Кортеж из (список событий, курсор следующей страницы или None).
+
+        Raises:
+            ValueError: Если курсор невалиден или не совпадает с диапазоном.
+            HttpError: В случае ошибки от Google Calendar API.
+        """
+        if cursor:
+            state = decode_cursor(cursor, "agenda", required={'s': str, 'e': str, 'm': int}, optional={'p': str, 'o': int})
+            try:
+                cursor_start = datetime.date.fromisoformat(state['s'])
+                cursor_end = datetime.date.fromisoformat(state['e'])
+            except ValueError:
+                raise ValueError("Invalid cursor.")
+            if (start_date and start_date != cursor_start) or (end_date and end_date != cursor_end):
+                raise ValueError("Cursor does not match the requested date range.")
+            start_date, end_date = cursor_start, cursor_end
+            page_token, offset, page_size = state.get('p'), state.get('o') or 0, state['m']
+            if not 0 < page_size <= 250 or offset < 0:
+                raise ValueError("Invalid cursor.")
+        else:
+            if not start_date or not end_date:
+                raise ValueError("startDate and endDate are required without a cursor.")
+            if start_date > end_date:
+                raise ValueError("Start date cannot be after end date.")
+            # Размер страницы Google фиксируется на всю цепочку курсоров
+            page_token, offset, page_size = None, 0, min(limit, 250)
+
+        time_min = datetime.datetime.combine(start_date, datetime.time.min, tzinfo=datetime.timezone.utc).isoformat()
+        time_max = datetime.datetime.combine(end_date + datetime.timedelta(days=1), datetime.time.min, tzinfo=datetime.timezone.utc).isoformat()
+
+        items: List[Dict[str, Any]] = []
+        next_state: Optional[Dict[str, Any]] = None
+        while True:
+            events_result = self._execute('events.list', self.service.events().list(
+                calendarId='primary',
+                timeMin=time_min,
+                timeMax=time_max,
+                singleEvents=True,
+                orderBy='startTime',
+                maxResults=page_size,
+                pageToken=page_token
+            ))
+            page_items = events_result.get('items', [])
+            taken = page_items[offset:offset + (limit - len(items))]
+            items.extend(taken)
+            consumed = offset + len(taken)
+            next_page_token = events_result.get('nextPageToken')
+
+            if len(items) >= limit:
+                if consumed < len(page_items):
+                    # Остаток этой страницы отдадим в следующий раз
+                    next_state = {'p': page_token, 'o': consumed}
+                elif next_page_token:
+                    next_state = {'p': next_page_token, 'o': 0}
+                break
+            if not next_page_token:
+                break
+            page_token, offset = next_page_token, 0
+
+        logger.info("Agenda page for %s: %s events, has_more=%s", self.user_email, len(items), next_state is not None)
+
+        master_events_cache: Dict[str, Dict[Any, Any]] = {}
+        events = []
+        for item in items:
+            try:
+                parsed_event = self._parse_event_item(item, master_events_cache)
+                if parsed_event:
+                    events.append(parsed_event.to_dict())
+            except Exception as e:
+                logger.error("Failed to parse event item %s: %s", item.get('id'), e, exc_info=True)
+        search_index.add_events(self.user_email, events)
+
+        next_cursor = None
+        if next_state is not None:
+            next_cursor = encode_cursor("agenda", {
+                's': start_date.isoformat(), 'e': end_date.isoformat(), 'm': page_size, **next_state
+            })
+        return events, next_cursor
+
+    def get_event_changes(self, cursor: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Возвращает изменения календаря с момента выдачи курсора.
+
+        Без курсора (или если Google больше не принимает старый syncToken и
+        updatedMin) выполняется полная синхронизация: все события возвращаются
+        в created с fullSync=True. Повторяющиеся серии приходят мастер-событиями
+        с recurrenceRule, измененные экземпляры - отдельными событиями с recurringEventId.
+
+        Returns:
+            Словарь с ключами created, updated, deleted, nextCursor, fullSync.
+
+        Raises:
+            ValueError: Если курсор невалиден.
+            HttpError: В случае ошибки от Google Calendar API.
+        """
+        issued_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        state = decode_cursor(cursor, "changes", optional={'t': str, 'u': str}) if cursor else None
+        items, sync_token, full_sync = None, None, True
+
+        if state and state.get('t'):
+            try:
+                items, sync_token = self._list_all_items(syncToken=state['t'])
+                full_sync = False
+            except HttpError as e:
+                if getattr(e, 'resp', None) is None or e.resp.status != 410:
+                    raise
+                logger.info("Sync token expired for %s, falling back to updatedMin.", self.user_email)
+        if items is None and state and state.get('u'):
+            try:
+                items, sync_token = self._list_all_items(updatedMin=state['u'], showDeleted=True)
+                full_sync = False
+            except HttpError as e:
+                if getattr(e, 'resp', None) is None or e.resp.status != 410:
+                    raise
+                logger.info("updatedMin too old for %s, performing full sync.", self.user_email)
+        if items is None:
+            items, sync_token = self._list_all_items()
+
+        since = datetime.datetime.fromisoformat(state['u']) if state and state.get('u') else None
+        created, updated, deleted = [], [], []
+        master_events_cache: Dict[str, Dict[Any, Any]] = {
+            item['id']: item for item in items if item.get('recurrence')
+        }
+        for item in items:
+            if item.get('status') == 'cancelled':
+                original_start = item.get('originalStartTime', {})
+                tombstone = {
+                    'id': item.get('id'),
+                    'recurringEventId': item.get('recurringEventId'),
+                    'originalStartTime': original_start.get('dateTime') or original_start.get('date'),
+                }
+                deleted.append({k: v for k, v in tombstone.items() if v is not None})
+                continue
+            try:
+                parsed_event = self._parse_event_item(item, master_events_cache)
+            except Exception as e:
+                logger.error("Failed to parse event item %s: %s", item.get('id'), e, exc_info=True)
+                continue
+            if not parsed_event:
+                continue
+            created_at = item.get('created')
+            if full_sync or (since and created_at and datetime.datetime.fromisoformat(created_at) >= since):
+                created.append(parsed_event.to_dict())
+            else:
+                updated.append(parsed_event.to_dict())
+
+        if full_sync:
+            search_index.replace_all(self.user_email, created)
+        else:
+            search_index.apply_changes(self.user_email, [tombstone['id'] for tombstone in deleted], created + updated)
+        if not full_sync and items:
+            # Клиент узнал об изменениях раньше push-уведомления - кэш диапазонов устарел
+            invalidate_user_data(self.user_email)
+
+        logger.info("Changes for %s: created=%s, updated=%s, deleted=%s, fullSync=%s",
+                    self.user_email, len(created), len(updated), len(deleted), full_sync)
+        return {
+            'created': created,
+            'updated': updated,
+            'deleted': deleted,
+            'fullSync': full_sync,
+            'nextCursor': encode_cursor("changes", {'t': sync_token, 'u': issued_at}),
+        }
+
+    def get_events_for_ranges(self, ranges: List[Tuple[datetime.date, datetime.date]]) -> Dict[str, Any]:
+        """
+        События для нескольких (возможно пересекающихся) диапазонов за один запрос
+        клиента: диапазоны объединяются в минимальный набор окон, каждое окно
+        загружается один раз через get_events (кэш, single-flight, устаревшие данные).
+
+        Returns:
+            {'events': события без повторов, 'ranges': [{'startDate', 'endDate', 'eventIds'}]
+            в порядке запроса, 'staleAgeSeconds': возраст самых старых данных или None}.
+
+        Raises:
+            ValueError: Если диапазоны невалидны или их слишком много.
+            HttpError: В случае ошибки от Google Calendar API.
+        """
+        if not ranges:
+            raise ValueError("At least one range is required.")
+        if len(ranges) > MULTI_RANGE_MAX_RANGES:
+            raise ValueError(f"No more than {MULTI_RANGE_MAX_RANGES} ranges per request.")
+        if any(start > end for start, end in ranges):
+            raise ValueError("Start date cannot be after end date.")
+        windows = merge_date_ranges(ranges, max_gap_days=MULTI_RANGE_MERGE_GAP_DAYS)
+        if sum((end - start).days + 1 for start, end in windows) > STATS_MAX_DAYS:
+            raise ValueError(f"Ranges cannot cover more than {STATS_MAX_DAYS} days in total.")
+
+        events_by_id: Dict[str, Dict[str, Any]] = {}
+        stale_age: Optional[float] = None
+        for start, end in windows:
+            window_events = self.get_events(start, end)
+            if isinstance(window_events, StaleEvents):
+                stale_age = max(stale_age or 0.0, window_events.age_seconds)
+            for event in window_events:
+                # Событие на стыке окон приходит в обоих
+                events_by_id.setdefault(event['id'], event)
+        events = list(events_by_id.values())
+
+        memberships = []
+        for start, end in ranges:
+            time_min, time_max = range_bounds(start, end)
+            memberships.append({
+                'startDate': start.isoformat(),
+                'endDate': end.isoformat(),
+                'eventIds': [e['id'] for e in events if event_overlaps(e, time_min, time_max)],
+            })
+        logger.info("Multi-range for %s: %s ranges in %s windows, %s events",
+                    self.user_email, len(ranges), len(windows), len(events))
+        return {'events': events, 'ranges': memberships, 'staleAgeSeconds': stale_age}
+
+    def get_time_stats(self, start_date: datetime.date, end_date: datetime.date, time_zone: str) -> Dict[str, Any]:
+        """
+        Статистика использования времени за диапазон (см. stats.compute_time_stats).
+        События берутся через get_events, то есть из кэша окон, если он свежий.
+
+        Raises:
+            ValueError: Если диапазон или таймзона невалидны.
+            HttpError: В случае ошибки от Google Calendar API.
+        """
+        if start_date > end_date:
+            raise ValueError("Start date cannot be after end date.")
+        if (end_date - start_date).days + 1 > STATS_MAX_DAYS:
+            raise ValueError(f"Date range cannot be longer than {STATS_MAX_DAYS} days.")
+        try:
+            tz = ZoneInfo(time_zone)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValueError(f"Unknown time zone: {time_zone}")
+        # numpy нужен только статистике - не загружаем его при старте процесса
+        from .stats import compute_time_stats
+
+        # Окна кэша строятся по датам UTC: берем день запаса, чтобы покрыть локальные сутки по краям
+        events = self.get_events(start_date - datetime.timedelta(days=1), end_date + datetime.timedelta(days=1))
+        stats = compute_time_stats(events, start_date, end_date, tz)
+        logger.info("Time stats for %s: %s events, %s..%s (%s)", self.user_email, len(events), start_date, end_date, time_zone)
+        return {'timeZone': time_zone, **stats}
+
+    def search_events(self, query: str, limit: int) -> List[Dict[str, Any]]:
+        """
+        Полнотекстовый поиск по summary, location и description (слова запроса
+        ищутся как префиксы, результаты ранжируются - см. EventSearchIndex.search).
+
+        Отвечает из локального индекса, если он полон. Иначе (даже если нашлось
+        limit событий - индекс мог отстать от изменений вне нашего API) один раз
+        выполняет поиск q= в Google (все страницы) и добавляет найденное в индекс
+        (Google ищет только целые слова, но и по событиям вне загруженных окон).
+
+        Raises:
+            HttpError: В случае ошибки от Google Calendar API.
+        """
+        if search_index.is_complete(self.user_email, query):
+            metrics.inc("events_search_total", source="index")
+            return search_index.search(self.user_email, query, limit)
+
+        logger.info("Search for %s is not covered by the index, querying Google", self.user_email)
+        # Все страницы: после note_upstream_search запрос отвечается только из индекса
+        items, _ = self._list_all_items(q=query)
+        search_index.add_events(self.user_email, self._parse_items_without_masters(items))
+        search_index.note_upstream_search(self.user_email, query)
+        metrics.inc("events_search_total", source="upstream")
+        return search_index.search(self.user_email, query, limit)
+
+    def _parse_items_without_masters(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Парсит сырые события Google (для индекса поиска и проверки конфликтов).
+        Мастер-события серий берутся только из этого же списка и не догружаются из Google.
+        """
+        items = [item for item in items if isinstance(item, dict) and item.get('id')]
+        master_events_cache: Dict[str, Dict[Any, Any]] = {
+            item['id']: item for item in items if item.get('recurrence')
+        }
+        events = []
+        for item in items:
+            if item.get('status') == 'cancelled':
+                continue
+            if item.get('recurringEventId'):
+                master_events_cache.setdefault(item['recurringEventId'], {})
+            try:
+                parsed_event = self._parse_event_item(item, master_events_cache)
+            except Exception as e:
+                logger.warning("Failed to parse event item %s: %s", item.get('id'), e)
+                continue
+            if parsed_event:
+                events.append(parsed_event.to_dict())
+        return events
+
+    def _list_all_items(self, **params: Any) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Проходит все страницы events.list и возвращает (элементы, nextSyncToken)."""
+        items: List[Dict[str, Any]] = []
+        page_token = None
+        while True:
+            events_result = self._execute('events.list', self.service.events().list(
+                calendarId='primary',
+                pageToken=page_token,
+                maxResults=2500,
+                **params
+            ))
+            items.extend(events_result.get('items', []))
+            page_token = events_result.get('nextPageToken')
+            if not page_token:
+                return items, events_result.get('nextSyncToken')
+
+    def get_export_events(self, since: datetime.datetime) -> Tuple[List[SimpleCalendarEvent], Dict[str, List[str]], Optional[str]]:
+        """
+        События для экспорта в .ics, заканчивающиеся после since: серии - мастер-событиями
+        с правилами, а не экземплярами; измененные экземпляры - отдельными событиями.
+
+        Returns:
+            (события, {id серии: originalStartTime отмененных экземпляров},
+             самое позднее время изменения (updated) среди полученных событий).
+
+        Raises:
+            HttpError: В случае ошибки от Google Calendar API.
+        """
+        items, _ = self._list_all_items(timeMin=since.isoformat(), singleEvents=False, showDeleted=True)
+        master_events_cache = {item['id']: item for item in items if item.get('recurrence')}
+        events: List[SimpleCalendarEvent] = []
+        cancelled: Dict[str, List[str]] = {}
+        last_updated = max((item['updated'] for item in items if item.get('updated')), default=None)
+        for item in items:
+            if item.get('status') == 'cancelled':
+                original_start = item.get('originalStartTime', {})
+                if item.get('recurringEventId') and original_start:
+                    cancelled.setdefault(item['recurringEventId'], []).append(
+                        original_start.get('dateTime') or original_start.get('date'))
+                continue
+            try:
+                parsed_event = self._parse_event_item(item, master_events_cache)
+            except Exception as e:
+                logger.warning("Failed to parse event item %s for export: %s", item.get('id'), e)
+                continue
+            if parsed_event:
+                events.append(parsed_event)
+        return events, cancelled, last_updated
+
+    def find_conflicts(self, start: datetime.datetime, end: datetime.datetime,
+                       exclude_event_id: Optional[str] = None, exclude_series_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Возвращает события со временем, пересекающиеся с [start, end).
+
+        Отвечает по индексу интервалов свежего окна кэша, а если интервал им не
+        покрыт - узким запросом к Google только за [start, end). All-day события
+        конфликтами не считаются.
+
+        Args:
+            exclude_event_id: Само редактируемое событие.
+            exclude_series_id: Серия, которую редактируют целиком.
+
+        Raises:
+            HttpError: В случае ошибки от Google Calendar API.
+        """
+        overlapping = range_cache.find_overlapping(self.user_email, start, end)
+        if overlapping is not None:
+            metrics.inc("conflict_checks_total", source="cache")
+        else:
+            metrics.inc("conflict_checks_total", source="upstream")
+            result = self._execute('events.list', self.service.events().list(
+                calendarId='primary',
+                timeMin=start.isoformat(),
+                timeMax=end.isoformat(),
+                singleEvents=True,
+                maxResults=250
+            ))
+            events = self._parse_items_without_masters(result.get('items', []))
+            overlapping = IntervalIndex(events).overlapping(start, end)
+        return [
+            e for e in overlapping
+            if e['id'] != exclude_event_id and not (exclude_series_id and exclude_series_id in (e['id'], e.get('recurringEventId')))
+        ]
+
+    def create_event(self, event_data: CreateEventRequest, check_conflicts: bool = False,
+                     event_id: Optional[str] = None) -> Dict[str, Any]:
         """
         Создает новое событие в календаре.
 
         Args:
             event_data: Pydantic модель с данными для создания события.
+            check_conflicts: Не создавать событие, если оно пересекается с существующими.
+            event_id: ID, выбранный клиентом (base32hex); повторная вставка с ним дает 409, а не дубликат.
 
         Returns:
             Словарь, представляющий созданное событие от Google API.
 
         Raises:
+            EventConflictError: Если check_conflicts и найдены пересечения.
             HttpError: В случае ошибки от Google Calendar API.
         """
+        if check_conflicts and not event_data.isAllDay:
+            start, end = event_interval(event_data.startTime, event_data.endTime, event_data.timeZoneId)
+            conflicts = self.find_conflicts(start, end)
+            if conflicts:
+                raise EventConflictError(conflicts)
+
+        event_body_cleaned = self._build_event_body(event_data)
+        if event_id:
+            event_body_cleaned['id'] = event_id
+
+        logger.debug("Inserting new event: %s", event_body_cleaned)
+        created_event = self._execute('events.insert', self.service.events().insert(
+            calendarId='primary',
+            body=event_body_cleaned
+        ))
+        self._invalidate_user_cache()
+        search_index.add_events(self.user_email, self._parse_items_without_masters([created_event]))
+        
+        logger.info("Event created successfully. Event ID: %s", created_event.get('id'))
+        return created_event
+
+    def _build_event_body(self, event_data: CreateEventRequest) -> Dict[str, Any]:
+        """Тело events.insert из запроса на создание события."""
         event_body = {
             'summary': event_data.summary,
             'description': event_data.description,
@@ -187,16 +844,32 @@ class GoogleCalendarService:
             event_body['end']['timeZone'] = event_data.timeZoneId
         
         # Очищаем тело запроса от полей с None, чтобы не отправлять их в API
-        event_body_cleaned = {k: v for k, v in event_body.items() if v is not None}
+        return {k: v for k, v in event_body.items() if v is not None}
 
-        logger.info(f"Inserting new event: {event_body_cleaned}")
-        created_event = self.service.events().insert(
-            calendarId='primary',
-            body=event_body_cleaned
-        ).execute()
-        
-        logger.info(f"Event created successfully. Event ID: {created_event.get('id')}")
-        return created_event
+    def insert_events(self, events: Dict[str, CreateEventRequest],
+                      event_ids: Optional[Dict[str, str]] = None) -> Tuple[Dict[str, Any], Dict[str, Exception]]:
+        """
+        Создает события batch-запросами (импорт .ics), без проверки конфликтов.
+
+        Args:
+            events: {ключ: данные события}.
+            event_ids: ID, выбранные клиентом ({ключ: ID}); повторная вставка с тем же ID дает 409.
+
+        Returns:
+            (созданные события, ошибки) по ключам.
+        """
+        event_ids = event_ids or {}
+        requests = {}
+        for key, event_data in events.items():
+            body = self._build_event_body(event_data)
+            if key in event_ids:
+                body['id'] = event_ids[key]
+            requests[key] = self.service.events().insert(calendarId='primary', body=body)
+        results, errors = self._execute_batch(requests)
+        if results:
+            self._invalidate_user_cache()
+            search_index.add_events(self.user_email, self._parse_items_without_masters(list(results.values())))
+        return results, errors
 
     def _prepare_time_patch(self, event_data: UpdateEventRequest, current_event: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -267,62 +940,384 @@ class GoogleCalendarService:
                 
         return time_patch
 
-    def update_event(self, event_id: str, event_data: UpdateEventRequest, update_mode: UpdateEventMode) -> Tuple[Dict[str, Any], List[str]]:
+    def _build_patch_body(self, event_data: UpdateEventRequest,
+                          current_event: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Тело events.patch из запроса на изменение и изменения времени отдельно: (тело, time_patch)."""
+        # Мы не мутируем исходный словарь, а создаем новый.
+        patch_body = event_data.model_dump(
+            exclude_unset=True, 
+            exclude_none=True,
+            # Исключаем поля, которые требуют специальной обработки
+            exclude={'startTime', 'endTime', 'isAllDay', 'timeZoneId'} 
+        )
+        time_patch = self._prepare_time_patch(event_data, current_event)
+        patch_body.update(time_patch)
+        return patch_body, time_patch
+
+    def update_event(self, event_id: str, event_data: UpdateEventRequest, update_mode: UpdateEventMode,
+                     check_conflicts: bool = False) -> Tuple[Dict[str, Any], List[str]]:
         """
         Обновляет существующее событие.
 
+        С check_conflicts событие не меняется, если его новое время пересекается
+        с другими событиями (проверяется, только если время меняется).
+
         Returns:
             Кортеж из (словарь обновленного события, список обновленных полей).
+
+        Raises:
+            EventConflictError: Если check_conflicts и найдены пересечения.
         """
         try:
-            current_event = self.service.events().get(calendarId='primary', eventId=event_id).execute()
+            current_event = self._execute('events.get', self.service.events().get(calendarId='primary', eventId=event_id))
         except HttpError as e:
-            logger.error(f"Cannot fetch event {event_id} to update: {e}")
+            logger.error("Cannot fetch event %s to update: %s", event_id, e)
             raise
 
-        # 1. Формируем тело для patch-запроса, начиная с простых полей
-        # Мы не мутируем исходный словарь, а создаем новый.
-        patch_body = event_data.model_dump(
-            exclude_unset=True, 
-            exclude_none=True,
-            # Исключаем поля, которые требуют специальной обработки
-            exclude={'startTime', 'endTime', 'isAllDay', 'timeZoneId'} 
-        )
-
-        # 2. Обрабатываем время и добавляем в тело запроса
-        time_patch = self._prepare_time_patch(event_data, current_event)
-        patch_body.update(time_patch)
+        # 1-2. Тело patch-запроса: простые поля и время
+        patch_body, time_patch = self._build_patch_body(event_data, current_event)
 
         # 3. Логика для повторяющихся событий
         target_event_id = event_id
         if update_mode == UpdateEventMode.ALL_IN_SERIES:
             if recurring_id := current_event.get('recurringEventId'):
-                logger.info(f"Update targets the entire series. Master ID: {recurring_id}")
+                logger.info("Update targets the entire series. Master ID: %s", recurring_id)
                 target_event_id = recurring_id
-        elif update_mode == UpdateEventMode.THIS_AND_FOLLOWING:
-            logger.error(f"Update mode {update_mode} is not yet supported.")
-            raise NotImplementedError("Update mode 'this_and_following' is not yet supported.")
+        # Для одиночного события или мастера "этот и последующие" - это все событие
+        split_series = update_mode == UpdateEventMode.THIS_AND_FOLLOWING and bool(current_event.get('recurringEventId'))
+
+        if check_conflicts and 'dateTime' in time_patch.get('start', {}):
+            new_start = time_patch['start']['dateTime']
+            new_end = time_patch.get('end', {}).get('dateTime') or current_event.get('end', {}).get('dateTime')
+            start, end = event_interval(new_start, new_end or new_start, time_patch['start'].get('timeZone'))
+            series_id = target_event_id if target_event_id != event_id else None
+            if split_series:
+                series_id = current_event['recurringEventId']
+            conflicts = self.find_conflicts(start, end, exclude_event_id=event_id, exclude_series_id=series_id)
+            if conflicts:
+                raise EventConflictError(conflicts)
 
         # 4. Проверяем, есть ли что обновлять, ПОСЛЕ всех манипуляций
         if not patch_body:
-            logger.warning(f"Update request for event {event_id} had no fields to update.")
+            logger.warning("Update request for event %s had no fields to update.", event_id)
             # Возвращаем текущее событие и пустой список полей
             return current_event, []
 
-        logger.info(f"Patching event {target_event_id} with body: {patch_body}")
+        if split_series:
+            new_series = self._split_series(current_event, patch_body)
+            if new_series is not None:
+                return new_series, list(patch_body.keys())
+            # Экземпляр - первый в серии: разделять нечего, меняется вся серия
+            target_event_id = current_event['recurringEventId']
+
+        logger.debug("Patching event %s with body: %s", target_event_id, patch_body)
         
-        updated_event = self.service.events().patch(
+        updated_event = self._execute('events.patch', self.service.events().patch(
             calendarId='primary',
             eventId=target_event_id,
             body=patch_body
-        ).execute()
+        ))
+        self._invalidate_user_cache()
+        if target_event_id != event_id:
+            # Изменилась вся серия: проиндексированные экземпляры устарели
+            search_index.remove_events(self.user_email, [target_event_id])
+        search_index.add_events(self.user_email, self._parse_items_without_masters([updated_event]))
 
-        logger.info(f"Event {updated_event.get('id')} updated successfully.")
+        logger.info("Event %s updated successfully.", updated_event.get('id'))
         
         # Теперь мы возвращаем и событие, и список ключей, которые мы обновили
         return updated_event, list(patch_body.keys())
 
 
+    def _split_series(self, instance: Dict[str, Any], patch_body: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Режим "этот и последующие": серия делится на две в экземпляре instance.
+
+        1. Мастер и исключения серии читаются одним events.list по iCalUID.
+        2. Одним batch-запросом RRULE старой серии обрезается через UNTIL перед
+           экземпляром и создается новая серия (id выбираем сами) от экземпляра
+           с изменениями patch_body; COUNT уменьшается на прошедшие экземпляры,
+           EXDATE/RDATE начиная с экземпляра переносятся в новую серию со сдвигом.
+        3. Вторым batch-запросом (если есть что переносить) исключения после
+           экземпляра переносятся на соответствующие экземпляры новой серии,
+           а у старой серии отменяются. Google не гарантирует порядок запросов
+           внутри batch, поэтому экземпляры новой серии меняются только после ее создания.
+
+        Если часть запросов не выполнилась, выполненные откатываются (RRULE
+        восстанавливается, новая серия удаляется, отмененные исключения
+        возвращаются), и поднимается первая ошибка.
+
+        Returns:
+            Мастер-событие новой серии или None, если экземпляр - первый в серии.
+
+        Raises:
+            HttpError: В случае ошибки от Google Calendar API.
+        """
+        series_id = instance['recurringEventId']
+        items, _ = self._list_all_items(iCalUID=instance['iCalUID'], showDeleted=True) if instance.get('iCalUID') else ([], None)
+        master = next((item for item in items if item.get('id') == series_id), None)
+        if master is None:
+            master = self._execute('events.get', self.service.events().get(calendarId='primary', eventId=series_id))
+
+        time_zone = master['start'].get('timeZone') or instance['start'].get('timeZone')
+        all_day = is_all_day(master['start'])
+        split_at = local_start(instance['originalStartTime'], time_zone)
+        if split_at <= local_start(master['start'], time_zone):
+            return None
+
+        recurrence = master.get('recurrence', [])
+        occurrences_before = self._count_instances_before(series_id, split_at, time_zone) if has_count(recurrence) else 0
+        new_id = uuid.uuid4().hex
+        new_series = {field: master[field] for field in SERIES_COPY_FIELDS if field in master}
+        new_series.update({key: value for key, value in patch_body.items() if key not in ('start', 'end')})
+        for key in ('start', 'end'):
+            new_series[key] = {k: v for k, v in {**instance[key], **patch_body.get(key, {})}.items() if v is not None}
+        new_series['id'] = new_id
+        # Начало по расписанию сдвигается так же, как изменилось начало редактируемого экземпляра
+        new_time_zone = new_series['start'].get('timeZone') or time_zone
+        new_all_day = is_all_day(new_series['start'])
+        shift = local_start(new_series['start'], new_time_zone) - split_at
+        # EXDATE/RDATE начиная с экземпляра уходят из старой серии в новую (если тип события не меняется)
+        kept_recurrence, later_dates = split_recurrence_dates(recurrence, split_at, time_zone)
+        carried_dates = []
+        if new_all_day == all_day:
+            shifted = {name: [value + shift for value in values] for name, values in later_dates.items()}
+            carried_dates = format_recurrence_dates(shifted, new_all_day, new_time_zone)
+        new_series['recurrence'] = (patch_body.get('recurrence')
+                                    or continue_recurrence(recurrence, occurrences_before) + carried_dates)
+
+        events = self.service.events()
+        restore_master = events.patch(calendarId='primary', eventId=series_id, body={'recurrence': recurrence})
+        delete_new = events.delete(calendarId='primary', eventId=new_id)
+        results, errors = self._execute_batch({
+            'truncate': events.patch(calendarId='primary', eventId=series_id, body={
+                'recurrence': truncate_recurrence(kept_recurrence, until_before(split_at, all_day, time_zone))}),
+            'create': events.insert(calendarId='primary', body=new_series),
+        })
+        undo = {'truncate': restore_master, 'create': delete_new}
+        if errors:
+            self._rollback_split(series_id, {rid: undo[rid] for rid in results})
+            raise next(iter(errors.values()))
+        created = results['create']
+
+        carried, carried_undo = self._carry_exceptions(
+            items, series_id, instance, new_id, new_series, patch_body, split_at, time_zone, shift)
+        if carried:
+            results, errors = self._execute_batch(carried)
+            if errors:
+                undo.update({rid: carried_undo[rid] for rid in results if rid in carried_undo})
+                self._rollback_split(series_id, undo)
+                raise next(iter(errors.values()))
+
+        self._invalidate_user_cache()
+        search_index.remove_events(self.user_email, [series_id])
+        metrics.inc("series_split_total", result="ok")
+        logger.info("Series %s split at %s into new series %s (%s exceptions carried over)",
+                    series_id, split_at, new_id, sum(rid.startswith('new:') for rid in carried))
+        return created
+
+    def _carry_exceptions(self, items: List[Dict[str, Any]], series_id: str, instance: Dict[str, Any], new_id: str,
+                          new_series: Dict[str, Any], patch_body: Dict[str, Any], split_at: datetime.datetime,
+                          time_zone: Optional[str], shift: datetime.timedelta) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Запросы переноса исключений старой серии после split_at на новую серию
+        и запросы их отмены для отката. Экземпляр новой серии находится по
+        расписанию: начало исключения по расписанию сдвигается на shift - так же,
+        как изменилось начало редактируемого экземпляра (в местном времени серии).
+        Если при разделении меняется тип события (all-day/со временем), исключения не переносятся.
+        """
+        old_all_day = is_all_day(instance['originalStartTime'])
+        new_all_day = is_all_day(new_series['start'])
+        if old_all_day != new_all_day:
+            return {}, {}
+        new_time_zone = new_series['start'].get('timeZone') or time_zone
+        simple_patch = {key: value for key, value in patch_body.items() if key not in ('start', 'end', 'recurrence')}
+        events = self.service.events()
+        requests: Dict[str, Any] = {}
+        undo: Dict[str, Any] = {}
+        for item in items:
+            if item.get('recurringEventId') != series_id or item.get('id') == instance['id'] or not item.get('originalStartTime'):
+                continue
+            original = local_start(item['originalStartTime'], time_zone)
+            if original <= split_at:
+                continue
+            target_id = f"{new_id}_{instance_suffix(original + shift, new_all_day, new_time_zone)}"
+            if item.get('status') == 'cancelled':
+                body: Dict[str, Any] = {'status': 'cancelled'}
+            else:
+                body = {field: item[field] for field in EXCEPTION_OVERRIDE_FIELDS
+                        if field in item and item[field] != new_series.get(field)}
+                if local_start(item['start'], time_zone) != original:
+                    # Перенесенный экземпляр остается на своем времени
+                    body['start'], body['end'] = item['start'], item['end']
+                body.update(simple_patch)
+                if not body:
+                    continue
+                undo[f"old:{item['id']}"] = events.patch(calendarId='primary', eventId=item['id'],
+                                                         body={'status': item.get('status', 'confirmed')})
+                requests[f"old:{item['id']}"] = events.patch(calendarId='primary', eventId=item['id'],
+                                                             body={'status': 'cancelled'})
+            requests[f"new:{target_id}"] = events.patch(calendarId='primary', eventId=target_id, body=body)
+        return requests, undo
+
+    def _count_instances_before(self, series_id: str, split_at: datetime.datetime, time_zone: Optional[str]) -> int:
+        """Число экземпляров серии (включая отмененные) до split_at - для пересчета COUNT."""
+        time_max = split_at.replace(tzinfo=ZoneInfo(time_zone or 'UTC')).isoformat()
+        count, page_token = 0, None
+        while True:
+            result = self._execute('events.instances', self.service.events().instances(
+                calendarId='primary', eventId=series_id, timeMax=time_max, showDeleted=True,
+                maxResults=2500, pageToken=page_token
+            ))
+            count += len(result.get('items', []))
+            page_token = result.get('nextPageToken')
+            if not page_token:
+                return count
+
+    def _execute_batch(self, requests: Dict[str, "HttpRequest"]) -> Tuple[Dict[str, Any], Dict[str, Exception]]:
+        """
+        Выполняет запросы batch-запросами к Google (по BATCH_MAX_REQUESTS).
+
+        Returns:
+            (ответы выполненных запросов, ошибки остальных) по request_id; если
+            не выполнился сам batch-запрос, его ошибка записывается всем его запросам.
+        """
+        results: Dict[str, Any] = {}
+        errors: Dict[str, Exception] = {}
+
+        def collect(request_id: str, response: Any, exception: Optional[Exception]) -> None:
+            if exception is not None:
+                errors[request_id] = exception
+            else:
+                results[request_id] = response
+
+        pending = list(requests.items())
+        for offset in range(0, len(pending), BATCH_MAX_REQUESTS):
+            chunk = pending[offset:offset + BATCH_MAX_REQUESTS]
+            batch = self.service.new_batch_http_request(callback=collect)
+            for request_id, request in chunk:
+                batch.add(request, request_id=request_id)
+            try:
+                self._execute('batch', batch)
+            except Exception as e:
+                for request_id, _ in chunk:
+                    if request_id not in results:
+                        errors.setdefault(request_id, e)
+        return results, errors
+
+    def _rollback_split(self, series_id: str, undo: Dict[str, "HttpRequest"]) -> None:
+        """Отменяет выполненные шаги разделения серии; ошибки отката только логируются."""
+        metrics.inc("series_split_total", result="rolled_back")
+        self._invalidate_user_cache()
+        if not undo:
+            return
+        logger.warning("Rolling back split of series %s for %s (%s steps)", series_id, self.user_email, len(undo))
+        _, errors = self._execute_batch(undo)
+        for request_id, e in errors.items():
+            logger.error("Rollback step %s of series %s split failed for %s: %s", request_id, series_id, self.user_email, e)
+
+    def apply_mutations(self, mutations: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Применяет отложенные изменения пользователя (src/calendar/mutations.py)
+        batch-запросами: одним batch читаются изменяемые события, другим
+        отправляются insert/patch/delete. Изменения со своей логикой (проверка
+        конфликтов, "этот и последующие") выполняются по одному обычными методами.
+
+        Args:
+            mutations: {'id', 'operation' (create/update/delete), 'eventId' (у создания - ID для вставки),
+                'data', 'mode', 'checkConflicts'};
+                не больше одного изменения на событие.
+
+        Returns:
+            {id изменения: событие от Google (None у удаления) или исключение}.
+        """
+        outcomes: Dict[str, Any] = {}
+        batched = []
+        for mutation in mutations:
+            if mutation.get('checkConflicts') or mutation.get('mode') == UpdateEventMode.THIS_AND_FOLLOWING.value:
+                try:
+                    outcomes[mutation['id']] = self._apply_mutation(mutation)
+                except Exception as e:
+                    outcomes[mutation['id']] = e
+            else:
+                batched.append(mutation)
+
+        events = self.service.events()
+        updates = {m['id']: events.get(calendarId='primary', eventId=m['eventId'])
+                   for m in batched if m['operation'] == 'update'}
+        current, errors = self._execute_batch(updates) if updates else ({}, {})
+        outcomes.update(errors)
+
+        requests: Dict[str, Any] = {}
+        for mutation in batched:
+            if mutation['id'] in errors:
+                continue
+            try:
+                request = self._mutation_request(mutation, current.get(mutation['id']))
+            except ValueError as e:
+                outcomes[mutation['id']] = e
+                continue
+            if request is None:
+                # Менять нечего: результат - текущее событие
+                outcomes[mutation['id']] = current.get(mutation['id'])
+            else:
+                requests[mutation['id']] = request
+        results, errors = self._execute_batch(requests) if requests else ({}, {})
+        outcomes.update(errors)
+
+        if results:
+            self._invalidate_user_cache()
+            written = []
+            for mutation in batched:
+                if mutation['id'] not in results:
+                    continue
+                outcome = results[mutation['id']]
+                if mutation['operation'] == 'delete':
+                    outcome = None
+                    search_index.remove_events(self.user_email, [mutation['eventId']])
+                elif isinstance(outcome, dict) and outcome.get('id'):
+                    if outcome['id'] != mutation['eventId']:
+                        # Изменилась вся серия: проиндексированные экземпляры устарели
+                        search_index.remove_events(self.user_email, [outcome['id']])
+                    written.append(outcome)
+                outcomes[mutation['id']] = outcome
+            search_index.add_events(self.user_email, self._parse_items_without_masters(written))
+        return outcomes
+
+    def _mutation_request(self, mutation: Dict[str, Any], current_event: Optional[Dict[str, Any]]) -> Optional["HttpRequest"]:
+        """Запрос к Google для одного отложенного изменения; None, если менять нечего."""
+        events = self.service.events()
+        operation = mutation['operation']
+        if operation == 'create':
+            body = self._build_event_body(CreateEventRequest(**mutation['data']))
+            if mutation.get('eventId'):
+                body['id'] = mutation['eventId']
+            return events.insert(calendarId='primary', body=body)
+        if operation == 'delete':
+            if mutation.get('mode') == DeleteEventMode.INSTANCE_ONLY.value:
+                return events.patch(calendarId='primary', eventId=mutation['eventId'], body={'status': 'cancelled'})
+            return events.delete(calendarId='primary', eventId=mutation['eventId'])
+        patch_body, _ = self._build_patch_body(UpdateEventRequest(**mutation['data']), current_event)
+        if not patch_body:
+            return None
+        target_event_id = mutation['eventId']
+        if mutation.get('mode') == UpdateEventMode.ALL_IN_SERIES.value and current_event.get('recurringEventId'):
+            target_event_id = current_event['recurringEventId']
+        return events.patch(calendarId='primary', eventId=target_event_id, body=patch_body)
+
+    def _apply_mutation(self, mutation: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        operation = mutation['operation']
+        if operation == 'create':
+            return self.create_event(CreateEventRequest(**mutation['data']), check_conflicts=mutation.get('checkConflicts', False),
+                                     event_id=mutation.get('eventId'))
+        if operation == 'delete':
+            self.delete_event(mutation['eventId'], DeleteEventMode(mutation['mode']))
+            return None
+        updated_event, _ = self.update_event(mutation['eventId'], UpdateEventRequest(**mutation['data']),
+                                             UpdateEventMode(mutation['mode']),
+                                             check_conflicts=mutation.get('checkConflicts', False))
+        return updated_event
+
     def delete_event(self, event_id: str, mode: DeleteEventMode) -> None:
         """
         Удаляет событие из календаря.
@@ -334,25 +1329,55 @@ class GoogleCalendarService:
         Raises:
             HttpError: В случае ошибки от Google Calendar API.
         """
-        logger.info(f"Request to delete event {event_id} with mode: {mode}")
+        logger.info("Request to delete event %s with mode: %s", event_id, mode)
 
         if mode == DeleteEventMode.INSTANCE_ONLY:
             # Отмена одного экземпляра - это PATCH-запрос, меняющий статус
-            logger.info(f"Cancelling single instance of event {event_id}")
-            self.service.events().patch(
+            logger.info("Cancelling single instance of event %s", event_id)
+            self._execute('events.patch', self.service.events().patch(
                 calendarId='primary',
                 eventId=event_id,
                 body={'status': 'cancelled'}
-            ).execute()
-            logger.info(f"Instance {event_id} cancelled.")
+            ))
+            self._invalidate_user_cache()
+            search_index.remove_events(self.user_email, [event_id])
+            logger.info("Instance %s cancelled.", event_id)
         else: # DEFAULT режим
             # Удаление одиночного события или всей серии
-            logger.info(f"Deleting event/series {event_id}")
-            self.service.events().delete(
+            logger.info("Deleting event/series %s", event_id)
+            self._execute('events.delete', self.service.events().delete(
                 calendarId='primary',
                 eventId=event_id
-            ).execute()
-            logger.info(f"Event/series {event_id} deleted.")
+            ))
+            self._invalidate_user_cache()
+            search_index.remove_events(self.user_email, [event_id])
+            logger.info("Event/series %s deleted.", event_id)
+
+    # --- PUSH-УВЕДОМЛЕНИЯ ---
+
+    def watch_events(self, channel_id: str, address: str, token: str, ttl_seconds: int) -> Dict[str, Any]:
+        """
+        Регистрирует канал push-уведомлений (events.watch) для основного календаря.
+
+        Returns:
+            Ресурс канала от Google (id, resourceId, expiration в мс).
+        """
+        logger.info("Registering watch channel %s for user %s", channel_id, self.user_email)
+        return self._execute('events.watch', self.service.events().watch(
+            calendarId='primary',
+            body={
+                'id': channel_id,
+                'type': 'web_hook',
+                'address': address,
+                'token': token,
+                'params': {'ttl': str(ttl_seconds)},
+            }
+        ))
+
+    def stop_channel(self, channel_id: str, resource_id: str) -> None:
+        """Останавливает канал push-уведомлений."""
+        logger.info("Stopping watch channel %s for user %s", channel_id, self.user_email)
+        self._execute('channels.stop', self.service.channels().stop(body={'id': channel_id, 'resourceId': resource_id}))
 
     def _parse_event_item(self, event_item: dict, master_events_cache: dict) -> Optional[SimpleCalendarEvent]:
         """
@@ -364,7 +1389,7 @@ class GoogleCalendarService:
         
         start_time = start_info.get('dateTime') or start_info.get('date')
         if not start_time:
-            logger.warning(f"Skipping event without start time: {event_item.get('id')}")
+            logger.warning("Skipping event without start time: %s", event_item.get('id'))
             return None
 
         is_all_day = 'date' in start_info
@@ -385,11 +1410,11 @@ class GoogleCalendarService:
                 master_recurrence = master_events_cache[recurring_event_id].get('recurrence')
             else:
                 try:
-                    master_event = self.service.events().get(calendarId='primary', eventId=recurring_event_id).execute()
+                    master_event = self._execute('events.get', self.service.events().get(calendarId='primary', eventId=recurring_event_id))
                     master_events_cache[recurring_event_id] = master_event
                     master_recurrence = master_event.get('recurrence')
-                except HttpError as e:
-                    logger.error(f"Could not fetch master event {recurring_event_id} for instance {event_item.get('id')}: {e}")
+                except (HttpError, CircuitOpenError, TimeoutError) as e:
+                    logger.error("Could not fetch master event %s for instance %s: %s", recurring_event_id, event_item.get('id'), e)
         
         original_start = event_item.get('originalStartTime', {})
         original_start_time_str = original_start.get('dateTime') or original_start.get('date')
@@ -404,5 +1429,6 @@ class GoogleCalendarService:
             location=event_item.get('location'),
             recurring_event_id=recurring_event_id,
             original_start_time=original_start_time_str,
-            recurrence=master_recurrence
+            recurrence=master_recurrence,
+            time_zone=start_info.get('timeZone')
         )
\ No newline at end of file
@@ -0,0 +1,105 @@
+# src/calendar/singleflight.py
+import logging
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """Один выполняющийся upstream-запрос, результат которого ждут остальные."""
+    __slots__ = ("owner", "generation", "done", "result", "error", "waiters")
+
+    def __init__(self, owner: str, generation: int):
+        self.owner = owner
+        self.generation = generation
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Схлопывание одинаковых параллельных запросов (single-flight).
+
+    Первый вызов с данным ключом становится "лидером" и выполняет функцию,
+    все остальные параллельные вызовы с тем же ключом ждут его и получают
+    тот же результат (или ту же ошибку).
+
+    Роуты календаря - синхронные и выполняются в пуле потоков, поэтому
+    реализация построена на threading, а не на asyncio.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        # Поколение данных владельца (пользователя). Мутации увеличивают его,
+        # чтобы новые вызовы не присоединялись к запросу, начатому до изменения.
+        self._generations: Dict[str, int] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any], *, owner: str, timeout: Optional[float] = None) -> Any:
+        """
+        Выполняет fn() или присоединяется к уже выполняющемуся вызову с тем же ключом.
+
+        Args:
+            key: Ключ запроса, например (user, calendar_id, start, end).
+            fn: Функция, выполняющая upstream-запрос.
+            owner: Владелец данных (пользователь), используется для инвалидации.
+            timeout: Максимальное время ожидания чужого запроса (в секундах).
+
+        Raises:
+            TimeoutError: Если ожидание лидера превысило timeout.
+            Exception: Любая ошибка, которую выбросил лидер.
+        """
+        while True:
+            with self._lock:
+                generation = self._generations.get(owner, 0)
+                call = self._calls.get(key)
+                is_leader = call is None or call.generation != generation
+                if is_leader:
+                    call = _Call(owner, generation)
+                    self._calls[key] = call
+                else:
+                    call.waiters += 1
+
+            if is_leader:
+                return self._run(key, call, fn)
+
+            logger.debug("Joining in-flight request for key %s", key)
+            if not call.done.wait(timeout):
+                raise TimeoutError(f"Timed out waiting for in-flight request {key}")
+            if call.error is None:
+                return call.result
+            if isinstance(call.error, Exception):
+                raise call.error
+            # Лидер был отменён (CancelledError, KeyboardInterrupt и т.п.) -
+            # отмена не должна передаваться ожидающим, повторяем запрос сами.
+            logger.debug("In-flight request for key %s was cancelled, retrying", key)
+
+    def _run(self, key: Hashable, call: _Call, fn: Callable[[], Any]) -> Any:
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            call.done.set()
+
+    def forget(self, owner: str) -> None:
+        """
+        Отвязывает все выполняющиеся запросы владельца: вызовы, пришедшие после
+        этого момента, не получат результат, прочитанный до мутации.
+        """
+        with self._lock:
+            self._generations[owner] = self._generations.get(owner, 0) + 1
+            for key in [k for k, c in self._calls.items() if c.owner == owner]:
+                del self._calls[key]
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
@@ -0,0 +1,165 @@
+# src/calendar/stats.py
+import datetime
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+
+def _utc_offset_seconds(suffix: str) -> int:
+    """Смещение из хвоста RFC 3339 после секунд: '', 'Z', '+05:00', '.250-03:30'."""
+    zone = suffix.lstrip(".0123456789")
+    if zone in ("", "Z", "z"):
+        return 0
+    sign = -1 if zone[0] == "-" else 1
+    hours, _, minutes = zone[1:].partition(":")
+    return sign * (int(hours) * 3600 + int(minutes or 0) * 60)
+
+
+def _epoch_seconds(values: List[str]) -> np.ndarray:
+    """
+    Векторный разбор dateTime событий в epoch-секунды: локальная часть парсится
+    numpy как datetime64, смещение вычитается; различных смещений в календаре
+    единицы, поэтому они разбираются один раз.
+    """
+    if not values:
+        return np.zeros(0)
+    local = np.array([v[:19] for v in values], dtype="datetime64[s]").astype(np.int64)
+    offsets: Dict[str, int] = {}
+    shift = np.array([
+        offsets[suffix] if suffix in offsets else offsets.setdefault(suffix, _utc_offset_seconds(suffix))
+        for suffix in (v[19:] for v in values)
+    ])
+    return (local - shift).astype(float)
+
+
+def _merge_intervals(starts: np.ndarray, ends: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Объединяет пересекающиеся интервалы [start, end): возвращает отсортированные
+    непересекающиеся интервалы. Пустые интервалы отбрасываются.
+    """
+    keep = ends > starts
+    starts, ends = starts[keep], ends[keep]
+    if starts.size == 0:
+        return starts, ends
+    order = np.argsort(starts, kind="stable")
+    starts, ends = starts[order], ends[order]
+    reach = np.maximum.accumulate(ends)
+    # Новый интервал начинается там, где начало правее всего, что было покрыто до него
+    new_group = np.empty(starts.size, dtype=bool)
+    new_group[0] = True
+    new_group[1:] = starts[1:] > reach[:-1]
+    group_starts = np.flatnonzero(new_group)
+    group_ends = np.append(group_starts[1:], starts.size) - 1
+    return starts[group_starts], reach[group_ends]
+
+
+def _covered_until(merged_starts: np.ndarray, merged_ends: np.ndarray, points: np.ndarray) -> np.ndarray:
+    """Для каждой точки t - суммарная длина объединенных интервалов левее t."""
+    if merged_starts.size == 0:
+        return np.zeros(points.size)
+    lengths = merged_ends - merged_starts
+    cumulative = np.concatenate(([0.0], np.cumsum(lengths)))
+    k = np.searchsorted(merged_starts, points, side="right")
+    last = np.maximum(k - 1, 0)
+    partial = np.clip(points - merged_starts[last], 0, lengths[last])
+    return np.where(k > 0, cumulative[last] + partial, 0.0)
+
+
+def _busy_seconds_per_bucket(starts: np.ndarray, ends: np.ndarray, boundaries: np.ndarray) -> np.ndarray:
+    """Занятое время (без двойного счета пересечений) в каждом интервале [boundaries[i], boundaries[i+1])."""
+    merged_starts, merged_ends = _merge_intervals(starts, ends)
+    return np.diff(_covered_until(merged_starts, merged_ends, boundaries))
+
+
+def _hours(seconds: float) -> float:
+    return round(float(seconds) / 3600, 2)
+
+
+def compute_time_stats(events: List[Dict[str, Any]], start_date: datetime.date, end_date: datetime.date,
+                       tz: datetime.tzinfo) -> Dict[str, Any]:
+    """
+    Считает статистику занятости за дни [start_date, end_date] в таймзоне tz.
+
+    - Занятое время - объединение интервалов событий со временем: пересекающиеся
+      встречи не считаются дважды, события на границе дня делятся между днями.
+    - All-day события не считаются занятым временем; они подсчитываются
+      отдельно для каждого дня, который покрывают.
+    - Встреча относится к дню, в котором начинается.
+    - Время повторяющихся и одиночных событий считается отдельно (объединение
+      внутри каждой группы).
+    """
+    day_count = (end_date - start_date).days + 1
+    days = [start_date + datetime.timedelta(days=i) for i in range(day_count + 1)]
+    boundaries = np.array([datetime.datetime.combine(d, datetime.time.min, tzinfo=tz).timestamp() for d in days])
+
+    timed_starts, timed_ends, recurring = [], [], []
+    all_day_first, all_day_last = [], []
+    for event in events:
+        if event.get('isAllDay'):
+            first = datetime.date.fromisoformat(event['startTime'][:10])
+            last = datetime.date.fromisoformat(event['endTime'][:10])
+            all_day_first.append((first - start_date).days)
+            # Дата окончания all-day события не включается
+            all_day_last.append(max((last - start_date).days, (first - start_date).days + 1))
+            continue
+        timed_starts.append(event['startTime'])
+        timed_ends.append(event['endTime'])
+        recurring.append(bool(event.get('recurringEventId')))
+
+    starts = _epoch_seconds(timed_starts)
+    ends = _epoch_seconds(timed_ends)
+    is_recurring = np.array(recurring, dtype=bool)
+
+    busy_per_day = _busy_seconds_per_bucket(starts, ends, boundaries)
+
+    in_range = (starts >= boundaries[0]) & (starts < boundaries[-1])
+    start_days = np.searchsorted(boundaries, starts[in_range], side="right") - 1
+    meetings_per_day = np.bincount(start_days, minlength=day_count)
+
+    # Разностный массив: +1 в первый день all-day события, -1 после последнего
+    all_day_first_idx = np.array(all_day_first, dtype=int)
+    all_day_last_idx = np.array(all_day_last, dtype=int)
+    all_day_in_range = (all_day_first_idx < day_count) & (all_day_last_idx > 0)
+    all_day_delta = np.zeros(day_count + 1, dtype=int)
+    np.add.at(all_day_delta, np.clip(all_day_first_idx[all_day_in_range], 0, day_count), 1)
+    np.add.at(all_day_delta, np.clip(all_day_last_idx[all_day_in_range], 0, day_count), -1)
+    all_day_per_day = np.cumsum(all_day_delta)[:day_count]
+
+    window = boundaries[[0, -1]]
+    recurring_busy = _busy_seconds_per_bucket(starts[is_recurring], ends[is_recurring], window)[0]
+    one_off_busy = _busy_seconds_per_bucket(starts[~is_recurring], ends[~is_recurring], window)[0]
+
+    # Недели с понедельника: индекс недели для каждого дня диапазона
+    week_index = (np.arange(day_count) + start_date.weekday()) // 7
+    busy_per_week = np.bincount(week_index, weights=busy_per_day)
+    meetings_per_week = np.bincount(week_index, weights=meetings_per_day)
+    first_monday = start_date - datetime.timedelta(days=start_date.weekday())
+
+    return {
+        'totals': {
+            'busyHours': _hours(busy_per_day.sum()),
+            'meetingCount': int(in_range.sum()),
+            'allDayEventCount': int(all_day_in_range.sum()),
+            'recurringHours': _hours(recurring_busy),
+            'oneOffHours': _hours(one_off_busy),
+            'recurringMeetingCount': int((in_range & is_recurring).sum()),
+            'oneOffMeetingCount': int((in_range & ~is_recurring).sum()),
+        },
+        'days': [
+            {
+                'date': days[i].isoformat(),
+                'busyHours': _hours(busy_per_day[i]),
+                'meetingCount': int(meetings_per_day[i]),
+                'allDayEventCount': int(all_day_per_day[i]),
+            }
+            for i in range(day_count)
+        ],
+        'weeks': [
+            {
+                'weekStart': (first_monday + datetime.timedelta(weeks=w)).isoformat(),
+                'busyHours': _hours(busy_per_week[w]),
+                'meetingCount': int(meetings_per_week[w]),
+            }
+            for w in range(busy_per_week.size)
+        ],
+    }
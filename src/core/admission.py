@@ -0,0 +1,153 @@
+# src/core/admission.py
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict
+
+from src.core.config import settings
+from src.core.metrics import metrics
+
+
+class AdmissionRejected(Exception):
+    """Запрос не допущен к выполнению: очередь пользователя переполнена или ожидание слишком долгое."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"Request rejected by admission control ({reason})")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Допуск запросов календаря к пулу потоков.
+
+    - Одновременно выполняется не больше max_concurrent запросов и не больше
+      per_user_limit запросов одного пользователя.
+    - Ожидающие стоят в очередях по пользователям; освободившийся слот отдается
+      по кругу следующему пользователю, а не первому пришедшему, - поэтому
+      пользователь с сотней запросов не задерживает остальных.
+    - Запрос, прождавший max_wait_seconds, или сверх max_queued_per_user
+      в очереди пользователя отклоняется (503 с Retry-After).
+
+    Работает в event loop (async-зависимость перед синхронным обработчиком),
+    поэтому ожидание в очереди не занимает поток.
+    """
+
+    def __init__(self, max_concurrent: int, per_user_limit: int, max_wait_seconds: float, max_queued_per_user: int):
+        self.max_concurrent = max_concurrent
+        self.per_user_limit = per_user_limit
+        self.max_wait_seconds = max_wait_seconds
+        self.max_queued_per_user = max_queued_per_user
+        self._in_flight = 0
+        self._active: Dict[str, int] = {}
+        # Пользователи с ожидающими запросами в порядке обхода по кругу
+        self._queues: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queued(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def _can_run(self, user: str) -> bool:
+        return self._in_flight < self.max_concurrent and self._active.get(user, 0) < self.per_user_limit
+
+    def _grant(self, user: str) -> None:
+        self._in_flight += 1
+        self._active[user] = self._active.get(user, 0) + 1
+
+    async def acquire(self, user: str) -> None:
+        """
+        Raises:
+            AdmissionRejected: Если запрос не допущен.
+        """
+        if user not in self._queues and self._can_run(user):
+            self._grant(user)
+            metrics.observe("admission_wait_seconds", 0.0)
+            self._report()
+            return
+        queue = self._queues.get(user)
+        if queue is not None and len(queue) >= self.max_queued_per_user:
+            metrics.inc("admission_rejected_total", reason="queue_full")
+            raise AdmissionRejected("queue_full", self.max_wait_seconds)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(user, deque()).append(waiter)
+        self._report()
+        started = time.monotonic()
+        try:
+            await asyncio.wait({waiter}, timeout=self.max_wait_seconds)
+        finally:
+            if not waiter.done():
+                # Истекло время ожидания или клиент ушел: слот этому запросу уже не нужен
+                waiter.cancel()
+                self._discard(user, waiter)
+            elif not waiter.cancelled() and asyncio.current_task().cancelling():
+                self.release(user)
+        metrics.observe("admission_wait_seconds", time.monotonic() - started)
+        if waiter.cancelled():
+            metrics.inc("admission_rejected_total", reason="wait_timeout")
+            self._report()
+            raise AdmissionRejected("wait_timeout", self.max_wait_seconds)
+
+    def release(self, user: str) -> None:
+        self._in_flight -= 1
+        active = self._active.get(user, 0) - 1
+        if active > 0:
+            self._active[user] = active
+        else:
+            self._active.pop(user, None)
+        self._dispatch()
+        self._report()
+
+    def _discard(self, user: str, waiter: asyncio.Future) -> None:
+        queue = self._queues.get(user)
+        if queue is None:
+            return
+        try:
+            queue.remove(waiter)
+        except ValueError:
+            pass
+        if not queue:
+            del self._queues[user]
+        self._report()
+
+    def _dispatch(self) -> None:
+        """Раздает свободные слоты ожидающим по кругу пользователей."""
+        skipped = 0
+        while self._queues and self._in_flight < self.max_concurrent and skipped < len(self._queues):
+            user = next(iter(self._queues))
+            self._queues.move_to_end(user)
+            queue = self._queues[user]
+            if not self._can_run(user):
+                skipped += 1
+                continue
+            waiter = queue.popleft()
+            if not queue:
+                del self._queues[user]
+            self._grant(user)
+            waiter.set_result(None)
+            skipped = 0
+
+    def _report(self) -> None:
+        metrics.set_gauge("admission_in_flight", self._in_flight)
+        metrics.set_gauge("admission_queued", self.queued)
+
+    @asynccontextmanager
+    async def slot(self, user: str) -> AsyncIterator[None]:
+        await self.acquire(user)
+        try:
+            yield
+        finally:
+            self.release(user)
+
+
+admission = AdmissionController(
+    max_concurrent=settings.ADMISSION_MAX_CONCURRENT,
+    per_user_limit=settings.ADMISSION_PER_USER_LIMIT,
+    max_wait_seconds=settings.ADMISSION_MAX_WAIT_SECONDS,
+    max_queued_per_user=settings.ADMISSION_MAX_QUEUED_PER_USER,
+)
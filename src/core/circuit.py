@@ -0,0 +1,169 @@
+# src/core/circuit.py
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Tuple, TypeVar
+
+from src.core.config import settings
+from src.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+class CircuitOpenError(Exception):
+    """Вызов отклонен без обращения к внешнему сервису: цепь разомкнута."""
+
+    def __init__(self, name: str, retry_after: float, reason: str = "open"):
+        super().__init__(f"Circuit '{name}' is {reason}, retry in {retry_after:.0f}s")
+        self.name = name
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker для одного метода внешнего API.
+
+    - closed: вызовы проходят; в скользящем окне window_seconds считаются
+      неудачи - ошибки (по is_failure) и вызовы дольше slow_call_seconds.
+      При доле неудач >= failure_rate (и не меньше min_calls вызовов) цепь размыкается.
+    - open: вызовы сразу получают CircuitOpenError, потоки не ждут таймаутов.
+    - half_open: через open_seconds пропускается один пробный вызов;
+      успех замыкает цепь, неудача снова размыкает.
+
+    Параллельность вызовов breaker не ограничивает: ее уже ограничивают admission
+    control и пулы потоков, а отказ здоровому сервису выглядел бы как разомкнутая цепь.
+    """
+
+    def __init__(self, name: str, failure_rate: float, min_calls: int, window_seconds: float,
+                 slow_call_seconds: float, open_seconds: float,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._outcomes: Deque[Tuple[float, bool]] = deque()  # (время, неудача)
+        self._state = "closed"
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state(self.clock())
+
+    def _current_state(self, now: float) -> str:
+        if self._state == "open" and now - self._opened_at >= self.open_seconds:
+            self._set_state("half_open")
+        return self._state
+
+    def _set_state(self, state: str) -> None:
+        if state != self._state:
+            logger.warning("Circuit '%s': %s -> %s", self.name, self._state, state)
+            if state == "open":
+                metrics.inc("circuit_opened_total", method=self.name)
+        self._state = state
+        metrics.set_gauge("circuit_state", _STATE_VALUES[state], method=self.name)
+
+    def _reject(self, reason: str, retry_after: float) -> CircuitOpenError:
+        metrics.inc("circuit_rejected_total", method=self.name, reason=reason)
+        return CircuitOpenError(self.name, retry_after, reason)
+
+    def _before_call(self) -> bool:
+        """Пропускает вызов или бросает CircuitOpenError. Возвращает True для пробного вызова."""
+        with self._lock:
+            now = self.clock()
+            state = self._current_state(now)
+            if state == "open":
+                raise self._reject("open", self.open_seconds - (now - self._opened_at))
+            if state == "half_open":
+                if self._trial_in_flight:
+                    raise self._reject("open", 1.0)
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def _record(self, failed: bool, trial: bool) -> None:
+        with self._lock:
+            now = self.clock()
+            if trial:
+                self._trial_in_flight = False
+                self._outcomes.clear()
+                if failed:
+                    self._opened_at = now
+                    self._set_state("open")
+                else:
+                    self._set_state("closed")
+                return
+            self._outcomes.append((now, failed))
+            while self._outcomes and now - self._outcomes[0][0] > self.window_seconds:
+                self._outcomes.popleft()
+            if self._state != "closed" or len(self._outcomes) < self.min_calls:
+                return
+            failures = sum(1 for _, f in self._outcomes if f)
+            if failures / len(self._outcomes) >= self.failure_rate:
+                self._outcomes.clear()
+                self._opened_at = now
+                self._set_state("open")
+
+    def call(self, fn: Callable[[], T], is_failure: Callable[[BaseException], bool]) -> T:
+        """
+        Выполняет fn через breaker.
+
+        Raises:
+            CircuitOpenError: Если вызов отклонен без выполнения.
+        """
+        trial = self._before_call()
+        started = self.clock()
+        try:
+            result = fn()
+        except BaseException as e:
+            self._record(failed=is_failure(e), trial=trial)
+            raise
+        self._record(failed=self.clock() - started > self.slow_call_seconds, trial=trial)
+        return result
+
+    def reset(self) -> None:
+        with self._lock:
+            self._outcomes.clear()
+            self._trial_in_flight = False
+            self._set_state("closed")
+
+
+class CircuitBreakerRegistry:
+    """Breaker'ы по имени метода внешнего API; создаются при первом обращении с общими настройками."""
+
+    def __init__(self, **breaker_options):
+        self.breaker_options = breaker_options
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, name: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(name)
+            if breaker is None:
+                breaker = self._breakers[name] = CircuitBreaker(name, **self.breaker_options)
+            return breaker
+
+    def reset(self) -> None:
+        with self._lock:
+            for breaker in self._breakers.values():
+                breaker.reset()
+
+
+circuit_breakers = CircuitBreakerRegistry(
+    failure_rate=settings.CIRCUIT_FAILURE_RATE,
+    min_calls=settings.CIRCUIT_MIN_CALLS,
+    window_seconds=settings.CIRCUIT_WINDOW_SECONDS,
+    slow_call_seconds=settings.CIRCUIT_SLOW_CALL_SECONDS,
+    open_seconds=settings.CIRCUIT_OPEN_SECONDS,
+)
@@ -1,4 +1,6 @@
 # src/core/config.py
+from typing import Dict, Optional
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
@@ -23,6 +25,111 @@ class Settings(BaseSettings):
         'https://www.googleapis.com/auth/userinfo.email'
     ]
 
+    # Секрет для подписи токенов, которые мы отдаем наружу (по умолчанию - GOOGLE_CLIENT_SECRET)
+    SIGNING_SECRET: Optional[str] = None
+
+    # Логирование: уровень, формат вывода (json или text), выборка и лимит частоты
+    # записей (в секунду на шаблон сообщения) для логгеров горячего пути
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"
+    LOG_SAMPLE_RATES: Dict[str, float] = {"src.calendar.service": 0.1}
+    LOG_RATE_LIMITS: Dict[str, float] = {"src.calendar.service": 20.0, "src.calendar.router": 20.0}
+
+    # Кэш событий календаря
+    EVENTS_CACHE_TTL_SECONDS: int = 300
+
+    # Circuit breaker для методов Google Calendar API и выдача устаревших данных при сбоях
+    CIRCUIT_FAILURE_RATE: float = 0.5
+    CIRCUIT_MIN_CALLS: int = 10
+    CIRCUIT_WINDOW_SECONDS: int = 30
+    CIRCUIT_SLOW_CALL_SECONDS: float = 5.0
+    CIRCUIT_OPEN_SECONDS: int = 15
+    EVENTS_STALE_MAX_AGE_SECONDS: int = 24 * 3600
+
+    # Бюджет времени HTTP-запроса на все обращения к Google и таймаут одного вызова
+    REQUEST_DEADLINE_SECONDS: float = 20.0
+    GOOGLE_CALL_TIMEOUT_SECONDS: float = 10.0
+    # Хеджирование чтений (events.list, events.get): повтор, если ответа нет дольше квантиля задержки
+    GOOGLE_HEDGE_READS: bool = True
+    GOOGLE_HEDGE_QUANTILE: float = 0.95
+    GOOGLE_HEDGE_MIN_SAMPLES: int = 20
+    GOOGLE_HEDGE_MIN_DELAY_SECONDS: float = 0.1
+    GOOGLE_HEDGE_WORKERS: int = 16
+
+    # Ключи идемпотентности создания событий (Idempotency-Key). Без REDIS_URL - в памяти процесса.
+    REDIS_URL: Optional[str] = None
+    IDEMPOTENCY_TTL_SECONDS: int = 24 * 3600
+    IDEMPOTENCY_LOCK_SECONDS: int = 60
+    IDEMPOTENCY_WAIT_SECONDS: float = 15.0
+    IDEMPOTENCY_MAX_KEYS: int = 10000
+
+    # Поисковый индекс событий: сколько пользователей держать в памяти процесса
+    SEARCH_INDEX_MAX_USERS: int = 1000
+
+    # Допуск запросов календаря к пулу потоков: общий и персональный лимиты,
+    # ожидание в очереди (дольше - 503) и размер пула потоков для sync-обработчиков
+    ADMISSION_MAX_CONCURRENT: int = 32
+    ADMISSION_PER_USER_LIMIT: int = 4
+    ADMISSION_MAX_WAIT_SECONDS: float = 2.0
+    ADMISSION_MAX_QUEUED_PER_USER: int = 16
+    THREADPOOL_SIZE: int = 40
+
+    # Обмен auth_code при логине: отдельный лимит параллельности и время ожидания в очереди
+    LOGIN_MAX_CONCURRENCY: int = 16
+    LOGIN_QUEUE_TIMEOUT_SECONDS: float = 5.0
+
+    # Отложенная запись изменений (?async=true): сколько изменений забирать за проход, воркеры,
+    # как часто проверять очередь, повторы при сбоях Google и время, после которого изменение
+    # упавшего воркера забирает другой
+    MUTATION_BATCH_SIZE: int = 100
+    MUTATION_WORKERS: int = 4
+    MUTATION_FLUSH_INTERVAL_SECONDS: float = 1.0
+    MUTATION_MAX_ATTEMPTS: int = 8
+    MUTATION_RETRY_BASE_SECONDS: float = 2.0
+    MUTATION_RETRY_MAX_SECONDS: float = 300.0
+    MUTATION_LEASE_SECONDS: int = 120
+
+    # Импорт .ics (POST /calendar/import): размер файла (больше IMPORT_SPOOL_BYTES - во временный файл на диске),
+    # событий в batch-запросе, вставок в секунду на импорт (квота Google на пользователя), повторы при сбоях,
+    # параллельные импорты, сколько ошибок событий хранить и сколько хранить результат
+    IMPORT_MAX_BYTES: int = 50 * 1024 * 1024
+    IMPORT_SPOOL_BYTES: int = 1024 * 1024
+    IMPORT_BATCH_SIZE: int = 50
+    IMPORT_WRITES_PER_SECOND: float = 10.0
+    IMPORT_MAX_ATTEMPTS: int = 5
+    IMPORT_RETRY_BASE_SECONDS: float = 2.0
+    IMPORT_WORKERS: int = 2
+    IMPORT_MAX_ERRORS: int = 1000
+    IMPORT_RESULT_TTL_SECONDS: int = 3600
+
+    # Лента .ics для подписок (GET /calendar/export.ics): сколько хранить собранную ленту (мутации
+    # и push-уведомления сбрасывают ее раньше), за сколько дней назад брать события, сколько лент в памяти
+    EXPORT_CACHE_TTL_SECONDS: int = 300
+    EXPORT_PAST_DAYS: int = 365
+    EXPORT_MAX_CACHED_FEEDS: int = 1000
+
+    # Админские эндпоинты (/admin/*): без ADMIN_TOKEN выключены; профилирование - не дольше PROFILE_MAX_SECONDS
+    ADMIN_TOKEN: Optional[str] = None
+    PROFILE_MAX_SECONDS: int = 60
+
+    # Фоновое обновление access token активных пользователей
+    TOKEN_REFRESH_AHEAD_SECONDS: int = 300
+    TOKEN_REFRESH_INTERVAL_SECONDS: int = 30
+    TOKEN_ACTIVE_USER_WINDOW_SECONDS: int = 3600
+    TOKEN_REFRESH_RATE_PER_SECOND: float = 5.0
+
+    # Прогрев кэша после логина: текущая и следующие недели
+    PREFETCH_WEEKS: int = 2
+    PREFETCH_WORKERS: int = 4
+
+    # Push-уведомления Google (events.watch). Без публичного HTTPS-адреса каналы не регистрируются.
+    # Каналы пользователей, не обращавшихся к календарю дольше WATCH_ACTIVE_USER_WINDOW_SECONDS, останавливаются.
+    GOOGLE_WEBHOOK_URL: Optional[str] = None
+    WATCH_CHANNEL_TTL_SECONDS: int = 7 * 24 * 3600
+    WATCH_RENEW_BEFORE_SECONDS: int = 3600
+    WATCH_RENEW_INTERVAL_SECONDS: int = 600
+    WATCH_ACTIVE_USER_WINDOW_SECONDS: int = 24 * 3600
+
     @property
     def DATABASE_URL(self) -> str:
         return f"postgresql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
@@ -1,5 +1,7 @@
 # src/core/database.py
-from sqlalchemy import create_engine
+import functools
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from contextlib import contextmanager
 import logging
@@ -7,19 +9,56 @@ from .config import settings
 
 logger = logging.getLogger(__name__)
 
-try:
-    engine = create_engine(settings.DATABASE_URL)
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    Base = declarative_base()
-    logger.info("Database engine and session created successfully.")
-except Exception as e:
-    logger.error(f"Failed to create database engine: {e}", exc_info=True)
-    raise
+Base = declarative_base()
+# Engine создается лениво (get_engine): драйвер БД импортируется при первом обращении
+# или на этапе прогрева в lifespan, а не при импорте модуля.
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+
+
+# Фоновые потоки с собственными сессиями: забор очереди изменений, обновление токенов, продление каналов
+DB_BACKGROUND_THREADS = 3
+
+
+def pool_size() -> int:
+    """
+    Соединений в пуле столько, сколько сессий может быть открыто одновременно:
+    запросы календаря, пропущенные admission control, и логины (но не больше
+    потоков пула sync-обработчиков), плюс воркеры очереди изменений и фоновые потоки.
+    """
+    requests = min(settings.THREADPOOL_SIZE, settings.ADMISSION_MAX_CONCURRENT + settings.LOGIN_MAX_CONCURRENCY)
+    return requests + settings.MUTATION_WORKERS + DB_BACKGROUND_THREADS
+
+
+@functools.lru_cache(maxsize=1)
+def get_engine() -> Engine:
+    try:
+        engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True, pool_size=pool_size())
+        SessionLocal.configure(bind=engine)
+        logger.info("Database engine and session created successfully.")
+        return engine
+    except Exception as e:
+        logger.error("Failed to create database engine: %s", e, exc_info=True)
+        raise
+
+
+def __getattr__(name: str):
+    # Обратная совместимость: src.core.database.engine
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def ping_database() -> None:
+    """Открывает соединение пула и проверяет доступность БД."""
+    with get_engine().connect() as connection:
+        connection.execute(text("SELECT 1"))
+
 
 @contextmanager
 def get_db_session():
+    get_engine()
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
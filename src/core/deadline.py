@@ -0,0 +1,54 @@
+# src/core/deadline.py
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+# Момент (time.monotonic), к которому запрос должен быть обработан. Выставляется
+# middleware на весь HTTP-запрос и виден синхронным зависимостям и обработчикам.
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Бюджет времени запроса исчерпан до обращения к внешнему сервису."""
+
+
+@contextmanager
+def deadline_scope(seconds: float) -> Iterator[None]:
+    """
+    Ограничивает все вызовы внутри блока бюджетом seconds. Вложенная область
+    не может продлить уже действующий дедлайн, только сократить.
+    """
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    if current is not None:
+        deadline = min(deadline, current)
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Оставшийся бюджет в секундах (может быть отрицательным) или None, если дедлайна нет."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def call_timeout(max_seconds: float) -> float:
+    """
+    Таймаут одного вызова внешнего сервиса: остаток бюджета запроса, но не больше max_seconds.
+    Вне запроса (фоновые задачи) - просто max_seconds.
+
+    Raises:
+        DeadlineExceeded: Если бюджет уже исчерпан.
+    """
+    left = remaining()
+    if left is None:
+        return max_seconds
+    if left <= 0:
+        raise DeadlineExceeded(f"Request deadline exceeded by {-left:.3f}s")
+    return min(left, max_seconds)
@@ -1,18 +1,23 @@
 # src/core/dependencies.py
 from fastapi import Depends, HTTPException, status, Header
+from google.auth.exceptions import TransportError
 from sqlalchemy.orm import Session
-from google.oauth2 import credentials
-from google.auth.transport import requests as google_requests
 
+from src.core.admission import AdmissionRejected, admission
+from src.core.profiler import profiler
 from src.core.database import get_db_session
 from src.core.config import settings
 from src.users import models as user_models
 from src.users import crud as users_crud
 from src.auth.service import AuthService
+from src.auth.tokens import TokenRevokedError, token_manager
 from src.calendar.service import GoogleCalendarService
+from src.calendar.channels import channel_manager
 
 # Зависимость для получения сессии БД
-from typing import Generator
+import hmac
+import math
+from typing import AsyncIterator, Generator, Optional
 
 def get_db() -> Generator[Session, None, None]:
     with get_db_session() as db:
@@ -39,35 +44,67 @@ async def get_current_user(
     except HTTPException as e:
         raise e
 
+async def get_admitted_user(
+    current_user: user_models.User = Depends(get_current_user), db: Session = Depends(get_db)
+) -> AsyncIterator[user_models.User]:
+    """
+    Пропускает запрос пользователя через admission control до того, как он займет
+    поток пула: ожидание в очереди идет в event loop, слот освобождается после ответа.
+    """
+    profiler.identify(current_user.google_id, current_user.email)
+    # Ждущий в очереди запрос не должен держать соединение пула БД: сессия отдает его
+    # (пользователь остается загруженным), обработчик при необходимости возьмет новое
+    db.close()
+    try:
+        await admission.acquire(current_user.google_id)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many concurrent calendar requests. Please retry later.",
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+        )
+    try:
+        yield current_user
+    finally:
+        admission.release(current_user.google_id)
+
 # Супер-полезная зависимость, которая "собирает" сервис календаря для эндпоинта
 def get_calendar_service(
-    current_user: user_models.User = Depends(get_current_user)
+    current_user: user_models.User = Depends(get_admitted_user)
 ) -> GoogleCalendarService:
     """
     Dependency that provides a ready-to-use GoogleCalendarService instance
     for the authenticated user.
     """
-    if not current_user.refresh_token:
+    if not current_user.refresh_token or token_manager.is_revoked(current_user.google_id, current_user.refresh_token):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Google Calendar access not configured or token revoked. Please sign in again."
         )
     
     try:
-        creds = credentials.Credentials.from_authorized_user_info(
-            info={
-                "refresh_token": current_user.refresh_token,
-                "client_id": settings.GOOGLE_CLIENT_ID,
-                "client_secret": settings.GOOGLE_CLIENT_SECRET,
-                "token_uri": "https://oauth2.googleapis.com/token",
-            },
-            scopes=settings.SCOPES
-        )
+        # Access token обычно уже обновлен фоновым планировщиком (src/auth/tokens.py)
+        creds = token_manager.get_credentials(current_user.google_id, current_user.refresh_token)
+        token_manager.ensure_fresh(current_user.google_id, creds)
         
-        if creds.expired and creds.refresh_token:
-            creds.refresh(google_requests.Request())
-            # TODO: Здесь можно сохранить обновленный access_token в БД, если нужно
-        
-        return GoogleCalendarService(creds=creds, user_email=current_user.email)
+        # Канал push-уведомлений регистрируется фоновой задачей, не на пути запроса
+        channel_manager.track_user(current_user.google_id, current_user.email)
+
+        return GoogleCalendarService(creds=creds, user_email=current_user.email, google_id=current_user.google_id)
+    except TokenRevokedError:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Google Calendar access not configured or token revoked. Please sign in again."
+        )
+    except (TimeoutError, TransportError) as e:
+        # Обновление access token не уложилось в таймаут или бюджет запроса
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=f"Google token refresh failed: {e}")
     except Exception as e:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to create calendar service: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to create calendar service: {e}")
+
+async def require_admin(x_admin_token: Optional[str] = Header(None, alias="X-Admin-Token")) -> None:
+    """Админские эндпоинты: без ADMIN_TOKEN их как будто нет (404), иначе нужен заголовок X-Admin-Token."""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token.encode(), settings.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid admin token")
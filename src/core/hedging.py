@@ -0,0 +1,103 @@
+# src/core/hedging.py
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Deque, Dict, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class LatencyWindow:
+    """Последние max_samples длительностей вызовов по методу; квантиль считается по ним."""
+
+    def __init__(self, max_samples: int = 200, min_samples: int = 20):
+        self.max_samples = max_samples
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def observe(self, method: str, seconds: float) -> None:
+        with self._lock:
+            samples = self._samples.get(method)
+            if samples is None:
+                samples = self._samples[method] = deque(maxlen=self.max_samples)
+            samples.append(seconds)
+
+    def quantile(self, method: str, q: float) -> Optional[float]:
+        """Квантиль q или None, пока вызовов меньше min_samples."""
+        with self._lock:
+            samples = self._samples.get(method)
+            if samples is None or len(samples) < self.min_samples:
+                return None
+            ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._samples.clear()
+
+
+class Hedger:
+    """
+    Хеджирование идемпотентных вызовов: если основной вызов не ответил за
+    hedge_after секунд, параллельно запускается второй; возвращается первый
+    успешный результат. Проигравший вызов не прерывается - его ограничивает
+    собственный таймаут.
+
+    Вызовы выполняются в общем пуле из max_workers потоков. Если свободных
+    слотов нет, основной вызов идет в потоке вызывающего без хеджирования,
+    а хедж не запускается: при перегрузке дублировать запросы нельзя.
+    """
+
+    def __init__(self, max_workers: int, thread_name_prefix: str = "hedge"):
+        self.max_workers = max_workers
+        self.thread_name_prefix = thread_name_prefix
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _submit(self, fn: Callable[[], T]) -> Optional["Future[T]"]:
+        if not self._slots.acquire(blocking=False):
+            return None
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix=self.thread_name_prefix)
+            executor = self._executor
+        future = executor.submit(fn)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def call(self, primary: Callable[[], T], hedge: Callable[[], T], hedge_after: float) -> Tuple[T, str]:
+        """
+        Returns:
+            (результат, исход): 'not_needed' - основной вызов уложился в hedge_after,
+            'primary' / 'hedge' - кто ответил первым после запуска хеджа,
+            'no_capacity' - хедж не запускался из-за занятого пула.
+        """
+        first = self._submit(primary)
+        if first is None:
+            return primary(), "no_capacity"
+        # wait, а не result(timeout): TimeoutError самого вызова не должен выглядеть как "еще не готов"
+        done, _ = wait([first], timeout=hedge_after)
+        if done:
+            return first.result(), "not_needed"
+        second = self._submit(hedge)
+        if second is None:
+            return first.result(), "no_capacity"
+        pending = {first: "primary", second: "hedge"}
+        error: Optional[BaseException] = None
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                winner = pending.pop(future)
+                if future.exception() is None:
+                    return future.result(), winner
+                error = error or future.exception()
+        raise error
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
@@ -0,0 +1,202 @@
+# src/core/idempotency.py
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+try:
+    import redis
+except ImportError:  # redis - необязательная зависимость, без нее ключи хранятся в памяти процесса
+    redis = None
+
+from src.core.config import settings
+from src.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+Response = Dict[str, Any]
+
+
+class IdempotencyKeyReusedError(Exception):
+    """Ключ уже использован для запроса с другим телом."""
+
+
+class IdempotencyInProgressError(Exception):
+    """Первый запрос с этим ключом еще выполняется дольше, чем можно ждать."""
+
+
+def request_fingerprint(*parts: Any) -> str:
+    """Отпечаток тела запроса: повтор с тем же ключом, но другими данными - ошибка клиента."""
+    payload = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "response", "expires_at", "done", "waiters")
+
+    def __init__(self, fingerprint: str, expires_at: float):
+        self.fingerprint = fingerprint
+        self.response: Optional[Response] = None
+        self.expires_at = expires_at
+        self.done = threading.Event()
+        self.waiters = 0  # Повторы, ждущие первый запрос
+
+
+class InMemoryIdempotencyStore:
+    """
+    Ключи идемпотентности в памяти процесса: ответ первого успешного запроса
+    хранится ttl_seconds. Параллельные повторы ждут первый запрос на Event;
+    если он упал, один из ждущих выполняет запрос заново. Не больше max_keys
+    ключей - старые вытесняются.
+    """
+
+    def __init__(self, ttl_seconds: float, max_keys: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+
+    def run(self, key: str, fingerprint: str, fn: Callable[[], Response],
+            wait_timeout: float) -> Tuple[Response, bool]:
+        """
+        Выполняет fn() один раз для ключа или возвращает сохраненный ответ.
+
+        Returns:
+            (ответ, True если это повтор и fn не выполнялась).
+
+        Raises:
+            IdempotencyKeyReusedError: Если ключ использован с другим телом запроса.
+            IdempotencyInProgressError: Если первый запрос не завершился за wait_timeout.
+        """
+        deadline = time.monotonic() + wait_timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                entry = self._entries.get(key)
+                if entry is not None and entry.done.is_set() and entry.response is not None and entry.expires_at <= now:
+                    del self._entries[key]
+                    entry = None
+                if entry is None:
+                    entry = self._entries[key] = _Entry(fingerprint, now + self.ttl_seconds)
+                    self._evict()
+                    owner = True
+                else:
+                    owner = False
+            if entry.fingerprint != fingerprint:
+                raise IdempotencyKeyReusedError("Idempotency key was used with a different request")
+            if owner:
+                return self._execute(key, entry, fn), False
+            with self._lock:
+                entry.waiters += 1
+            try:
+                finished = entry.done.wait(timeout=max(0.0, deadline - time.monotonic()))
+            finally:
+                with self._lock:
+                    entry.waiters -= 1
+            if not finished:
+                raise IdempotencyInProgressError("A request with this idempotency key is still in progress")
+            if entry.response is not None:
+                return entry.response, True
+            # Первый запрос завершился ошибкой и ключ освобожден - пробуем сами
+
+    def _execute(self, key: str, entry: _Entry, fn: Callable[[], Response]) -> Response:
+        try:
+            entry.response = fn()
+        except BaseException:
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+            raise
+        finally:
+            entry.done.set()
+        return entry.response
+
+    def _evict(self) -> None:
+        while len(self._entries) > self.max_keys:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisIdempotencyStore:
+    """
+    Ключи идемпотентности в Redis - общие для всех воркеров. Первый запрос
+    ставит маркер SET NX с коротким TTL (lock_seconds: упавший воркер не
+    заблокирует ключ навсегда), по завершении маркер заменяется ответом на
+    ttl_seconds. Повторы опрашивают ключ, пока маркер не сменится ответом.
+    """
+
+    def __init__(self, client: Any, ttl_seconds: float, lock_seconds: float, prefix: str = "idempotency:"):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.lock_seconds = lock_seconds
+        self.prefix = prefix
+
+    def run(self, key: str, fingerprint: str, fn: Callable[[], Response],
+            wait_timeout: float) -> Tuple[Response, bool]:
+        redis_key = self.prefix + key
+        pending = json.dumps({"fingerprint": fingerprint})
+        deadline = time.monotonic() + wait_timeout
+        delay = 0.05
+        while True:
+            if self.client.set(redis_key, pending, nx=True, px=int(self.lock_seconds * 1000)):
+                try:
+                    response = fn()
+                except BaseException:
+                    self.client.delete(redis_key)
+                    raise
+                stored = json.dumps({"fingerprint": fingerprint, "response": response})
+                self.client.set(redis_key, stored, px=int(self.ttl_seconds * 1000))
+                return response, False
+            raw = self.client.get(redis_key)
+            if raw is not None:
+                entry = json.loads(raw)
+                if entry["fingerprint"] != fingerprint:
+                    raise IdempotencyKeyReusedError("Idempotency key was used with a different request")
+                if "response" in entry:
+                    return entry["response"], True
+            # Маркер первого запроса еще на месте (или только что удален после ошибки)
+            left = deadline - time.monotonic()
+            if left <= 0:
+                raise IdempotencyInProgressError("A request with this idempotency key is still in progress")
+            time.sleep(min(delay, left))
+            delay = min(delay * 2, 0.5)
+
+
+class IdempotencyGuard:
+    """Фасад над хранилищем: область ключа (пользователь), таймаут ожидания, метрики."""
+
+    def __init__(self, store: Any, wait_timeout: float):
+        self.store = store
+        self.wait_timeout = wait_timeout
+
+    def run(self, scope: str, key: str, fingerprint: str, fn: Callable[[], Response]) -> Tuple[Response, bool]:
+        try:
+            response, replayed = self.store.run(f"{scope}:{key}", fingerprint, fn, self.wait_timeout)
+        except IdempotencyKeyReusedError:
+            metrics.inc("idempotency_requests_total", result="key_reused")
+            raise
+        except IdempotencyInProgressError:
+            metrics.inc("idempotency_requests_total", result="in_progress")
+            raise
+        metrics.inc("idempotency_requests_total", result="replayed" if replayed else "executed")
+        return response, replayed
+
+
+def _create_store() -> Any:
+    if settings.REDIS_URL:
+        if redis is not None:
+            return RedisIdempotencyStore(redis.Redis.from_url(settings.REDIS_URL),
+                                         ttl_seconds=settings.IDEMPOTENCY_TTL_SECONDS,
+                                         lock_seconds=settings.IDEMPOTENCY_LOCK_SECONDS)
+        logger.warning("REDIS_URL is set but the redis package is not installed; idempotency keys are kept in memory")
+    return InMemoryIdempotencyStore(ttl_seconds=settings.IDEMPOTENCY_TTL_SECONDS,
+                                    max_keys=settings.IDEMPOTENCY_MAX_KEYS)
+
+
+idempotency = IdempotencyGuard(_create_store(), wait_timeout=settings.IDEMPOTENCY_WAIT_SECONDS)
@@ -0,0 +1,141 @@
+# src/core/logging_config.py
+import atexit
+import datetime
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import threading
+from typing import Dict, Optional, Tuple
+
+from src.core.config import settings
+from src.core.metrics import metrics
+from src.core.ratelimit import TokenBucket
+
+# Атрибуты LogRecord, которые есть у любой записи; остальные пришли через extra=
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_configure_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна JSON-строка на запись: время UTC, уровень, логгер, сообщение, поля из extra и traceback."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    В потоке запроса только подставляет аргументы в сообщение (они могут
+    измениться после возврата) и сворачивает traceback в текст; форматирование
+    и запись выполняет поток QueueListener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        message = record.getMessage()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.msg = message
+        record.args = None
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает долю rate записей уровня INFO и ниже; предупреждения и ошибки - всегда."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO or random.random() < self.rate:
+            return True
+        metrics.inc("log_records_dropped_total", logger=record.name, reason="sampled")
+        return False
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Не больше per_second записей в секунду (всплески до burst) на каждый шаблон
+    сообщения логгера. Ошибки не ограничиваются.
+    """
+
+    def __init__(self, per_second: float, burst: Optional[float] = None):
+        super().__init__()
+        self.per_second = per_second
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.ERROR:
+            return True
+        # Ключ - шаблон до подстановки аргументов: одно и то же сообщение про разных пользователей
+        key = (record.name, str(record.msg))
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(rate=self.per_second, capacity=self.burst)
+        if bucket.try_acquire():
+            return True
+        metrics.inc("log_records_dropped_total", logger=record.name, reason="rate_limited")
+        return False
+
+
+def configure_logging() -> None:
+    """
+    Единая настройка логирования процесса (вызывается один раз при старте):
+    корневой логгер пишет в очередь, а форматирование (JSON или текст) и вывод
+    в stderr выполняются в фоновом потоке. Для логгеров горячего пути
+    включаются выборка и ограничение частоты (LOG_SAMPLE_RATES, LOG_RATE_LIMITS).
+    """
+    global _listener
+    with _configure_lock:
+        if _listener is not None:
+            return
+        stream = logging.StreamHandler()
+        stream.setFormatter(JsonFormatter() if settings.LOG_FORMAT == "json" else logging.Formatter(_TEXT_FORMAT))
+        log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(_QueueHandler(log_queue))
+        root.setLevel(settings.LOG_LEVEL.upper())
+
+        for name, rate in settings.LOG_SAMPLE_RATES.items():
+            logging.getLogger(name).addFilter(SamplingFilter(rate))
+        for name, per_second in settings.LOG_RATE_LIMITS.items():
+            logging.getLogger(name).addFilter(RateLimitFilter(per_second))
+
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Дописывает записи из очереди и останавливает фоновый поток."""
+    global _listener
+    with _configure_lock:
+        listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
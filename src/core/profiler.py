@@ -0,0 +1,268 @@
+# src/core/profiler.py
+import contextvars
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from types import CodeType
+from typing import Any, Dict, Iterator, List, Optional
+
+from src.core.metrics import metrics
+
+# Потоки, обслуживающие запросы: event loop, пул для sync-обработчиков, хеджированные вызовы Google
+PROFILED_THREAD_PREFIXES = ("MainThread", "AnyIO worker thread", "google-hedge")
+# Поток, ждущий здесь новую работу без кода приложения в стеке, простаивает
+_IDLE_FILES = frozenset({"threading.py", "queue.py", "selectors.py"})
+_SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+_PROJECT_DIR = os.path.dirname(_SRC_DIR.rstrip(os.sep)) + os.sep
+
+# tracemalloc: глубина стека и сколько мест выделения памяти отдавать
+MEMORY_TRACE_FRAMES = 25
+MEMORY_TOP_LIMIT = 30
+# Выделения памяти по пути построения ответа: наш код, FastAPI/Starlette и pydantic
+_MEMORY_PATHS = (os.sep + "fastapi" + os.sep, os.sep + "starlette" + os.sep, os.sep + "pydantic" + os.sep)
+
+
+class ProfilerBusyError(Exception):
+    """Профилирование уже идет: одновременно возможна только одна сессия."""
+
+
+def _frame_label(code: CodeType) -> str:
+    filename = code.co_filename
+    if filename.startswith(_PROJECT_DIR):
+        path = filename[len(_PROJECT_DIR):]
+    else:
+        path = "/".join(filename.replace(os.sep, "/").split("/")[-2:])
+    return f"{code.co_name} ({path}:{code.co_firstlineno})"
+
+
+def _thread_group(name: str) -> Optional[str]:
+    for prefix in PROFILED_THREAD_PREFIXES:
+        if name.startswith(prefix):
+            return prefix
+    return None
+
+
+def _on_response_path(traceback: tracemalloc.Traceback) -> bool:
+    # Простые проверки строк: tracemalloc.Filter с all_frames=True на большой куче работает секундами
+    return any(frame.filename.startswith(_SRC_DIR) and frame.filename != __file__
+               or any(part in frame.filename for part in _MEMORY_PATHS) for frame in traceback)
+
+
+def _is_idle(stack: List[CodeType]) -> bool:
+    """stack - от текущей функции к корню потока."""
+    if os.path.basename(stack[0].co_filename) not in _IDLE_FILES:
+        return False
+    return not any(code.co_filename.startswith(_SRC_DIR) for code in stack)
+
+
+class ProfileSession:
+    """
+    Одна сессия профилирования: стеки потоков запросов снимаются каждые
+    interval секунд, пока выполняется хотя бы один подходящий запрос.
+    Заканчивается через seconds секунд или после max_requests подходящих запросов.
+    """
+
+    def __init__(self, seconds: float, max_requests: Optional[int], route: Optional[str], user: Optional[str],
+                 interval: float, memory: bool):
+        self.seconds = seconds
+        self.max_requests = max_requests
+        self.route = route
+        self.user = user
+        self.interval = interval
+        self.memory = memory
+        self.started_at = time.monotonic()
+        self.deadline = self.started_at + seconds
+        self.finished_at: Optional[float] = None
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self.requests = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.finished = threading.Event()
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._started_tracemalloc = False
+        self.memory_result: Optional[Dict[str, Any]] = None
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def matches_route(self, path: str) -> bool:
+        return self.route is None or path == self.route or path.startswith(self.route.rstrip("/") + "/")
+
+    def matches_user(self, *user_ids: Optional[str]) -> bool:
+        return self.user is None or self.user in user_ids
+
+    def request_started(self) -> None:
+        with self._lock:
+            self._in_flight += 1
+
+    def request_finished(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self.requests += 1
+            if self.max_requests is not None and self.requests >= self.max_requests:
+                self._stop.set()
+
+    def take_sample(self, skip_thread: int) -> None:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            group = _thread_group(names.get(ident, ""))
+            if ident == skip_thread or group is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            if _is_idle(stack):
+                continue
+            stack.reverse()
+            self.samples[(group, tuple(stack))] += 1
+        self.sample_count += 1
+
+    def start_memory(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(MEMORY_TRACE_FRAMES)
+            self._started_tracemalloc = True
+        tracemalloc.reset_peak()
+        self._baseline = tracemalloc.take_snapshot()
+
+    def stop_memory(self) -> None:
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+        diff = snapshot.compare_to(self._baseline, "traceback")
+        top = [stat for stat in diff if stat.size_diff > 0 and _on_response_path(stat.traceback)][:MEMORY_TOP_LIMIT]
+        self.memory_result = {
+            "peakTracedBytes": peak,
+            "top": [
+                {
+                    "sizeDiffBytes": stat.size_diff,
+                    "countDiff": stat.count_diff,
+                    "sizeBytes": stat.size,
+                    "traceback": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+                }
+                for stat in top
+            ],
+        }
+
+    def collapsed(self) -> str:
+        """Стеки в формате collapsed (flamegraph.pl, speedscope): "поток;корень;...;функция число"."""
+        lines = []
+        for (group, stack), count in self.samples.most_common():
+            lines.append(";".join([group] + [_frame_label(code) for code in stack]) + f" {count}")
+        return "\n".join(lines)
+
+    def result(self) -> Dict[str, Any]:
+        return {
+            "durationSeconds": round((self.finished_at or time.monotonic()) - self.started_at, 3),
+            "requests": self.requests,
+            "samples": self.sample_count,
+            "intervalMs": self.interval * 1000,
+            "collapsed": self.collapsed(),
+            "memory": self.memory_result,
+        }
+
+
+class _ProfiledRequest:
+    __slots__ = ("session", "active")
+
+    def __init__(self, session: ProfileSession):
+        self.session = session
+        self.active = False
+
+    def activate(self) -> None:
+        self.active = True
+        self.session.request_started()
+
+
+_current_request: contextvars.ContextVar[Optional[_ProfiledRequest]] = contextvars.ContextVar(
+    "profiled_request", default=None
+)
+
+
+class SamplingProfiler:
+    """
+    Профилировщик по запросу (POST /admin/profile). Вне сессии стоит одной
+    проверки в middleware на запрос. Во время сессии фоновый поток читает
+    sys._current_frames() только пока выполняется подходящий запрос (по пути
+    и пользователю) и отбрасывает простаивающие потоки пула. Запросы,
+    выполняющиеся в это же время в тех же пулах, тоже попадают в выборку:
+    фильтр по пользователю включает ее только на время его запросов.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._session: Optional[ProfileSession] = None
+
+    @property
+    def active(self) -> Optional[ProfileSession]:
+        return self._session
+
+    def start(self, seconds: float, max_requests: Optional[int] = None, route: Optional[str] = None,
+              user: Optional[str] = None, interval: float = 0.01, memory: bool = False) -> ProfileSession:
+        """
+        Raises:
+            ProfilerBusyError: Если сессия уже идет.
+        """
+        with self._lock:
+            if self._session is not None:
+                raise ProfilerBusyError("A profiling session is already running")
+            session = self._session = ProfileSession(seconds, max_requests, route, user, interval, memory)
+        if memory:
+            session.start_memory()
+        threading.Thread(target=self._sample_loop, args=(session,), name="profiler", daemon=True).start()
+        metrics.inc("profiler_sessions_total", memory=memory)
+        return session
+
+    def _sample_loop(self, session: ProfileSession) -> None:
+        me = threading.get_ident()
+        try:
+            while not session._stop.wait(session.interval):
+                if time.monotonic() >= session.deadline:
+                    break
+                if session.in_flight > 0:
+                    session.take_sample(me)
+        finally:
+            session.finished_at = time.monotonic()
+            try:
+                if session.memory:
+                    session.stop_memory()
+            finally:
+                with self._lock:
+                    if self._session is session:
+                        self._session = None
+                session.finished.set()
+
+    @contextmanager
+    def track(self, path: str) -> Iterator[None]:
+        """Оборачивает обработку запроса в middleware; без сессии ничего не делает."""
+        session = self._session
+        if session is None or not session.matches_route(path):
+            yield
+            return
+        profiled = _ProfiledRequest(session)
+        token = _current_request.set(profiled)
+        if session.user is None:
+            profiled.activate()
+        try:
+            yield
+        finally:
+            _current_request.reset(token)
+            if profiled.active:
+                session.request_finished()
+
+    def identify(self, *user_ids: Optional[str]) -> None:
+        """Вызывается после аутентификации: запрос нужного пользователя начинает профилироваться."""
+        profiled = _current_request.get()
+        if profiled is not None and not profiled.active and profiled.session.matches_user(*user_ids):
+            profiled.activate()
+
+
+profiler = SamplingProfiler()
@@ -0,0 +1,79 @@
+# src/core/scheduler.py
+import logging
+import threading
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _PeriodicJob:
+    def __init__(self, func: Callable[[], None], interval_seconds: float, name: str):
+        self.func = func
+        self.interval_seconds = interval_seconds
+        self.name = name
+        self.thread: Optional[threading.Thread] = None
+
+
+class BackgroundScheduler:
+    """
+    Минимальный планировщик периодических фоновых задач.
+
+    Каждая задача работает в своем daemon-потоке: задачи календаря используют
+    синхронный клиент Google и не должны блокировать event loop.
+    Запускается и останавливается в lifespan приложения (main.py).
+    """
+
+    def __init__(self):
+        self._jobs: List[_PeriodicJob] = []
+        self._stop = threading.Event()
+        self._started = False
+        self._lock = threading.Lock()
+
+    def add_job(self, func: Callable[[], None], interval_seconds: float, name: Optional[str] = None) -> None:
+        job = _PeriodicJob(func, interval_seconds, name or func.__name__)
+        with self._lock:
+            self._jobs.append(job)
+            if self._started:
+                self._start_job(job)
+
+    def start(self) -> None:
+        with self._lock:
+            if self._started:
+                return
+            self._stop.clear()
+            self._started = True
+            for job in self._jobs:
+                self._start_job(job)
+        logger.info("Background scheduler started with %d job(s).", len(self._jobs))
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        with self._lock:
+            if not self._started:
+                return
+            self._started = False
+            self._stop.set()
+            jobs = list(self._jobs)
+        for job in jobs:
+            if job.thread is not None:
+                job.thread.join(timeout=timeout)
+                job.thread = None
+        logger.info("Background scheduler stopped.")
+
+    @property
+    def running(self) -> bool:
+        return self._started
+
+    def _start_job(self, job: _PeriodicJob) -> None:
+        job.thread = threading.Thread(target=self._run_job, args=(job,), name=f"job-{job.name}", daemon=True)
+        job.thread.start()
+
+    def _run_job(self, job: _PeriodicJob) -> None:
+        while not self._stop.wait(job.interval_seconds):
+            try:
+                job.func()
+            except Exception as e:
+                logger.error("Background job '%s' failed: %s", job.name, e, exc_info=True)
+
+
+# Единственный планировщик процесса
+scheduler = BackgroundScheduler()
@@ -0,0 +1,44 @@
+# src/core/security.py
+import base64
+import hashlib
+import hmac
+from typing import Optional
+
+from .config import settings
+
+
+def _signing_key() -> bytes:
+    return (settings.SIGNING_SECRET or settings.GOOGLE_CLIENT_SECRET).encode("utf-8")
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def sign_value(value: str, purpose: str) -> str:
+    """
+    Возвращает строку вида <value>.<hmac>, которую можно отдать наружу
+    (токен канала уведомлений, ссылка подписки) и затем проверить через unsign_value.
+    """
+    payload = _b64encode(value.encode("utf-8"))
+    mac = hmac.new(_signing_key(), f"{purpose}:{payload}".encode("ascii"), hashlib.sha256).digest()
+    return f"{payload}.{_b64encode(mac)}"
+
+
+def unsign_value(token: Optional[str], purpose: str) -> Optional[str]:
+    """Проверяет подпись токена и возвращает исходное значение или None."""
+    if not token or "." not in token:
+        return None
+    payload, _, signature = token.rpartition(".")
+    try:
+        # Токен приходит снаружи: не-ASCII символы (UnicodeEncodeError) - такая же подделка
+        expected = hmac.new(_signing_key(), f"{purpose}:{payload}".encode("ascii"), hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, _b64decode(signature)):
+            return None
+        return _b64decode(payload).decode("utf-8")
+    except (ValueError, UnicodeError):
+        return None
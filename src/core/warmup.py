@@ -0,0 +1,78 @@
+# src/core/warmup.py
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from src.core.database import ping_database
+from src.auth.google_client import google_oauth_client
+from src.calendar.service import load_discovery_document
+
+logger = logging.getLogger(__name__)
+
+
+def _load_google_client() -> None:
+    # Тяжелый модуль клиента Google импортируется здесь, до первого запроса, а не при импорте приложения
+    import googleapiclient.discovery  # noqa: F401
+    load_discovery_document()
+
+
+async def _check_google_client() -> None:
+    await run_in_threadpool(_load_google_client)
+
+
+async def _check_google_certs() -> None:
+    await google_oauth_client.get_certs()
+
+
+async def _check_database() -> None:
+    await run_in_threadpool(ping_database)
+
+
+# (имя, проверка, обязательна ли для готовности)
+WARMUP_CHECKS: List[Tuple[str, Callable[[], Awaitable[Any]], bool]] = [
+    ("google_client", _check_google_client, True),
+    ("google_certs", _check_google_certs, False),
+    ("database", _check_database, True),
+]
+
+
+class Readiness:
+    """
+    Состояние прогрева воркера. Воркер готов принимать трафик, когда все
+    обязательные проверки прошли; необязательные (сертификаты Google) только
+    ускоряют первые запросы и при ошибке будут загружены лениво.
+    """
+
+    def __init__(self, checks: List[Tuple[str, Callable[[], Awaitable[Any]], bool]]):
+        self._checks = checks
+        self.results: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def ready(self) -> bool:
+        return all(self.results.get(name, {}).get("ok") for name, _, required in self._checks if required)
+
+    async def run(self, only_failed: bool = False) -> bool:
+        for name, check, required in self._checks:
+            if only_failed and self.results.get(name, {}).get("ok"):
+                continue
+            started = time.perf_counter()
+            try:
+                await check()
+                result = {"ok": True}
+            except Exception as e:
+                log = logger.error if required else logger.warning
+                log(f"Warm-up check '{name}' failed: {e}")
+                result = {"ok": False, "error": str(e)}
+            result["required"] = required
+            result["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            self.results[name] = result
+        logger.info("Warm-up finished, ready=%s: %s", self.ready, self.results)
+        return self.ready
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"status": "ready" if self.ready else "starting", "checks": self.results}
+
+
+readiness = Readiness(WARMUP_CHECKS)
@@ -1,6 +1,7 @@
 # src/users/crud.py
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import Any, Dict, Iterable, List, Optional
 import logging
 from .models import User
 
@@ -9,33 +10,107 @@ logger = logging.getLogger(__name__)
 def get_user_by_google_id(db: Session, google_id: str) -> Optional[User]:
     return db.query(User).filter(User.google_id == google_id).first()
 
-def upsert_user_token(db: Session, *, google_id: str, email: str, full_name: Optional[str], refresh_token: str) -> User:
-    user = get_user_by_google_id(db, google_id)
-    if user:
-        logger.info(f"Updating refresh token for user: {email}")
-        user.refresh_token = refresh_token
-        user.email = email
-        if full_name:
-            user.full_name = full_name
+# Строк в одном INSERT при массовой загрузке: держит размер запроса и число параметров в разумных пределах
+BULK_UPSERT_BATCH_SIZE = 500
+
+_USER_COLUMNS = ("google_id", "email", "full_name", "refresh_token")
+
+def _dialect_insert(db: Session):
+    """INSERT с ON CONFLICT для диалекта сессии: PostgreSQL в проде, SQLite в тестах."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
     else:
-        logger.info(f"Creating new user: {email}")
-        user = User(
-            google_id=google_id,
-            email=email,
-            full_name=full_name,
-            refresh_token=refresh_token
-        )
-        db.add(user)
-    
+        raise NotImplementedError(f"Upsert is not supported for dialect '{dialect}'")
+    return insert
+
+def _upsert_statement(db: Session, rows: List[Dict[str, Any]]):
+    """
+    INSERT ... ON CONFLICT (google_id) DO UPDATE для строк rows. Пустые (NULL или "")
+    full_name и refresh_token не затирают сохраненные значения; updated_at выставляется
+    явно - onupdate колонки в ON CONFLICT не срабатывает.
+    """
+    stmt = _dialect_insert(db)(User).values(rows)
+    excluded = stmt.excluded
+    return stmt.on_conflict_do_update(
+        index_elements=[User.google_id],
+        set_={
+            "email": excluded.email,
+            "full_name": func.coalesce(func.nullif(excluded.full_name, ""), User.full_name),
+            "refresh_token": func.coalesce(func.nullif(excluded.refresh_token, ""), User.refresh_token),
+            "updated_at": func.now(),
+        },
+    )
+
+def upsert_user_token(db: Session, *, google_id: str, email: str, full_name: Optional[str], refresh_token: str) -> User:
+    """
+    Создает пользователя или обновляет его токен одним запросом
+    (INSERT ... ON CONFLICT DO UPDATE ... RETURNING) и коммитит.
+
+    Returns:
+        Объект User с данными из RETURNING, отсоединенный от сессии: после
+        commit он не перечитывается из БД.
+    """
+    row = {"google_id": google_id, "email": email, "full_name": full_name, "refresh_token": refresh_token}
+    try:
+        user = db.scalars(
+            _upsert_statement(db, [row]).returning(User),
+            execution_options={"populate_existing": True},
+        ).one()
+        db.expunge(user)
+        db.commit()
+    except Exception as e:
+        logger.error("Database upsert failed for user %s: %s", email, e, exc_info=True)
+        db.rollback()
+        raise
+    logger.info("Stored refresh token for user: %s", email)
+    return user
+
+def bulk_upsert_users(db: Session, users: Iterable[Dict[str, Any]], batch_size: int = BULK_UPSERT_BATCH_SIZE) -> int:
+    """
+    Массовая загрузка пользователей (миграции, импорт): по одному
+    INSERT ... ON CONFLICT DO UPDATE и commit на пачку из batch_size строк.
+    Словари - с ключами google_id, email и необязательными full_name, refresh_token.
+    Внутри пачки повтор google_id схлопывается в последнюю запись: PostgreSQL
+    не дает обновить одну строку дважды в одном запросе.
+
+    Returns:
+        Количество записанных строк.
+    """
+    written = 0
+    batch: Dict[str, Dict[str, Any]] = {}
+    for user in users:
+        batch[user["google_id"]] = {column: user.get(column) for column in _USER_COLUMNS}
+        if len(batch) >= batch_size:
+            written += _write_batch(db, list(batch.values()))
+            batch = {}
+    if batch:
+        written += _write_batch(db, list(batch.values()))
+    return written
+
+def _write_batch(db: Session, rows: List[Dict[str, Any]]) -> int:
     try:
+        db.execute(_upsert_statement(db, rows))
         db.commit()
-        db.refresh(user)
-        return user
     except Exception as e:
-        logger.error(f"Database commit failed during upsert for user {email}: {e}", exc_info=True)
+        logger.error("Bulk upsert of %d users failed: %s", len(rows), e, exc_info=True)
         db.rollback()
         raise
+    return len(rows)
 
 def get_refresh_token(db: Session, google_id: str) -> Optional[str]:
-    user = get_user_by_google_id(db, google_id)
-    return user.refresh_token if user else None
\ No newline at end of file
+    return db.scalar(select(User.refresh_token).where(User.google_id == google_id))
+
+def clear_refresh_token(db: Session, google_id: str, refresh_token: str) -> bool:
+    """Удаляет отозванный refresh token, если пользователь не успел войти заново с новым."""
+    updated = (
+        db.query(User)
+        .filter(User.google_id == google_id, User.refresh_token == refresh_token)
+        .update({User.refresh_token: None}, synchronize_session=False)
+    )
+    db.commit()
+    if updated:
+        logger.info("Cleared revoked refresh token for user %s", google_id)
+    return bool(updated)
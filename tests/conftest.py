@@ -21,6 +21,7 @@ from src.core.dependencies import get_db
 # Это гарантирует, что Base.metadata знает о всех таблицах
 # перед тем, как мы вызовем Base.metadata.create_all().
 from src.users.models import User # <-- Это самое важное
+from src.calendar.models import PendingMutation
 
 # --- Настройка тестовой базы данных ---
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+from pytest_mock import MockerFixture
+
+from src.core.admission import AdmissionController, AdmissionRejected
+
+
+def test_admission_shares_freed_slots_round_robin_between_users():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, per_user_limit=1, max_wait_seconds=5, max_queued_per_user=2)
+        order = []
+
+        async def request(user, name):
+            async with controller.slot(user):
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        await controller.acquire("heavy")
+        # Тяжелый пользователь успел поставить в очередь два запроса раньше легкого
+        tasks = [asyncio.create_task(request("heavy", "heavy-2")), asyncio.create_task(request("heavy", "heavy-3"))]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(request("light", "light-1")))
+        await asyncio.sleep(0)
+
+        # Очередь тяжелого пользователя полна - следующий запрос отклоняется сразу
+        with pytest.raises(AdmissionRejected) as exc_info:
+            await controller.acquire("heavy")
+        assert exc_info.value.reason == "queue_full"
+
+        controller.release("heavy")
+        await asyncio.gather(*tasks)
+        assert order == ["heavy-2", "light-1", "heavy-3"]
+        assert (controller.in_flight, controller.queued) == (0, 0)
+
+    asyncio.run(scenario())
+
+
+def test_admission_sheds_requests_that_waited_too_long():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, per_user_limit=1, max_wait_seconds=0.05, max_queued_per_user=4)
+        await controller.acquire("a")
+        with pytest.raises(AdmissionRejected) as exc_info:
+            await controller.acquire("b")
+        assert exc_info.value.reason == "wait_timeout"
+        assert controller.queued == 0
+        # Отклоненный запрос не занял слот
+        controller.release("a")
+        await asyncio.wait_for(controller.acquire("b"), timeout=1)
+        assert controller.in_flight == 1
+
+    asyncio.run(scenario())
+
+
+def test_admitted_user_releases_db_connection_before_waiting(mocker: MockerFixture):
+    from src.core import dependencies
+    from src.users.models import User
+
+    db = mocker.MagicMock()
+    events = []
+    db.close.side_effect = lambda: events.append("close")
+
+    async def acquire(google_id):
+        events.append("acquire")
+
+    mocker.patch.object(dependencies.admission, "acquire", side_effect=acquire)
+    mocker.patch.object(dependencies.admission, "release")
+
+    async def scenario():
+        user = User(google_id="g", email="u@example.com")
+        admitted = dependencies.get_admitted_user(user, db)
+        assert await admitted.__anext__() is user
+        await admitted.aclose()
+
+    asyncio.run(scenario())
+    # Соединение возвращено в пул до ожидания в очереди admission control
+    assert events == ["close", "acquire"]
+    dependencies.admission.release.assert_called_once_with("g")
@@ -0,0 +1,106 @@
+import asyncio
+import datetime
+import threading
+
+from pytest_mock import MockerFixture
+
+from src.auth.schemas import TokenExchangeRequest
+from src.auth.service import AuthService
+from src.calendar.prefetch import PrefetchPool, prefetch_window
+
+TEST_USER_GOOGLE_ID = "prefetch-google-id"
+TEST_USER_EMAIL = "prefetch@example.com"
+
+
+def _mock_google_login(mocker: MockerFixture):
+    mocker.patch.object(
+        AuthService, "verify_google_id_token",
+        mocker.AsyncMock(return_value={"sub": TEST_USER_GOOGLE_ID, "email": TEST_USER_EMAIL, "name": "Test"}),
+    )
+    credentials = mocker.MagicMock(token="access-token", refresh_token="refresh-token")
+    mocker.patch("src.auth.service.google_oauth_client.exchange_code", mocker.AsyncMock(return_value=credentials))
+    mocker.patch("src.auth.service.users_crud.upsert_user_token")
+    return credentials
+
+
+def test_exchange_auth_code_schedules_prefetch(mocker: MockerFixture):
+    credentials = _mock_google_login(mocker)
+    schedule = mocker.patch("src.auth.service.prefetch_pool.schedule")
+
+    payload = TokenExchangeRequest(id_token="id-token", auth_code="auth-code")
+    user_email = asyncio.run(AuthService(mocker.MagicMock()).exchange_auth_code(payload))
+
+    assert user_email == TEST_USER_EMAIL
+    schedule.assert_called_once_with(credentials, TEST_USER_EMAIL)
+
+
+def test_prefetch_pool_warms_window_and_can_be_cancelled(mocker: MockerFixture):
+    started, release = threading.Event(), threading.Event()
+    fetched = []
+
+    def get_events(start_date, end_date):
+        started.set()
+        release.wait(timeout=5)
+        fetched.append((start_date, end_date))
+        return []
+
+    fake_service = mocker.MagicMock()
+    fake_service.get_events.side_effect = get_events
+    pool = PrefetchPool(max_workers=1, weeks=2, service_factory=lambda creds, email: fake_service)
+    today = datetime.date(2024, 5, 8)  # среда
+
+    first = pool.schedule(mocker.MagicMock(), "busy@example.com", today=today)
+    started.wait(timeout=5)
+    # Единственный воркер занят - задача второго пользователя ждет в очереди и отменяется
+    queued = pool.schedule(mocker.MagicMock(), "other@example.com", today=today)
+    assert pool.cancel("other@example.com") is True
+    release.set()
+    first.result(timeout=5)
+    pool.shutdown()
+
+    assert queued.cancelled()
+    assert fetched == [prefetch_window(today, 2)]
+    assert prefetch_window(today, 2) == (datetime.date(2024, 5, 6), datetime.date(2024, 5, 19))
+
+
+def test_exchange_code_uses_token_endpoint_and_maps_invalid_grant():
+    import httpx
+    import pytest
+    from src.auth.google_client import GoogleOAuthClient, TokenExchangeError
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        form = dict(httpx.QueryParams(request.content.decode()))
+        if form["code"] == "used-code":
+            return httpx.Response(400, json={"error": "invalid_grant", "error_description": "Bad Request"})
+        assert form["grant_type"] == "authorization_code" and form["redirect_uri"] == "postmessage"
+        return httpx.Response(200, json={"access_token": "at", "refresh_token": "rt", "expires_in": 3599})
+
+    client = GoogleOAuthClient(transport=httpx.MockTransport(handler))
+
+    async def run():
+        creds = await client.exchange_code("fresh-code")
+        with pytest.raises(TokenExchangeError, match="invalid_grant"):
+            await client.exchange_code("used-code")
+        await client.aclose()
+        return creds
+
+    creds = asyncio.run(run())
+    assert creds.token == "at" and creds.refresh_token == "rt" and creds.valid
+
+
+def test_login_gate_sheds_logins_beyond_queue_timeout():
+    import pytest
+    from fastapi import HTTPException
+    from src.auth.service import LoginGate
+
+    gate = LoginGate(max_concurrency=1, queue_timeout=0.05)
+
+    async def run():
+        async with gate.slot():
+            with pytest.raises(HTTPException) as exc_info:
+                async with gate.slot():
+                    pass
+        return exc_info.value
+
+    error = asyncio.run(run())
+    assert error.status_code == 503 and "Retry-After" in error.headers
@@ -0,0 +1,68 @@
+import datetime
+
+import pytest
+from google.auth.exceptions import RefreshError
+from google.oauth2.credentials import Credentials
+from pytest_mock import MockerFixture
+
+from src.auth.tokens import TokenRefreshManager, TokenRevokedError
+from src.core.metrics import metrics
+
+
+def _utcnow() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def _fake_refresh(self, request):
+    if self.refresh_token.startswith("revoked"):
+        raise RefreshError("invalid_grant: Token has been expired or revoked.", {"error": "invalid_grant"})
+    self.token = f"access-for-{self.refresh_token}"
+    self.expiry = _utcnow() + datetime.timedelta(hours=1)
+
+
+def _make_manager(mocker: MockerFixture, rate: float = 100.0, on_revoked=None) -> TokenRefreshManager:
+    mocker.patch.object(Credentials, "refresh", _fake_refresh)
+    return TokenRefreshManager(
+        refresh_ahead_seconds=300, active_window_seconds=3600, max_refreshes_per_second=rate,
+        request_factory=mocker.MagicMock, on_revoked=on_revoked or mocker.MagicMock(),
+    )
+
+
+def test_background_refresh_keeps_request_path_free_of_refreshes(mocker: MockerFixture):
+    manager = _make_manager(mocker)
+    creds = manager.get_credentials("user-1", "rt-1")
+    assert not creds.valid
+
+    assert manager.refresh_due() == 1
+    fresh = manager.get_credentials("user-1", "rt-1")
+    assert fresh.valid and fresh.token == "access-for-rt-1"
+
+    before = metrics.get_counter("token_refresh_on_request_total")
+    manager.ensure_fresh("user-1", fresh)
+    assert metrics.get_counter("token_refresh_on_request_total") == before
+    # Токен действует еще час - повторно не обновляем
+    assert manager.refresh_due() == 0
+
+
+def test_revoked_refresh_token_fails_fast(mocker: MockerFixture):
+    on_revoked = mocker.MagicMock()
+    manager = _make_manager(mocker, on_revoked=on_revoked)
+    manager.get_credentials("user-2", "revoked-rt")
+
+    assert manager.refresh_due() == 0
+    on_revoked.assert_called_once_with("user-2", "revoked-rt")
+    assert manager.is_revoked("user-2", "revoked-rt")
+    with pytest.raises(TokenRevokedError):
+        manager.get_credentials("user-2", "revoked-rt")
+
+    # Новый вход с новым refresh token снимает пометку
+    assert not manager.is_revoked("user-2", "rt-new")
+    manager.get_credentials("user-2", "rt-new")
+
+
+def test_background_refreshes_are_rate_limited(mocker: MockerFixture):
+    manager = _make_manager(mocker, rate=1.0)
+    for i in range(3):
+        manager.get_credentials(f"user-{i}", f"rt-{i}")
+
+    assert manager.refresh_due() == 1
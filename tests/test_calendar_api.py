@@ -49,4 +49,278 @@ def test_get_events_range_success(
     assert response.json()[0]['summary'] == "Test Event 1"
 
     # --- CLEANUP (Очистка) ---
-    client.app.dependency_overrides.clear()
\ No newline at end of file
+    client.app.dependency_overrides.clear()
+
+def test_get_events_agenda_returns_page_and_cursor(client: TestClient, mocker: MockerFixture):
+    from src.core.dependencies import get_calendar_service
+
+    fake_service = mocker.MagicMock(user_email=TEST_USER_EMAIL)
+    fake_service.get_events_page.return_value = ([{"id": "e1", "summary": "Standup", "startTime": "2024-06-03T09:00:00Z",
+                                                   "endTime": "2024-06-03T09:15:00Z", "isAllDay": False}], "next-cursor")
+    client.app.dependency_overrides[get_calendar_service] = lambda: fake_service
+
+    response = client.get("/calendar/events/agenda?startDate=2024-06-01&endDate=2024-12-31&limit=1")
+
+    assert response.status_code == 200
+    assert response.json()["nextCursor"] == "next-cursor"
+    assert response.json()["events"][0]["id"] == "e1"
+    fake_service.get_events_page.assert_called_once()
+
+    fake_service.get_events_page.side_effect = ValueError("Invalid cursor.")
+    assert client.get("/calendar/events/agenda?cursor=garbage").status_code == 400
+
+    client.app.dependency_overrides.clear()
+
+
+def test_get_events_range_negotiates_columnar_msgpack(client: TestClient, mocker: MockerFixture):
+    from src.core.dependencies import get_calendar_service
+    from src.calendar.encoding import decode_events_columnar
+
+    rule = "RRULE:FREQ=WEEKLY;BYDAY=MO"
+    events = [
+        {"id": f"standup_{i}", "summary": "Standup", "startTime": f"2024-06-{3 + 7 * i:02d}T09:00:00Z",
+         "endTime": f"2024-06-{3 + 7 * i:02d}T09:15:00Z", "isAllDay": False,
+         "recurringEventId": "standup", "recurrenceRule": rule}
+        for i in range(3)
+    ] + [{"id": "lunch", "summary": "Lunch", "startTime": "2024-06-04", "endTime": "2024-06-05", "isAllDay": True}]
+    fake_service = mocker.MagicMock(user_email=TEST_USER_EMAIL)
+    fake_service.get_events.return_value = events
+    client.app.dependency_overrides[get_calendar_service] = lambda: fake_service
+
+    url = "/calendar/events/range?startDate=2024-06-01&endDate=2024-06-30"
+    json_response = client.get(url)
+    msgpack_response = client.get(url, headers={"Accept": "application/x-msgpack"})
+
+    assert msgpack_response.status_code == 200
+    assert msgpack_response.headers["content-type"] == "application/x-msgpack"
+    assert "Accept" in msgpack_response.headers["vary"]
+    # Те же объекты и поля, что и в JSON
+    assert decode_events_columnar(msgpack_response.content) == json_response.json()
+    assert len(msgpack_response.content) < len(json_response.content)
+
+    # q=0 в любой записи - отказ от MessagePack
+    for accept in ("application/x-msgpack;q=0", "application/json, application/x-msgpack; q=0.0",
+                   "application/x-msgpack;q=0.000"):
+        response = client.get(url, headers={"Accept": accept})
+        assert response.headers["content-type"] == "application/json"
+    assert client.get(url, headers={"Accept": "application/x-msgpack;q=0.5"}).headers["content-type"] == "application/x-msgpack"
+
+    client.app.dependency_overrides.clear()
+
+
+def test_create_event_with_conflicts_returns_409(client: TestClient, mocker: MockerFixture):
+    from src.core.dependencies import get_calendar_service
+    from src.calendar.service import EventConflictError
+
+    fake_service = mocker.MagicMock(user_email=TEST_USER_EMAIL)
+    fake_service.create_event.side_effect = EventConflictError([
+        {"id": "standup", "summary": "Standup", "startTime": "2024-06-03T09:00:00Z", "endTime": "2024-06-03T09:15:00Z", "isAllDay": False},
+    ])
+    client.app.dependency_overrides[get_calendar_service] = lambda: fake_service
+
+    response = client.post("/calendar/events?checkConflicts=true", json={
+        "summary": "Sync", "startTime": "2024-06-03T09:00:00Z", "endTime": "2024-06-03T10:00:00Z", "isAllDay": False,
+    })
+
+    assert response.status_code == 409
+    assert [e["id"] for e in response.json()["detail"]["conflicts"]] == ["standup"]
+    assert fake_service.create_event.call_args.kwargs["check_conflicts"] is True
+
+    client.app.dependency_overrides.clear()
+
+
+def test_create_event_with_idempotency_key_inserts_once(client: TestClient, mocker: MockerFixture):
+    import threading
+    import time
+    from src.core.dependencies import get_calendar_service
+    from src.core.idempotency import InMemoryIdempotencyStore, idempotency
+
+    mocker.patch.object(idempotency, "store", InMemoryIdempotencyStore(ttl_seconds=60))
+    started, release = threading.Event(), threading.Event()
+
+    def slow_insert(event_data, check_conflicts=False):
+        started.set()
+        release.wait(timeout=5)
+        return {"id": "created-1"}
+
+    fake_service = mocker.MagicMock(user_email=TEST_USER_EMAIL)
+    fake_service.create_event.side_effect = slow_insert
+    client.app.dependency_overrides[get_calendar_service] = lambda: fake_service
+    body = {"summary": "Sync", "startTime": "2024-06-03T09:00:00Z", "endTime": "2024-06-03T10:00:00Z", "isAllDay": False}
+    headers = {"Idempotency-Key": "retry-1"}
+
+    # Повтор приходит, пока первый запрос еще выполняется, - и ждет его
+    responses = []
+    first = threading.Thread(target=lambda: responses.append(client.post("/calendar/events", json=body, headers=headers)))
+    first.start()
+    started.wait(timeout=5)
+    second = threading.Thread(target=lambda: responses.append(client.post("/calendar/events", json=body, headers=headers)))
+    second.start()
+    # Отпускаем первый запрос, только когда повтор уже ждет его результата
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline and sum(e.waiters for e in list(idempotency.store._entries.values())) != 1:
+        time.sleep(0.01)
+    assert sum(e.waiters for e in idempotency.store._entries.values()) == 1
+    release.set()
+    first.join(timeout=5)
+    second.join(timeout=5)
+
+    assert [r.status_code for r in responses] == [201, 201]
+    assert all(r.json()["eventId"] == "created-1" for r in responses)
+    assert fake_service.create_event.call_count == 1
+    assert sorted(r.headers.get("Idempotent-Replayed", "") for r in responses) == ["", "true"]
+
+    # Тот же ключ с другим телом - ошибка клиента
+    reused = client.post("/calendar/events", json={**body, "summary": "Other"}, headers=headers)
+    assert reused.status_code == 422
+    assert fake_service.create_event.call_count == 1
+
+    client.app.dependency_overrides.clear()
+
+
+def test_get_events_range_compact_series_round_trip(client: TestClient, mocker: MockerFixture):
+    from src.core.dependencies import get_calendar_service
+    from src.calendar.encoding import expand_series
+
+    rule = "RRULE:FREQ=WEEKLY;BYDAY=MO"
+    events = [
+        {"id": f"standup_{i}", "summary": "Standup", "description": "Daily sync, notes in the doc",
+         "location": "Room 4", "startTime": f"2024-06-{3 + 7 * i:02d}T09:00:00Z",
+         "endTime": f"2024-06-{3 + 7 * i:02d}T09:15:00Z", "isAllDay": False,
+         "recurringEventId": "standup", "originalStartTime": f"2024-06-{3 + 7 * i:02d}T09:00:00Z", "recurrenceRule": rule}
+        for i in range(4)
+    ]
+    # Перенесенный экземпляр с другим названием и без места
+    events[2] = {**events[2], "summary": "Standup (moved)", "startTime": "2024-06-18T11:00:00Z", "endTime": "2024-06-18T11:15:00Z"}
+    del events[2]["location"]
+    events.append({"id": "lunch", "summary": "Lunch", "startTime": "2024-06-04", "endTime": "2024-06-05", "isAllDay": True})
+    fake_service = mocker.MagicMock(user_email=TEST_USER_EMAIL)
+    fake_service.get_events.return_value = events
+    client.app.dependency_overrides[get_calendar_service] = lambda: fake_service
+
+    url = "/calendar/events/range?startDate=2024-06-01&endDate=2024-06-30"
+    full = client.get(url)
+    compact = client.get(url + "&compact=true")
+
+    assert compact.status_code == 200
+    payload = compact.json()
+    assert payload["series"] == [{"id": "standup", "summary": "Standup", "description": "Daily sync, notes in the doc",
+                                  "location": "Room 4", "isAllDay": False, "recurrenceRule": rule}]
+    assert payload["events"][0] == {"series": 0, "id": "_0", "startTime": "2024-06-03T09:00:00Z",
+                                    "endTime": "2024-06-03T09:15:00Z"}
+    assert payload["events"][2]["location"] is None
+    # Восстановление без потерь: те же объекты, что и в обычном ответе
+    assert expand_series(payload) == full.json()
+    assert len(compact.content) < len(full.content)
+
+    client.app.dependency_overrides.clear()
+
+
+def test_async_mutations_are_queued_and_flushed_in_order(client: TestClient, mocker: MockerFixture):
+    import httplib2
+    from googleapiclient.errors import HttpError
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from src.core.database import Base
+    from src.core.dependencies import get_calendar_service, get_db
+    from src.calendar.mutations import MutationQueue, mutation_event_id, mutation_queue
+
+    # Очередь пишет из своих потоков: нужна одна общая in-memory база на все соединения
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with SessionLocal() as db:
+        db.add(User(google_id=TEST_USER_GOOGLE_ID, email=TEST_USER_EMAIL, refresh_token=TEST_REFRESH_TOKEN))
+        db.commit()
+
+    def override_get_db():
+        with SessionLocal() as db:
+            yield db
+
+    fake_service = mocker.MagicMock(user_email=TEST_USER_EMAIL, google_id=TEST_USER_GOOGLE_ID)
+    client.app.dependency_overrides[get_db] = override_get_db
+    client.app.dependency_overrides[get_calendar_service] = lambda: fake_service
+    client.app.dependency_overrides[get_current_user] = lambda: User(google_id=TEST_USER_GOOGLE_ID, email=TEST_USER_EMAIL)
+    mocker.patch.object(mutation_queue, "_wake")
+
+    # Создание и правка по временному ID - оба запроса не ждут Google
+    created = client.post("/calendar/events?async=true", json={
+        "summary": "Sync", "startTime": "2024-06-03T09:00:00Z", "endTime": "2024-06-03T10:00:00Z", "isAllDay": False,
+    })
+    assert created.status_code == 202
+    provisional_id = created.json()["eventId"]
+    updated = client.patch(f"/calendar/events/{provisional_id}?update_mode=single_instance&async=true",
+                           json={"summary": "Sync (moved)"})
+    assert updated.status_code == 202
+    assert client.patch("/calendar/events/mut-unknown?update_mode=single_instance&async=true",
+                        json={"summary": "x"}).status_code == 404
+    fake_service.create_event.assert_not_called()
+
+    calls = []
+
+    def apply_mutations(mutations):
+        calls.append([(m["operation"], m["eventId"]) for m in mutations])
+        if len(calls) == 1:
+            # Вставка дошла до Google, но ответ потерян
+            return {m["id"]: HttpError(httplib2.Response({'status': 503}), b'backend error') for m in mutations}
+        if len(calls) == 2:
+            return {m["id"]: HttpError(httplib2.Response({'status': 409}), b'duplicate') for m in mutations}
+        return {m["id"]: {"id": m["eventId"]} for m in mutations}
+
+    google = mocker.MagicMock()
+    google.apply_mutations.side_effect = apply_mutations
+    queue = MutationQueue(batch_size=10, workers=2, interval_seconds=0.01, max_attempts=3,
+                          retry_base_seconds=0, retry_max_seconds=0, lease_seconds=60,
+                          service_factory=lambda google_id: google, session_factory=SessionLocal)
+    try:
+        # Правка ждет создания: сбой Google повторяется с тем же ID события (409 - уже создано),
+        # затем правка идет с настоящим ID
+        assert [queue.flush_once() for _ in range(4)] == [1, 1, 1, 0]
+    finally:
+        queue.shutdown()
+    event_id = mutation_event_id(provisional_id)
+    assert calls == [[("create", event_id)], [("create", event_id)], [("update", event_id)]]
+
+    status = client.get(f"/calendar/mutations/{provisional_id}").json()
+    assert status == {"mutationId": provisional_id, "operation": "create", "status": "done",
+                      "eventId": event_id, "attempts": 2, "error": None}
+    assert client.get(f"/calendar/mutations/{updated.json()['mutationId']}").json()["status"] == "done"
+
+    # Синхронная правка не обгоняет изменения события, ждущие в очереди
+    assert client.delete(f"/calendar/events/{event_id}?async=true").status_code == 202
+    response = client.patch(f"/calendar/events/{event_id}?update_mode=single_instance", json={"summary": "x"})
+    assert response.status_code == 409
+    fake_service.update_event.assert_not_called()
+
+    client.app.dependency_overrides.clear()
+
+
+def test_mutation_claim_skips_events_waiting_for_retry():
+    import datetime
+    from sqlalchemy import create_engine, update
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+    from src.core.database import Base
+    from src.calendar.models import PendingMutation
+    from src.calendar.mutations import MutationQueue
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    queue = MutationQueue(batch_size=2, workers=1, interval_seconds=0.01, max_attempts=3,
+                          retry_base_seconds=0, retry_max_seconds=0, lease_seconds=60,
+                          service_factory=lambda google_id: None, session_factory=SessionLocal)
+    with SessionLocal() as db:
+        busy = [queue.enqueue(db, "user-a", "update", "busy", {"summary": str(i)}, mode="single_instance").seq
+                for i in range(10)]
+        other = queue.enqueue(db, "user-a", "update", "other", {"summary": "x"}, mode="single_instance").seq
+        elsewhere = queue.enqueue(db, "user-b", "delete", "busy", {}, mode="default").seq
+        # Голова очереди события "busy" ждет повтора: остальные его изменения не готовы, но чужие - готовы
+        db.execute(update(PendingMutation).where(PendingMutation.seq == busy[0]).values(
+            next_attempt_at=datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=1)))
+        db.commit()
+
+        assert [m["seq"] for m in queue._claim(db)] == [other, elsewhere]
+        assert queue._claim(db) == []
+    queue.shutdown()
@@ -0,0 +1,130 @@
+import datetime
+import time
+
+from fastapi.testclient import TestClient
+from pytest_mock import MockerFixture
+
+from src.calendar.channels import WatchChannelManager
+from src.calendar.service import range_cache
+
+WEBHOOK_URL = "https://backend.example.com/calendar/notifications"
+TEST_USER_GOOGLE_ID = "watch-google-id"
+TEST_USER_EMAIL = "watch@example.com"
+
+
+class FakeGoogleWatchHub:
+    """
+    Локальная замена Google для events.watch: хранит зарегистрированные каналы
+    и отправляет уведомления на наш webhook так же, как это делает Google.
+    """
+
+    def __init__(self):
+        self.channels = {}
+        self.stopped = []
+
+    def watch(self, channel_id, address, token, ttl_seconds):
+        resource_id = f"resource-{channel_id[:8]}"
+        expiration_ms = int((time.time() + ttl_seconds) * 1000)
+        self.channels[channel_id] = {"address": address, "token": token, "resourceId": resource_id}
+        return {"id": channel_id, "resourceId": resource_id, "expiration": str(expiration_ms)}
+
+    def stop(self, channel_id, resource_id):
+        self.channels.pop(channel_id, None)
+        self.stopped.append(channel_id)
+
+    def notify(self, client: TestClient, channel_id: str, state: str = "exists", token=None):
+        channel = self.channels[channel_id]
+        return client.post(
+            "/calendar/notifications",
+            headers={
+                "X-Goog-Channel-ID": channel_id,
+                "X-Goog-Channel-Token": token if token is not None else channel["token"],
+                "X-Goog-Resource-ID": channel["resourceId"],
+                "X-Goog-Resource-State": state,
+                "X-Goog-Message-Number": "1",
+            },
+        )
+
+
+def _make_manager(mocker: MockerFixture, hub: FakeGoogleWatchHub) -> WatchChannelManager:
+    fake_service = mocker.MagicMock(user_email=TEST_USER_EMAIL)
+    fake_service.watch_events.side_effect = hub.watch
+    fake_service.stop_channel.side_effect = hub.stop
+    return WatchChannelManager(
+        webhook_url=WEBHOOK_URL, ttl_seconds=3600, renew_before_seconds=600, active_window_seconds=3600,
+        service_factory=lambda google_id: fake_service,
+    )
+
+
+def test_notification_drops_cached_windows(client: TestClient, mocker: MockerFixture):
+    hub = FakeGoogleWatchHub()
+    manager = _make_manager(mocker, hub)
+    manager.track_user(TEST_USER_GOOGLE_ID, TEST_USER_EMAIL)
+    manager.sync_channels()
+    channel = manager.get_channel(TEST_USER_GOOGLE_ID)
+    assert channel is not None and channel.channel_id in hub.channels
+    assert hub.channels[channel.channel_id]["address"] == WEBHOOK_URL
+
+    start, end = datetime.date(2024, 3, 4), datetime.date(2024, 3, 10)
+    range_cache.put(TEST_USER_EMAIL, start, end, [{"id": "e1"}])
+
+    # Первое уведомление 'sync' - подтверждение регистрации, кэш не трогаем
+    assert hub.notify(client, channel.channel_id, state="sync").status_code == 204
+    assert range_cache.get(TEST_USER_EMAIL, start, end) == [{"id": "e1"}]
+
+    assert hub.notify(client, channel.channel_id, state="exists").status_code == 204
+    assert range_cache.get(TEST_USER_EMAIL, start, end) is None
+
+
+def test_notification_with_forged_token_is_rejected(client: TestClient, mocker: MockerFixture):
+    hub = FakeGoogleWatchHub()
+    manager = _make_manager(mocker, hub)
+    manager.track_user(TEST_USER_GOOGLE_ID, TEST_USER_EMAIL)
+    manager.sync_channels()
+    channel = manager.get_channel(TEST_USER_GOOGLE_ID)
+
+    response = hub.notify(client, channel.channel_id, token="forged.token")
+    assert response.status_code == 403
+    # Не-ASCII в токене (заголовок декодируется как latin-1) - тоже 403, а не 500
+    response = hub.notify(client, channel.channel_id, token="é.x".encode("utf-8"))
+    assert response.status_code == 403
+
+
+def test_expiring_channel_is_renewed_and_old_one_stopped(mocker: MockerFixture):
+    hub = FakeGoogleWatchHub()
+    manager = _make_manager(mocker, hub)
+    manager.track_user(TEST_USER_GOOGLE_ID, TEST_USER_EMAIL)
+    manager.sync_channels()
+    old_channel = manager.get_channel(TEST_USER_GOOGLE_ID)
+
+    # Свежий канал не перерегистрируется
+    manager.sync_channels()
+    assert manager.get_channel(TEST_USER_GOOGLE_ID) is old_channel
+
+    old_channel.expiration = time.time() + 60
+    manager.sync_channels()
+    new_channel = manager.get_channel(TEST_USER_GOOGLE_ID)
+    assert new_channel.channel_id != old_channel.channel_id
+    assert hub.stopped == [old_channel.channel_id]
+    assert list(hub.channels) == [new_channel.channel_id]
+
+
+def test_channel_of_inactive_user_is_stopped_and_not_renewed(mocker: MockerFixture):
+    hub = FakeGoogleWatchHub()
+    manager = _make_manager(mocker, hub)
+    manager.track_user(TEST_USER_GOOGLE_ID, TEST_USER_EMAIL)
+    manager.sync_channels()
+    channel = manager.get_channel(TEST_USER_GOOGLE_ID)
+
+    # Пользователь не обращался к календарю дольше окна активности
+    monotonic = time.monotonic()
+    mocker.patch("src.calendar.channels.time.monotonic", return_value=monotonic + 3601)
+    channel.expiration = time.time() + 60
+    manager.sync_channels()
+    assert manager.get_channel(TEST_USER_GOOGLE_ID) is None
+    assert hub.stopped == [channel.channel_id] and hub.channels == {}
+
+    # Вернувшийся пользователь снова получает канал
+    manager.track_user(TEST_USER_GOOGLE_ID, TEST_USER_EMAIL)
+    manager.sync_channels()
+    assert list(hub.channels) == [manager.get_channel(TEST_USER_GOOGLE_ID).channel_id]
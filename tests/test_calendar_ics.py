@@ -0,0 +1,191 @@
+import io
+import time
+
+import httplib2
+from fastapi.testclient import TestClient
+from googleapiclient.errors import HttpError
+from pytest_mock import MockerFixture
+
+from src.calendar.ics import IcsReader, IcsSkipped, to_create_request
+from src.calendar.imports import IcsImporter, import_event_id
+
+TEST_USER_GOOGLE_ID = "ics-google-id"
+
+SAMPLE_ICS = "\r\n".join([
+    "BEGIN:VCALENDAR",
+    "VERSION:2.0",
+    "X-WR-TIMEZONE:Europe/Berlin",
+    "BEGIN:VTIMEZONE",
+    "TZID:Europe/Berlin",
+    "BEGIN:STANDARD",
+    "DTSTART:19701025T030000",
+    "END:STANDARD",
+    "END:VTIMEZONE",
+    "BEGIN:VEVENT",
+    "UID:standup@example.com",
+    "SUMMARY:Standup\\, daily",
+    "DESCRIPTION:Notes in the doc\\nRoom 4 is booked until the end of the q",
+    " uarter",
+    "DTSTART;TZID=Europe/Berlin:20240603T090000",
+    "DURATION:PT15M",
+    "RRULE:FREQ=WEEKLY;BYDAY=MO,WE;COUNT=10",
+    "EXDATE;TZID=Europe/Berlin:20240605T090000",
+    "BEGIN:VALARM",
+    "TRIGGER:-PT10M",
+    "DESCRIPTION:Reminder",
+    "END:VALARM",
+    "END:VEVENT",
+    "BEGIN:VEVENT",
+    "UID:standup@example.com",
+    "RECURRENCE-ID;TZID=Europe/Berlin:20240610T090000",
+    "SUMMARY:Standup (moved)",
+    "DTSTART;TZID=Europe/Berlin:20240610T100000",
+    "END:VEVENT",
+    "BEGIN:VEVENT",
+    "UID:holiday@example.com",
+    "SUMMARY:Holiday",
+    "DTSTART;VALUE=DATE:20240704",
+    "END:VEVENT",
+    "BEGIN:VEVENT",
+    "UID:broken@example.com",
+    "SUMMARY:Broken",
+    "DTSTART:tomorrow",
+    "END:VEVENT",
+    "BEGIN:VEVENT",
+    "UID:call@example.com",
+    "DTSTART:20240603T120000Z",
+    "DTEND:20240603T123000Z",
+    "END:VEVENT",
+    "END:VCALENDAR",
+    "",
+])
+
+
+def test_ics_reader_maps_vevents_to_create_requests():
+    reader = IcsReader(io.StringIO(SAMPLE_ICS))
+    events = list(reader)
+
+    assert [event.uid for event in events] == ["standup@example.com", "standup@example.com", "holiday@example.com",
+                                               "broken@example.com", "call@example.com"]
+    assert reader.time_zone == "Europe/Berlin"
+
+    # Серия переносится правилами; продолжение строки склеено, текст разэкранирован, VALARM пропущен
+    series = to_create_request(events[0], reader.time_zone)
+    assert series.model_dump() == {
+        "summary": "Standup, daily",
+        "startTime": "2024-06-03T09:00:00+02:00",
+        "endTime": "2024-06-03T09:15:00+02:00",
+        "isAllDay": False,
+        "timeZoneId": "Europe/Berlin",
+        "description": "Notes in the doc\nRoom 4 is booked until the end of the quarter",
+        "location": None,
+        "recurrence": ["RRULE:FREQ=WEEKLY;BYDAY=MO,WE;COUNT=10", "EXDATE;TZID=Europe/Berlin:20240605T090000"],
+    }
+    try:
+        to_create_request(events[1], reader.time_zone)
+        assert False, "modified instance must be skipped"
+    except IcsSkipped:
+        pass
+
+    holiday = to_create_request(events[2], reader.time_zone)
+    assert (holiday.startTime, holiday.endTime, holiday.isAllDay, holiday.timeZoneId) == ("2024-07-04", "2024-07-05", True, None)
+
+    # Время в UTC: пояс события - пояс календаря, без SUMMARY - "(No title)"
+    call = to_create_request(events[4], reader.time_zone)
+    assert (call.summary, call.startTime, call.endTime, call.timeZoneId) == \
+        ("(No title)", "2024-06-03T12:00:00+00:00", "2024-06-03T12:30:00+00:00", "Europe/Berlin")
+
+
+def test_ics_import_batches_inserts_and_reports_progress(mocker: MockerFixture):
+    calls = []
+
+    def insert_events(events, event_ids):
+        calls.append(dict(events))
+        results, errors = {}, {}
+        for key, event_data in events.items():
+            if event_data.summary == "Holiday" and len(calls) == 1:
+                errors[key] = HttpError(httplib2.Response({'status': 503}), b'backend error')
+            elif event_ids.get(key) == import_event_id(TEST_USER_GOOGLE_ID, "call@example.com"):
+                errors[key] = HttpError(httplib2.Response({'status': 409}), b'duplicate')
+            else:
+                results[key] = {"id": event_ids[key]}
+        return results, errors
+
+    google = mocker.MagicMock()
+    google.insert_events.side_effect = insert_events
+    importer = IcsImporter(batch_size=2, writes_per_second=1000, max_attempts=3, retry_base_seconds=0,
+                           workers=1, max_errors=10, result_ttl_seconds=60,
+                           service_factory=lambda google_id: google)
+
+    job = importer.start(TEST_USER_GOOGLE_ID, io.BytesIO(SAMPLE_ICS.encode()))
+    deadline = time.monotonic() + 5
+    while job.status == "running" and time.monotonic() < deadline:
+        time.sleep(0.01)
+    importer.shutdown()
+
+    # Пачки по 2 события; упавшее с 503 повторяется отдельно
+    assert [[e.summary for e in batch.values()] for batch in calls] == \
+        [["Standup, daily", "Holiday"], ["Holiday"], ["(No title)"]]
+    snapshot = importer.get(TEST_USER_GOOGLE_ID, job.id).snapshot()
+    assert {k: snapshot[k] for k in ("status", "parsed", "imported", "duplicates", "skipped", "failed")} == \
+        {"status": "done", "parsed": 5, "imported": 2, "duplicates": 1, "skipped": 1, "failed": 1}
+    assert [(e["line"], e["uid"]) for e in snapshot["errors"]] == [(35, "broken@example.com")]
+    assert "Unsupported date-time" in snapshot["errors"][0]["error"]
+
+
+def test_ics_export_feed_sends_series_as_masters_and_answers_304_from_cache(client: TestClient, mocker: MockerFixture):
+    from src.calendar.export import ics_feeds
+    from src.calendar.service import SimpleCalendarEvent, invalidate_user_data
+    from src.core.dependencies import get_current_user
+    from src.users.models import User
+
+    google = mocker.MagicMock(user_email="feed@example.com")
+    google.get_export_events.return_value = (
+        [
+            SimpleCalendarEvent("standup", "Standup, daily", "2024-06-03T09:00:00+02:00", "2024-06-03T09:15:00+02:00",
+                                False, recurrence=["RRULE:FREQ=WEEKLY;BYDAY=MO"], time_zone="Europe/Berlin"),
+            SimpleCalendarEvent("standup_20240610T070000Z", "Standup (moved)", "2024-06-10T10:00:00+02:00",
+                                "2024-06-10T10:15:00+02:00", False, recurring_event_id="standup",
+                                original_start_time="2024-06-10T09:00:00+02:00",
+                                recurrence=["RRULE:FREQ=WEEKLY;BYDAY=MO"], time_zone="Europe/Berlin"),
+            SimpleCalendarEvent("holiday", "Holiday", "2024-07-04", "2024-07-05", True),
+        ],
+        {"standup": ["2024-06-17T09:00:00+02:00"]},
+        "2024-06-20T08:30:00.000Z",
+    )
+    mocker.patch.object(ics_feeds, "service_factory", lambda google_id: google)
+    mocker.patch.object(ics_feeds, "_feeds", type(ics_feeds._feeds)())
+    client.app.dependency_overrides[get_current_user] = lambda: User(google_id="feed-google-id", email="feed@example.com")
+
+    url = client.get("/calendar/export/link").json()["url"]
+    assert client.get("/calendar/export.ics?token=forged").status_code == 404
+    assert client.get("/calendar/export.ics?token=é.x").status_code == 404
+    response = client.get(url)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "text/calendar; charset=utf-8"
+    assert response.headers["last-modified"] == "Thu, 20 Jun 2024 08:30:00 GMT"
+    reader = IcsReader(io.StringIO(response.text))
+    events = list(reader)
+    master, moved, holiday = events
+    assert master.props["RRULE"] == [({}, "FREQ=WEEKLY;BYDAY=MO")]
+    assert master.props["EXDATE"] == [({"TZID": "Europe/Berlin"}, "20240617T090000")]
+    assert to_create_request(master).summary == "Standup, daily"
+    # Измененный экземпляр - переопределение серии, без своих правил
+    assert moved.uid == master.uid
+    assert moved.props["RECURRENCE-ID"] == [({"TZID": "Europe/Berlin"}, "20240610T090000")]
+    assert "RRULE" not in moved.props
+    assert holiday.props["DTSTART"] == [({"VALUE": "DATE"}, "20240704")]
+
+    # Повторные опросы без изменений - 304 из кэша, без обращения к Google
+    etag = response.headers["etag"]
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+    assert client.get(url, headers={"If-Modified-Since": response.headers["last-modified"]}).status_code == 304
+    assert google.get_export_events.call_count == 1
+
+    # Изменение календаря сбрасывает ленту; те же данные дают тот же ETag
+    invalidate_user_data("feed@example.com")
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+    assert google.get_export_events.call_count == 2
+
+    client.app.dependency_overrides.clear()
@@ -37,4 +37,576 @@ def test_parse_event_item(mocker: MockerFixture):
     assert parsed_all_day_event is not None
     assert parsed_all_day_event.summary == 'All Day Event'
     assert parsed_all_day_event.isAllDay is True
-    assert parsed_all_day_event.startTime == '2023-01-02'
\ No newline at end of file
+    assert parsed_all_day_event.startTime == '2023-01-02'
+
+# --- Схлопывание параллельных запросов диапазона ---
+def test_get_events_coalesces_concurrent_identical_requests(mocker: MockerFixture):
+    import datetime
+    import threading
+    import time
+
+    mocker.patch("src.calendar.service._build_calendar_resource")
+    service = GoogleCalendarService(creds=mocker.MagicMock(), user_email="flight@example.com")
+
+    release = threading.Event()
+    calls = []
+
+    def slow_fetch(start_date, end_date):
+        calls.append((start_date, end_date))
+        release.wait(timeout=5)
+        return [{"id": "e1", "summary": "Shared"}]
+
+    mocker.patch.object(service, "_fetch_events", side_effect=slow_fetch)
+
+    start, end = datetime.date(2024, 1, 1), datetime.date(2024, 1, 7)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(service.get_events(start, end))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    # Ждем, пока все остальные потоки присоединятся к запросу лидера, и отпускаем его
+    from src.calendar.service import _range_flight
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        if sum(c.waiters for c in list(_range_flight._calls.values())) == 4:
+            break
+        time.sleep(0.01)
+    release.set()
+    for t in threads:
+        t.join(timeout=5)
+
+    assert len(calls) == 1
+    assert len(results) == 5
+    assert all(r == [{"id": "e1", "summary": "Shared"}] for r in results)
+
+
+def test_singleflight_propagates_errors_and_forget_starts_new_flight():
+    import threading
+    import time
+    from src.calendar.singleflight import SingleFlight
+
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def failing():
+        started.set()
+        release.wait(timeout=5)
+        raise RuntimeError("upstream failed")
+
+    errors = []
+
+    def call():
+        try:
+            flight.do("key", failing, owner="u")
+        except RuntimeError as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(timeout=5)
+    follower = threading.Thread(target=call)
+    follower.start()
+    # Ждем, пока ведомый присоединится к запросу лидера
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline and flight._calls["key"].waiters != 1:
+        time.sleep(0.01)
+    assert flight._calls["key"].waiters == 1
+    # После мутации новый вызов не присоединяется к старому запросу
+    flight.forget("u")
+    assert flight.do("key", lambda: "fresh", owner="u") == "fresh"
+
+    release.set()
+    leader.join(timeout=5)
+    follower.join(timeout=5)
+    assert len(errors) == 2
+    assert flight.in_flight() == 0
+
+
+def test_range_cache_serves_covered_subrange_and_is_dropped_on_mutation(mocker: MockerFixture):
+    import datetime
+
+    mocker.patch("src.calendar.service._build_calendar_resource")
+    service = GoogleCalendarService(creds=mocker.MagicMock(), user_email="cache@example.com")
+    week = [
+        {"id": "mon", "summary": "Mon", "startTime": "2024-05-06T09:00:00Z", "endTime": "2024-05-06T10:00:00Z", "isAllDay": False},
+        {"id": "wed", "summary": "Wed", "startTime": "2024-05-08", "endTime": "2024-05-09", "isAllDay": True},
+    ]
+    fetch = mocker.patch.object(service, "_fetch_events", return_value=week)
+
+    assert service.get_events(datetime.date(2024, 5, 6), datetime.date(2024, 5, 12)) == week
+    # Поддиапазон обслуживается из окна недели без похода в Google
+    assert service.get_events(datetime.date(2024, 5, 8), datetime.date(2024, 5, 8)) == [week[1]]
+    assert fetch.call_count == 1
+
+    service.service.events.return_value.insert.return_value.execute.return_value = {"id": "new"}
+    from src.calendar.schemas import CreateEventRequest
+    service.create_event(CreateEventRequest(summary="New", startTime="2024-05-07", endTime="2024-05-08", isAllDay=True))
+
+    service.get_events(datetime.date(2024, 5, 8), datetime.date(2024, 5, 8))
+    assert fetch.call_count == 2
+
+
+def _timed_item(event_id: str, day: int) -> dict:
+    return {
+        'id': event_id,
+        'summary': f'Event {event_id}',
+        'start': {'dateTime': f'2024-06-{day:02d}T10:00:00Z'},
+        'end': {'dateTime': f'2024-06-{day:02d}T11:00:00Z'},
+    }
+
+
+def test_get_events_page_fetches_only_needed_pages_and_resumes_from_cursor(mocker: MockerFixture):
+    import datetime
+
+    mocker.patch("src.calendar.service._build_calendar_resource")
+    service = GoogleCalendarService(creds=mocker.MagicMock(), user_email="agenda@example.com")
+    all_items = [_timed_item(f"e{i}", i + 1) for i in range(25)]
+
+    def list_events(maxResults, pageToken=None, **kwargs):
+        start = int(pageToken or 0)
+        page = all_items[start:start + maxResults]
+        result = {'items': page}
+        if start + maxResults < len(all_items):
+            result['nextPageToken'] = str(start + maxResults)
+        return mocker.MagicMock(execute=mocker.MagicMock(return_value=result))
+
+    events_resource = service.service.events.return_value
+    events_resource.list.side_effect = list_events
+
+    start, end = datetime.date(2024, 6, 1), datetime.date(2024, 12, 31)
+    first_page, cursor = service.get_events_page(start, end, limit=10)
+    assert [e['id'] for e in first_page] == [f"e{i}" for i in range(10)]
+    assert events_resource.list.call_count == 1
+
+    second_page, cursor = service.get_events_page(None, None, limit=10, cursor=cursor)
+    assert [e['id'] for e in second_page] == [f"e{i}" for i in range(10, 20)]
+
+    last_page, cursor = service.get_events_page(None, None, limit=10, cursor=cursor)
+    assert [e['id'] for e in last_page] == [f"e{i}" for i in range(20, 25)]
+    assert cursor is None
+    assert events_resource.list.call_count == 3
+
+    # Курсор из валидного JSON, но без нужных полей или с полями не того типа - ValueError (400), а не 500
+    import pytest
+    from src.calendar.cursors import encode_cursor
+    for state in ({'s': '2024-06-01', 'e': '2024-12-31'}, {'s': 20240601, 'e': '2024-12-31', 'm': 10},
+                  {'s': '2024-06-01', 'e': '2024-12-31', 'm': '10'}, {'s': '2024-06-01', 'e': '2024-12-31', 'm': 10, 'o': []},
+                  {'s': 'June', 'e': '2024-12-31', 'm': 10}, {'s': '2024-06-01', 'e': '2024-12-31', 'm': 0}):
+        with pytest.raises(ValueError):
+            service.get_events_page(None, None, limit=10, cursor=encode_cursor("agenda", state))
+    assert events_resource.list.call_count == 3
+
+
+def test_get_event_changes_returns_deltas_and_tombstones(mocker: MockerFixture):
+    import datetime
+    import httplib2
+    from googleapiclient.errors import HttpError
+
+    mocker.patch("src.calendar.service._build_calendar_resource")
+    service = GoogleCalendarService(creds=mocker.MagicMock(), user_email="sync@example.com")
+    old = '2020-01-01T00:00:00+00:00'
+    future = (datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(minutes=5)).isoformat()
+
+    def list_events(**params):
+        if 'syncToken' not in params and 'updatedMin' not in params:
+            result = {'items': [dict(_timed_item('a', 1), created=old), dict(_timed_item('b', 2), created=old)],
+                      'nextSyncToken': 'tok-1'}
+        elif params.get('syncToken') == 'tok-1':
+            result = {'items': [dict(_timed_item('a', 3), created=old),
+                                {'id': 'b', 'status': 'cancelled'},
+                                dict(_timed_item('c', 4), created=future)],
+                      'nextSyncToken': 'tok-2'}
+        elif params.get('syncToken') == 'tok-2':
+            raise HttpError(httplib2.Response({'status': 410}), b'{"error": "fullSyncRequired"}')
+        else:
+            assert params['showDeleted'] is True
+            result = {'items': [], 'nextSyncToken': 'tok-3'}
+        return mocker.MagicMock(execute=mocker.MagicMock(return_value=result))
+
+    service.service.events.return_value.list.side_effect = list_events
+
+    full = service.get_event_changes()
+    assert full['fullSync'] is True
+    assert [e['id'] for e in full['created']] == ['a', 'b']
+
+    delta = service.get_event_changes(full['nextCursor'])
+    assert delta['fullSync'] is False
+    assert [e['id'] for e in delta['updated']] == ['a']
+    assert [e['id'] for e in delta['created']] == ['c']
+    assert delta['deleted'] == [{'id': 'b'}]
+
+    # Протухший syncToken - догоняем через updatedMin, без полной синхронизации
+    fallback = service.get_event_changes(delta['nextCursor'])
+    assert fallback['fullSync'] is False
+    assert fallback['created'] == fallback['updated'] == fallback['deleted'] == []
+
+
+def test_incremental_sync_keeps_search_index_complete(mocker: MockerFixture):
+    from src.calendar.search import search_index
+
+    mocker.patch("src.calendar.service._build_calendar_resource")
+    service = GoogleCalendarService(creds=mocker.MagicMock(), user_email="delta@example.com")
+    now = [1000.0]
+    mocker.patch("src.calendar.search.time.monotonic", side_effect=lambda: now[0])
+    mocker.patch.object(search_index, "fresh_seconds", 60)
+
+    def list_events(**params):
+        assert 'q' not in params, "search must be answered from the index"
+        if 'syncToken' not in params:
+            result = {'items': [_timed_item('a', 1), _timed_item('b', 2)], 'nextSyncToken': 'tok-1'}
+        else:
+            result = {'items': [_timed_item('c', 3), {'id': 'b', 'status': 'cancelled'}], 'nextSyncToken': 'tok-2'}
+        return mocker.MagicMock(execute=mocker.MagicMock(return_value=result))
+
+    service.service.events.return_value.list.side_effect = list_events
+    full = service.get_event_changes()
+    now[0] += 50
+    service.get_event_changes(full['nextCursor'])
+
+    # Срок полноты после полной синхронизации прошел, но дельта его продлила
+    now[0] += 50
+    assert [e['id'] for e in service.search_events("event", limit=5)] == ['c', 'a']
+
+    # Устаревший индекс (push-уведомление) дельта полным не делает
+    search_index.mark_stale("delta@example.com")
+    service.get_event_changes(full['nextCursor'])
+    assert not search_index.is_complete("delta@example.com")
+    search_index.clear()
+
+
+def test_search_events_uses_index_with_prefixes_and_falls_back_to_google_once(mocker: MockerFixture):
+    import datetime
+    from src.calendar.search import search_index
+    from src.calendar.schemas import DeleteEventMode
+
+    mocker.patch("src.calendar.service._build_calendar_resource")
+    service = GoogleCalendarService(creds=mocker.MagicMock(), user_email="search@example.com")
+    next_week = (datetime.date.today() + datetime.timedelta(days=7)).isoformat()
+    week = [
+        {"id": "s_1", "summary": "Daily standup", "startTime": "2024-05-06T09:00:00Z", "endTime": "2024-05-06T09:15:00Z",
+         "isAllDay": False, "recurringEventId": "s"},
+        {"id": "s_2", "summary": "Daily standup", "startTime": f"{next_week}T09:00:00Z", "endTime": f"{next_week}T09:15:00Z",
+         "isAllDay": False, "recurringEventId": "s"},
+        {"id": "review", "summary": "Design review", "description": "Standup notes", "startTime": "2024-05-07",
+         "endTime": "2024-05-08", "isAllDay": True},
+    ]
+    mocker.patch.object(service, "_fetch_events", return_value=week)
+    service.get_events(datetime.date(2024, 5, 6), datetime.date(2024, 5, 12))
+    service.service.events.return_value.list.return_value.execute.return_value = {"items": []}
+
+    # Префикс, ранжирование по полю и одна серия - одним (предстоящим) экземпляром
+    results = service.search_events("stand", limit=5)
+    assert [e["id"] for e in results] == ["s_2", "review"]
+    assert [e["id"] for e in service.search_events("design STAND", limit=5)] == ["review"]
+
+    # Индекс неполон: недостающее ищется в Google, но один и тот же запрос - только один раз
+    events_resource = service.service.events.return_value
+    events_resource.list.reset_mock()
+    events_resource.list.return_value.execute.return_value = {"items": [
+        {"id": "old", "summary": "Offsite planning", "start": {"date": "2023-01-10"}, "end": {"date": "2023-01-11"}},
+    ]}
+    assert [e["id"] for e in service.search_events("offsite", limit=5)] == ["old"]
+    assert [e["id"] for e in service.search_events("offsite", limit=5)] == ["old"]
+    assert events_resource.list.call_count == 1
+
+    # Удаление через API сразу убирает событие из индекса
+    service.delete_event("review", mode=DeleteEventMode.DEFAULT)
+    assert service.search_events("design", limit=1) == []
+    search_index.clear()
+
+
+def test_refetched_window_replaces_indexed_events(mocker: MockerFixture):
+    import datetime
+    from src.calendar.search import search_index
+    from src.calendar.service import invalidate_user_data
+
+    mocker.patch("src.calendar.service._build_calendar_resource")
+    service = GoogleCalendarService(creds=mocker.MagicMock(), user_email="reindex@example.com")
+    week = [
+        {"id": "a", "summary": "Retro", "startTime": "2024-05-06T09:00:00Z", "endTime": "2024-05-06T10:00:00Z", "isAllDay": False},
+        {"id": "b", "summary": "Retro prep", "startTime": "2024-05-07T09:00:00Z", "endTime": "2024-05-07T10:00:00Z", "isAllDay": False},
+    ]
+    fetch = mocker.patch.object(service, "_fetch_events", return_value=week)
+    service.get_events(datetime.date(2024, 5, 6), datetime.date(2024, 5, 12))
+    outside = {"id": "c", "summary": "Retro", "startTime": "2024-06-03T09:00:00Z", "endTime": "2024-06-03T10:00:00Z",
+               "isAllDay": False}
+    search_index.add_events("reindex@example.com", [outside])
+
+    # "b" удалено вне нашего API: повторная загрузка окна убирает его, событие вне окна остается
+    invalidate_user_data("reindex@example.com")
+    fetch.return_value = week[:1]
+    service.get_events(datetime.date(2024, 5, 6), datetime.date(2024, 5, 12))
+
+    # Индекс неполон: даже набрав limit результатов, поиск сверяется с Google
+    events_resource = service.service.events.return_value
+    events_resource.list.return_value.execute.return_value = {"items": []}
+    assert sorted(e["id"] for e in service.search_events("retro", limit=1)) == ["c"]
+    assert sorted(e["id"] for e in service.search_events("retro", limit=5)) == ["a", "c"]
+    assert events_resource.list.call_count == 1
+    search_index.clear()
+
+
+def test_search_events_reads_all_pages_of_upstream_search(mocker: MockerFixture):
+    from src.calendar.search import search_index
+
+    mocker.patch("src.calendar.service._build_calendar_resource")
+    service = GoogleCalendarService(creds=mocker.MagicMock(), user_email="pages@example.com")
+    pages = {None: {"items": [_timed_item(f"p1-{i}", 1) for i in range(3)], "nextPageToken": "page-2"},
+             "page-2": {"items": [_timed_item(f"p2-{i}", 2) for i in range(2)]}}
+    events_resource = service.service.events.return_value
+    events_resource.list.side_effect = lambda pageToken=None, **kw: mocker.MagicMock(
+        execute=mocker.MagicMock(return_value=pages[pageToken]))
+
+    # Запрос считается выполненным в Google только со всеми страницами: повтор отвечается из индекса полностью
+    assert len(service.search_events("event", limit=10)) == 5
+    assert len(service.search_events("event", limit=10)) == 5
+    assert [call.kwargs.get("pageToken") for call in events_resource.list.call_args_list] == [None, "page-2"]
+    assert events_resource.list.call_args_list[0].kwargs["q"] == "event"
+    search_index.clear()
+
+
+def test_get_time_stats_merges_overlaps_and_splits_by_local_day(mocker: MockerFixture):
+    import datetime
+
+    mocker.patch("src.calendar.service._build_calendar_resource")
+    service = GoogleCalendarService(creds=mocker.MagicMock(), user_email="stats@example.com")
+    events = [
+        {"id": "a_1", "summary": "Standup", "startTime": "2024-06-03T09:00:00+05:00", "endTime": "2024-06-03T10:00:00+05:00",
+         "isAllDay": False, "recurringEventId": "a"},
+        {"id": "b", "summary": "Review", "startTime": "2024-06-03T09:30:00+05:00", "endTime": "2024-06-03T11:00:00+05:00", "isAllDay": False},
+        {"id": "c", "summary": "Night deploy", "startTime": "2024-06-03T23:00:00+05:00", "endTime": "2024-06-04T01:00:00+05:00", "isAllDay": False},
+        {"id": "trip", "summary": "Trip", "startTime": "2024-06-03", "endTime": "2024-06-05", "isAllDay": True},
+        {"id": "before", "summary": "Sunday", "startTime": "2024-06-02T10:00:00Z", "endTime": "2024-06-02T11:00:00Z", "isAllDay": False},
+    ]
+    get_events = mocker.patch.object(service, "get_events", return_value=events)
+
+    stats = service.get_time_stats(datetime.date(2024, 6, 3), datetime.date(2024, 6, 4), "Asia/Yekaterinburg")
+
+    get_events.assert_called_once_with(datetime.date(2024, 6, 2), datetime.date(2024, 6, 5))
+    assert stats["totals"] == {
+        "busyHours": 4.0, "meetingCount": 3, "allDayEventCount": 1,
+        "recurringHours": 1.0, "oneOffHours": 3.5, "recurringMeetingCount": 1, "oneOffMeetingCount": 2,
+    }
+    assert [(d["date"], d["busyHours"], d["meetingCount"], d["allDayEventCount"]) for d in stats["days"]] == [
+        ("2024-06-03", 3.0, 3, 1), ("2024-06-04", 1.0, 0, 1),
+    ]
+    assert stats["weeks"] == [{"weekStart": "2024-06-03", "busyHours": 4.0, "meetingCount": 3}]
+
+    import pytest
+    with pytest.raises(ValueError):
+        service.get_time_stats(datetime.date(2024, 6, 3), datetime.date(2024, 6, 4), "Mars/Olympus")
+
+
+def test_create_event_check_conflicts_uses_cached_window_then_narrow_query(mocker: MockerFixture):
+    import datetime
+    import pytest
+    from src.calendar.schemas import CreateEventRequest
+    from src.calendar.service import EventConflictError
+
+    mocker.patch("src.calendar.service._build_calendar_resource")
+    service = GoogleCalendarService(creds=mocker.MagicMock(), user_email="conflicts@example.com")
+    week = [
+        {"id": "standup", "summary": "Standup", "startTime": "2024-05-06T09:00:00+05:00", "endTime": "2024-05-06T09:30:00+05:00", "isAllDay": False},
+        {"id": "lunch", "summary": "Lunch", "startTime": "2024-05-06T12:00:00+05:00", "endTime": "2024-05-06T13:00:00+05:00", "isAllDay": False},
+        {"id": "holiday", "summary": "Holiday", "startTime": "2024-05-06", "endTime": "2024-05-07", "isAllDay": True},
+    ]
+    mocker.patch.object(service, "_fetch_events", return_value=week)
+    service.get_events(datetime.date(2024, 5, 6), datetime.date(2024, 5, 12))
+    events_resource = service.service.events.return_value
+
+    overlapping = CreateEventRequest(summary="Sync", startTime="2024-05-06T09:15:00", endTime="2024-05-06T10:00:00",
+                                     isAllDay=False, timeZoneId="Asia/Yekaterinburg")
+    with pytest.raises(EventConflictError) as exc_info:
+        service.create_event(overlapping, check_conflicts=True)
+    assert [e["id"] for e in exc_info.value.conflicts] == ["standup"]
+    events_resource.insert.assert_not_called()
+    events_resource.list.assert_not_called()
+
+    # Касание границы - не конфликт
+    events_resource.insert.return_value.execute.return_value = {"id": "new"}
+    adjacent = overlapping.model_copy(update={"startTime": "2024-05-06T09:30:00", "endTime": "2024-05-06T12:00:00"})
+    assert service.create_event(adjacent, check_conflicts=True) == {"id": "new"}
+    events_resource.list.assert_not_called()
+
+    # Вне закэшированных окон - узкий запрос к Google только за интервал события
+    events_resource.list.return_value.execute.return_value = {"items": [
+        {"id": "far", "summary": "Far", "start": {"dateTime": "2025-01-10T10:00:00Z"}, "end": {"dateTime": "2025-01-10T11:00:00Z"}},
+    ]}
+    far = CreateEventRequest(summary="Later", startTime="2025-01-10T10:30:00Z", endTime="2025-01-10T10:45:00Z", isAllDay=False)
+    with pytest.raises(EventConflictError):
+        service.create_event(far, check_conflicts=True)
+    assert events_resource.list.call_args.kwargs["timeMin"] == "2025-01-10T10:30:00+00:00"
+
+
+def test_get_events_serves_last_good_result_as_stale_when_google_fails(mocker: MockerFixture):
+    import datetime
+    import httplib2
+    import pytest
+    from googleapiclient.errors import HttpError
+    from src.calendar.service import StaleEvents
+    from src.core.circuit import circuit_breakers
+
+    circuit_breakers.reset()
+    mocker.patch("src.calendar.service._build_calendar_resource")
+    revalidate = mocker.patch("src.calendar.prefetch.prefetch_pool.revalidate")
+    service = GoogleCalendarService(creds=mocker.MagicMock(), user_email="stale@example.com")
+    week = [{"id": "mon", "summary": "Mon", "startTime": "2024-05-06T09:00:00Z", "endTime": "2024-05-06T10:00:00Z", "isAllDay": False}]
+    fetch = mocker.patch.object(service, "_fetch_events", return_value=week)
+    start, end = datetime.date(2024, 5, 6), datetime.date(2024, 5, 12)
+    service.get_events(start, end)
+
+    # После инвалидации Google отвечает 503 - отдаем последний известный результат и перезагружаем в фоне
+    service._invalidate_user_cache()
+    fetch.side_effect = HttpError(httplib2.Response({'status': 503}), b'backend error')
+    events = service.get_events(start, end)
+    assert isinstance(events, StaleEvents) and events == week
+    revalidate.assert_called_once_with(service.creds, "stale@example.com", start, end)
+
+    # Ошибки запроса (4xx) не маскируются устаревшими данными
+    fetch.side_effect = HttpError(httplib2.Response({'status': 404}), b'not found')
+    with pytest.raises(HttpError):
+        service.get_events(start, end)
+
+    # Разомкнутая цепь: к Google не ходим вовсе
+    list_request = service.service.events.return_value.list
+    list_request.return_value.execute.side_effect = HttpError(httplib2.Response({'status': 500}), b'boom')
+    fetch.side_effect = lambda s, e: GoogleCalendarService._fetch_events(service, s, e)
+    for _ in range(10):
+        assert isinstance(service.get_events(start, end), StaleEvents)
+    executed = list_request.return_value.execute.call_count
+    assert isinstance(service.get_events(start, end), StaleEvents)
+    assert list_request.return_value.execute.call_count == executed
+    assert circuit_breakers.get("events.list").state == "open"
+    circuit_breakers.reset()
+
+
+def test_get_events_for_ranges_fetches_merged_windows_once(mocker: MockerFixture):
+    import datetime
+
+    mocker.patch("src.calendar.service._build_calendar_resource")
+    service = GoogleCalendarService(creds=mocker.MagicMock(), user_email="ranges@example.com")
+    events = [
+        {"id": "mon", "summary": "Mon", "startTime": "2024-06-03T09:00:00Z", "endTime": "2024-06-03T10:00:00Z", "isAllDay": False},
+        {"id": "trip", "summary": "Trip", "startTime": "2024-06-28", "endTime": "2024-07-03", "isAllDay": True},
+        {"id": "aug", "summary": "Aug", "startTime": "2024-08-20T09:00:00Z", "endTime": "2024-08-20T10:00:00Z", "isAllDay": False},
+    ]
+
+    from src.calendar.cache import event_overlaps, range_bounds
+
+    def fake_get_events(start, end):
+        time_min, time_max = range_bounds(start, end)
+        return [e for e in events if event_overlaps(e, time_min, time_max)]
+
+    get_events = mocker.patch.object(service, "get_events", side_effect=fake_get_events)
+    d = datetime.date
+    # Сетка месяца, окно повестки внутри нее, соседняя неделя и далекий диапазон
+    result = service.get_events_for_ranges([
+        (d(2024, 6, 1), d(2024, 6, 30)), (d(2024, 6, 3), d(2024, 6, 9)),
+        (d(2024, 7, 1), d(2024, 7, 7)), (d(2024, 8, 19), d(2024, 8, 25)),
+    ])
+
+    assert [c.args for c in get_events.call_args_list] == [
+        (d(2024, 6, 1), d(2024, 7, 7)), (d(2024, 8, 19), d(2024, 8, 25)),
+    ]
+    assert [e["id"] for e in result["events"]] == ["mon", "trip", "aug"]
+    assert [r["eventIds"] for r in result["ranges"]] == [["mon", "trip"], ["mon"], ["trip"], ["aug"]]
+    assert result["staleAgeSeconds"] is None
+
+
+def test_update_this_and_following_splits_series_in_batches_and_rolls_back(mocker: MockerFixture):
+    import httplib2
+    import pytest
+    from googleapiclient.errors import HttpError
+    from src.calendar.schemas import UpdateEventMode, UpdateEventRequest
+    from src.core.circuit import circuit_breakers
+
+    circuit_breakers.reset()
+    mocker.patch("src.calendar.service._build_calendar_resource")
+    service = GoogleCalendarService(creds=mocker.MagicMock(), user_email="split@example.com")
+    tz = "Asia/Yekaterinburg"
+
+    def at(day, hour, minute=0):
+        return {"dateTime": f"2024-06-{day:02d}T{hour:02d}:{minute:02d}:00+05:00", "timeZone": tz}
+
+    master = {"id": "standup", "iCalUID": "standup@google.com", "summary": "Standup", "location": "Room 4",
+              "start": at(3, 9), "end": at(3, 9, 15), "recurrence": ["RRULE:FREQ=WEEKLY;BYDAY=MO"]}
+    instance = {"id": "standup_20240617T040000Z", "iCalUID": "standup@google.com", "recurringEventId": "standup",
+                "summary": "Standup", "start": at(17, 9), "end": at(17, 9, 15), "originalStartTime": at(17, 9)}
+    moved = {"id": "standup_20240624T040000Z", "recurringEventId": "standup", "summary": "Standup (late)",
+             "start": at(24, 11), "end": at(24, 11, 15), "originalStartTime": at(24, 9)}
+    cancelled = {"id": "standup_20240701T040000Z", "recurringEventId": "standup", "status": "cancelled",
+                 "originalStartTime": {"dateTime": "2024-07-01T09:00:00+05:00", "timeZone": tz}}
+    earlier = {"id": "standup_20240610T040000Z", "recurringEventId": "standup", "summary": "Standup (early)",
+               "start": at(10, 8), "end": at(10, 8, 15), "originalStartTime": at(10, 9)}
+
+    events = service.service.events.return_value
+    events.get.side_effect = lambda **kw: mocker.MagicMock(execute=mocker.MagicMock(return_value=instance))
+    events.list.side_effect = lambda **kw: mocker.MagicMock(execute=mocker.MagicMock(
+        return_value={"items": [master, earlier, moved, cancelled]}))
+    events.patch.side_effect = lambda **kw: ("patch", kw["eventId"], kw["body"])
+    events.insert.side_effect = lambda **kw: ("insert", kw["body"]["id"], kw["body"])
+    events.delete.side_effect = lambda **kw: ("delete", kw["eventId"], None)
+
+    batches = []
+    failing = set()
+
+    class FakeBatch:
+        def __init__(self, callback):
+            self.callback, self.requests = callback, []
+
+        def add(self, request, request_id):
+            self.requests.append((request_id, request))
+
+        def execute(self, http=None):
+            batches.append(dict(self.requests))
+            for request_id, (verb, event_id, body) in self.requests:
+                if verb in failing:
+                    self.callback(request_id, None, HttpError(httplib2.Response({"status": 400}), b"bad"))
+                else:
+                    self.callback(request_id, {"id": event_id, **(body or {})}, None)
+
+    service.service.new_batch_http_request.side_effect = lambda callback: FakeBatch(callback)
+    edit = UpdateEventRequest(summary="Sync", startTime="2024-06-17T10:00:00", endTime="2024-06-17T10:15:00")
+
+    new_series, fields = service.update_event(instance["id"], edit, UpdateEventMode.THIS_AND_FOLLOWING)
+
+    # Две группы запросов вместо запроса на каждый экземпляр
+    assert len(batches) == 2
+    first = batches[0]
+    assert first["truncate"][2] == {"recurrence": ["RRULE:FREQ=WEEKLY;BYDAY=MO;UNTIL=20240617T035959Z"]}
+    new_id = new_series["id"]
+    assert first["create"][2]["start"] == {"dateTime": "2024-06-17T10:00:00", "timeZone": tz}
+    assert first["create"][2]["recurrence"] == ["RRULE:FREQ=WEEKLY;BYDAY=MO"]
+    assert (new_series["summary"], new_series["location"]) == ("Sync", "Room 4")
+    assert set(fields) == {"summary", "start", "end"}
+    # Исключения после экземпляра переезжают на новую серию (со сдвигом на час), более ранние - нет
+    second = batches[1]
+    assert set(second) == {f"new:{new_id}_20240624T050000Z", f"new:{new_id}_20240701T050000Z", f"old:{moved['id']}"}
+    assert second[f"new:{new_id}_20240624T050000Z"][2] == {"start": at(24, 11), "end": at(24, 11, 15), "summary": "Sync"}
+    assert second[f"new:{new_id}_20240701T050000Z"][2] == {"status": "cancelled"}
+
+    # Google отклонил создание новой серии: обрезание старой откатывается, ошибка пробрасывается
+    batches.clear()
+    failing.add("insert")
+    with pytest.raises(HttpError):
+        service.update_event(instance["id"], edit, UpdateEventMode.THIS_AND_FOLLOWING)
+    assert len(batches) == 2
+    assert batches[1] == {"truncate": ("patch", "standup", {"recurrence": ["RRULE:FREQ=WEEKLY;BYDAY=MO"]})}
+
+    # Исключенные даты после экземпляра (как у серий из .ics) переходят в новую серию со сдвигом
+    # и в ее часовом поясе, у старой серии остаются только более ранние
+    batches.clear()
+    failing.clear()
+    master["recurrence"] = ["RRULE:FREQ=WEEKLY;BYDAY=MO", f"EXDATE;TZID={tz}:20240610T090000,20240708T090000",
+                            "EXDATE:20240715T040000Z", "RDATE;TZID=Europe/Berlin:20240711T060000"]
+    edit = UpdateEventRequest(summary="Sync", startTime="2024-06-17T10:00:00", endTime="2024-06-17T10:15:00",
+                              timeZoneId="Europe/Moscow")
+    service.update_event(instance["id"], edit, UpdateEventMode.THIS_AND_FOLLOWING)
+    first = batches[0]
+    assert first["truncate"][2] == {"recurrence": ["RRULE:FREQ=WEEKLY;BYDAY=MO;UNTIL=20240617T035959Z",
+                                                   f"EXDATE;TZID={tz}:20240610T090000"]}
+    assert first["create"][2]["recurrence"] == [
+        "RRULE:FREQ=WEEKLY;BYDAY=MO",
+        "EXDATE;TZID=Europe/Moscow:20240708T100000,20240715T100000",
+        "RDATE;TZID=Europe/Moscow:20240711T100000",
+    ]
+    circuit_breakers.reset()
@@ -0,0 +1,88 @@
+import pytest
+
+from src.core.circuit import CircuitBreaker, CircuitOpenError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _breaker(clock, **options):
+    params = dict(failure_rate=0.5, min_calls=4, window_seconds=30, slow_call_seconds=2,
+                  open_seconds=10, clock=clock)
+    params.update(options)
+    return CircuitBreaker("events.list", **params)
+
+
+def test_breaker_opens_on_error_rate_fails_fast_and_recovers_after_trial_call():
+    clock = FakeClock()
+    breaker = _breaker(clock)
+    is_failure = lambda e: isinstance(e, TimeoutError)
+
+    def fail():
+        raise TimeoutError("upstream timed out")
+
+    breaker.call(lambda: "ok", is_failure)
+    # Ошибки клиента (не is_failure) не размыкают цепь
+    with pytest.raises(ValueError):
+        breaker.call(lambda: (_ for _ in ()).throw(ValueError("bad request")), is_failure)
+    for _ in range(2):
+        with pytest.raises(TimeoutError):
+            breaker.call(fail, is_failure)
+    assert breaker.state == "open"
+
+    calls = []
+    with pytest.raises(CircuitOpenError) as exc_info:
+        breaker.call(lambda: calls.append(1), is_failure)
+    assert calls == []
+    assert 0 < exc_info.value.retry_after <= 10
+
+    clock.now += 10
+    assert breaker.state == "half_open"
+    with pytest.raises(TimeoutError):
+        breaker.call(fail, is_failure)
+    assert breaker.state == "open"
+
+    clock.now += 10
+    assert breaker.call(lambda: "recovered", is_failure) == "recovered"
+    assert breaker.state == "closed"
+
+
+def test_slow_calls_count_as_failures():
+    clock = FakeClock()
+    breaker = _breaker(clock, min_calls=2)
+
+    def slow():
+        clock.now += 3
+        return "late"
+
+    assert breaker.call(slow, lambda e: True) == "late"
+    assert breaker.call(slow, lambda e: True) == "late"
+    assert breaker.state == "open"
+
+
+def test_healthy_concurrent_calls_are_not_rejected():
+    import threading
+
+    breaker = _breaker(FakeClock())
+    inside = threading.Barrier(40, timeout=5)
+    errors = []
+
+    def call():
+        try:
+            # Все 40 вызовов одновременно внутри breaker'а
+            breaker.call(inside.wait, lambda e: True)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(40)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+    assert errors == []
+    assert breaker.state == "closed"
@@ -0,0 +1,55 @@
+import threading
+import time
+
+import pytest
+
+from src.core.deadline import DeadlineExceeded, call_timeout, deadline_scope
+from src.core.hedging import Hedger
+
+
+def test_call_timeout_uses_remaining_request_budget(mocker):
+    from src.calendar.service import GoogleCalendarService
+
+    # Вне запроса - просто лимит одного вызова
+    assert call_timeout(10.0) == 10.0
+    with deadline_scope(2.0):
+        assert 1.5 < call_timeout(10.0) <= 2.0
+        # Вложенная область не продлевает дедлайн
+        with deadline_scope(60.0):
+            assert call_timeout(10.0) <= 2.0
+
+    mocker.patch("src.calendar.service._build_calendar_resource")
+    service = GoogleCalendarService(creds=mocker.MagicMock(), user_email="deadline@example.com")
+    request = mocker.MagicMock()
+    with deadline_scope(0.0):
+        with pytest.raises(DeadlineExceeded):
+            service._execute("events.insert", request)
+    # К Google не обращались
+    request.execute.assert_not_called()
+
+
+def test_hedger_returns_first_successful_response():
+    hedger = Hedger(max_workers=4)
+    release = threading.Event()
+
+    def slow_primary():
+        release.wait(timeout=5)
+        return "primary"
+
+    started = time.monotonic()
+    assert hedger.call(slow_primary, lambda: "hedge", hedge_after=0.05) == ("hedge", "hedge")
+    assert time.monotonic() - started < 1
+    release.set()
+
+    assert hedger.call(lambda: "fast", lambda: "hedge", hedge_after=1.0) == ("fast", "not_needed")
+
+    # Ошибка хеджа не мешает основному вызову ответить
+    def failing_hedge():
+        raise OSError("connection reset")
+
+    def late_primary():
+        time.sleep(0.1)
+        return "primary"
+
+    assert hedger.call(late_primary, failing_hedge, hedge_after=0.01) == ("primary", "primary")
+    hedger.shutdown()
@@ -0,0 +1,40 @@
+import io
+import json
+import logging
+
+from src.core.logging_config import JsonFormatter, RateLimitFilter, SamplingFilter, _QueueHandler
+
+
+def _record(level=logging.INFO, msg="Agenda page for %s: %s events", args=("a@example.com", 3), **extra):
+    record = logging.LogRecord("src.calendar.service", level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_sampling_and_rate_limit_keep_warnings_and_errors():
+    never = SamplingFilter(rate=0.0)
+    assert not never.filter(_record())
+    assert never.filter(_record(level=logging.WARNING))
+
+    limit = RateLimitFilter(per_second=0.001, burst=2)
+    assert [limit.filter(_record()) for _ in range(4)] == [True, True, False, False]
+    # Лимит считается по шаблону сообщения, а не по подставленным аргументам
+    assert limit.filter(_record(msg="Event %s deleted."))
+    assert limit.filter(_record(level=logging.ERROR))
+
+
+def test_queue_handler_formats_args_eagerly_and_json_output():
+    handler = _QueueHandler(queue=None)
+    payload = {"summary": "Standup"}
+    record = handler.prepare(_record(msg="Inserting new event: %s", args=(payload,), user="a@example.com"))
+    # Аргументы подставлены до постановки в очередь: изменения после вызова не попадают в лог
+    payload["summary"] = "changed"
+    assert (record.msg, record.args) == ("Inserting new event: {'summary': 'Standup'}", None)
+
+    stream = io.StringIO()
+    output = logging.StreamHandler(stream)
+    output.setFormatter(JsonFormatter())
+    output.handle(record)
+    entry = json.loads(stream.getvalue())
+    assert entry["message"] == "Inserting new event: {'summary': 'Standup'}"
+    assert (entry["level"], entry["logger"], entry["user"]) == ("INFO", "src.calendar.service", "a@example.com")
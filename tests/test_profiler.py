@@ -0,0 +1,72 @@
+import threading
+import time
+
+from fastapi.testclient import TestClient
+from pytest_mock import MockerFixture
+
+from src.core.config import settings
+from src.core.profiler import SamplingProfiler
+
+
+def _busy_range_handler(start_date, end_date):
+    deadline = time.perf_counter() + 0.15
+    while time.perf_counter() < deadline:
+        sum(range(1000))
+    return []
+
+
+def test_profile_endpoint_returns_collapsed_stacks_of_matching_requests(client: TestClient, mocker: MockerFixture):
+    from src.core.dependencies import get_calendar_service
+
+    mocker.patch.object(settings, "ADMIN_TOKEN", None)
+    assert client.post("/admin/profile").status_code == 404
+    mocker.patch.object(settings, "ADMIN_TOKEN", "s3cret")
+    assert client.post("/admin/profile", headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+    fake_service = mocker.MagicMock(user_email="slow@example.com")
+    fake_service.get_events.side_effect = _busy_range_handler
+    client.app.dependency_overrides[get_calendar_service] = lambda: fake_service
+
+    result = {}
+    capture = threading.Thread(target=lambda: result.update(client.post(
+        "/admin/profile?seconds=5&requests=2&route=/calendar/events/range&interval_ms=2",
+        headers={"X-Admin-Token": "s3cret"},
+    ).json()))
+    capture.start()
+    time.sleep(0.2)
+    client.get("/")  # Не подходит по пути и не считается
+    for _ in range(2):
+        assert client.get("/calendar/events/range?startDate=2024-06-01&endDate=2024-06-07").status_code == 200
+    capture.join(timeout=10)
+
+    assert result["requests"] == 2 and result["samples"] > 0
+    assert result["durationSeconds"] < 5
+    lines = result["collapsed"].splitlines()
+    assert any("_busy_range_handler (tests/test_profiler.py" in line for line in lines)
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0 and stack.split(";")[0] in ("MainThread", "AnyIO worker thread")
+    client.app.dependency_overrides.clear()
+
+
+def test_profiler_user_filter_and_memory_snapshot():
+    profiler = SamplingProfiler()
+    session = profiler.start(seconds=5, max_requests=1, user="target@example.com", interval=0.001, memory=True)
+    keep = []
+
+    with profiler.track("/calendar/events/range"):
+        profiler.identify("other-id", "other@example.com")
+        assert session.in_flight == 0
+    with profiler.track("/calendar/events/range"):
+        profiler.identify("target-id", "target@example.com")
+        assert session.in_flight == 1
+        keep.extend(bytearray(64) for _ in range(2000))
+        time.sleep(0.05)
+
+    assert session.finished.wait(5)
+    result = session.result()
+    assert result["requests"] == 1
+    # В разницу снимков попадают только выделения по пути ответа (src, FastAPI, pydantic)
+    assert result["memory"]["peakTracedBytes"] > 64 * 2000
+    assert all(any("/src/" in frame or "/fastapi/" in frame or "/starlette/" in frame or "/pydantic/" in frame
+                   for frame in stat["traceback"]) for stat in result["memory"]["top"])
+    assert profiler.active is None
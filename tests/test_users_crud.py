@@ -0,0 +1,54 @@
+from sqlalchemy import event
+
+from src.users import crud as users_crud
+from src.users.models import User
+
+
+def _count_statements(db_session):
+    statements = []
+    event.listen(db_session.get_bind(), "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    return statements
+
+
+def test_upsert_user_token_is_a_single_statement(db_session):
+    statements = _count_statements(db_session)
+    user = users_crud.upsert_user_token(db_session, google_id="g1", email="a@example.com",
+                                        full_name="Alice", refresh_token="rt-1")
+    assert (user.google_id, user.refresh_token, user.full_name) == ("g1", "rt-1", "Alice")
+    assert len(statements) == 1 and "ON CONFLICT" in statements[0]
+
+    # Повторный вход: токен обновляется, имя без нового значения сохраняется
+    user = users_crud.upsert_user_token(db_session, google_id="g1", email="a@example.com",
+                                        full_name=None, refresh_token="rt-2")
+    assert (user.refresh_token, user.full_name) == ("rt-2", "Alice")
+    # Пустая строка тоже не затирает сохраненное имя
+    user = users_crud.upsert_user_token(db_session, google_id="g1", email="a@example.com",
+                                        full_name="", refresh_token="rt-2")
+    assert user.full_name == "Alice"
+    assert user.updated_at is not None
+    assert users_crud.get_refresh_token(db_session, "g1") == "rt-2"
+    assert db_session.query(User).count() == 1
+
+
+def test_bulk_upsert_users_writes_one_statement_per_batch(db_session):
+    users_crud.upsert_user_token(db_session, google_id="u0", email="u0@example.com",
+                                 full_name="Existing", refresh_token="keep")
+    statements = _count_statements(db_session)
+    rows = [{"google_id": f"u{i}", "email": f"u{i}@example.com"} for i in range(25)]
+    # Повтор внутри пачки - побеждает последняя запись
+    rows.insert(2, {"google_id": "u1", "email": "u1-new@example.com", "refresh_token": "rt"})
+
+    assert users_crud.bulk_upsert_users(db_session, rows, batch_size=10) == 25
+    assert len(statements) == 3
+    assert db_session.query(User).count() == 25
+    existing = db_session.get(User, "u0")
+    assert (existing.full_name, existing.refresh_token) == ("Existing", "keep")
+    assert db_session.get(User, "u1").email == "u1-new@example.com"
+
+    # Пустые строки не затирают сохраненные имя и токен
+    users_crud.bulk_upsert_users(db_session, [{"google_id": "u0", "email": "u0@example.com",
+                                               "full_name": "", "refresh_token": ""}])
+    db_session.expire_all()
+    existing = db_session.get(User, "u0")
+    assert (existing.full_name, existing.refresh_token) == ("Existing", "keep")
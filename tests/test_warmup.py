@@ -0,0 +1,35 @@
+import asyncio
+
+from src.core.warmup import Readiness
+
+
+def test_readiness_requires_only_mandatory_checks_and_retries_failed():
+    calls = {"database": 0}
+
+    async def ok():
+        return None
+
+    async def flaky_database():
+        calls["database"] += 1
+        if calls["database"] == 1:
+            raise ConnectionError("database is starting")
+
+    async def broken_optional():
+        raise TimeoutError("certs endpoint timed out")
+
+    readiness = Readiness([("client", ok, True), ("database", flaky_database, True), ("certs", broken_optional, False)])
+
+    assert asyncio.run(readiness.run()) is False
+    assert readiness.snapshot()["status"] == "starting"
+
+    assert asyncio.run(readiness.run(only_failed=True)) is True
+    assert readiness.snapshot()["checks"]["certs"]["ok"] is False
+    assert calls["database"] == 2
+
+
+def test_discovery_document_is_parsed_once():
+    from src.calendar import service as calendar_service
+
+    first = calendar_service.load_discovery_document()
+    assert first["name"] == "calendar" and "events" in first["resources"]
+    assert calendar_service.load_discovery_document() is first